@@ -1,40 +1,68 @@
 from flask import Flask, jsonify, request, Response
-from flask import url_for, redirect, has_request_context
+from flask import url_for, has_request_context, g
 from flask_cors import CORS
 import os
 import json
+import atexit
+import logging
 from types import SimpleNamespace
 import threading
+import queue
+import re
+from concurrent.futures import ThreadPoolExecutor
 import time
 import openai
-from openai import OpenAI
-import chatomatic
-from retry import retry
-import backoff
-import random
-import uuid
-import requests
 from dotenv import load_dotenv
-from reflection_system_prompt import PHASE_DEFINITIONS
 
+# Before the project imports: their settings are read from the environment at import time.
 load_dotenv()
 
+import chatomatic
+import metrics
+from llm_gateway import LLMGateway, create_openai_client
+from conversation_store import create_conversation_store, ConversationLockRegistry, conversation_updated_at
+import uuid
+import hashlib
+import requests
+from reflection_system_prompt import PHASE_DEFINITIONS, get_prompt_cache_stats
+from response_cache import response_cache, RESPONSE_CACHE_PREWARM
+from stage_classifier import STAGE_CLASSIFIER_MODE, first_missing_stage_batched, first_missing_stage_sequential, stage_verdict_cache
+import structured_logging
+import tracing
+from structured_logging import propagate
+
+structured_logging.configure_logging()
+atexit.register(structured_logging.shutdown_logging)
+atexit.register(tracing.shutdown)
+logger = logging.getLogger(__name__)
+
+# Points every OpenAI call at another server, e.g. perf/fake_openai_server.py for offline testing.
+openai_base_url = os.environ.get("VOXAREFLECT_OPENAI_BASE_URL", "").strip()
 api_key = os.environ.get("OPENAI_API_KEY", "").strip()
+if api_key == "" and openai_base_url != "":
+    api_key = "offline-placeholder"
 if api_key == "":
     raise RuntimeError("OPENAI_API_KEY environment variable is not set.")
 
 openai.api_key = api_key
-openai_client = OpenAI(api_key=api_key)
+openai_client = create_openai_client(api_key, base_url=openai_base_url or None)
+llm_gateway = LLMGateway(openai_client)
 
-chatomatic_engine = chatomatic.Chatomatic(openai_client)
+chatomatic_engine = chatomatic.Chatomatic(openai_client, llm_gateway=llm_gateway)
+conversation_store = create_conversation_store()
+conversation_locks = ConversationLockRegistry()
+atexit.register(conversation_store.close)
+# Span attribute naming the store backend (e.g. SQLiteConversationStore, CachedConversationStore).
+CONVERSATION_STORE_KIND = type(conversation_store).__name__
 
-lock = threading.Lock()
 tts_audio_lock = threading.Lock()
 voice_job_lock = threading.Lock()
 DEFAULT_TTS_STYLE_PRESET = "professional"
 VOICE_JOB_TTL_SECONDS = int(os.environ.get("VOXAREFLECT_VOICE_JOB_TTL", "900"))
-
-import os
+# Generate the end-of-reflection summary after the final reply has been returned.
+BACKGROUND_SUMMARY_ENABLED = os.environ.get("VOXAREFLECT_BACKGROUND_SUMMARY", "off").strip().lower() in ("1", "on", "true", "yes")
+# Digest each phase when it is left, so the final summary reads digests instead of the whole transcript.
+PHASE_DIGESTS_ENABLED = os.environ.get("VOXAREFLECT_PHASE_DIGESTS", "off").strip().lower() in ("1", "on", "true", "yes")
 
 # Determine if running on PythonAnywhere or locally
 if os.path.exists('/home/bichp1'):  # PythonAnywhere
@@ -48,6 +76,53 @@ app = Flask(__name__,
 
 CORS(app)
 
+# Static files and scrapes are not traced.
+UNTRACED_ENDPOINTS = {"static", "metrics_endpoint"}
+
+@app.before_request
+def bind_request_id():
+    # Log lines of this request (and of the jobs it starts) carry the id; clients may pass their own.
+    request_id = structured_logging.set_request_id(request.headers.get("X-Request-ID"))
+    if tracing.TRACING_ENABLED and request.endpoint not in UNTRACED_ENDPOINTS:
+        # Span names use the route pattern, not the concrete path, to keep their number small.
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        g.request_span = tracing.start_span(f"{request.method} {rule}" if rule else request.method, kind="server", attributes={
+            "http.request.method": request.method,
+            "http.route": rule,
+            "url.path": request.path,
+            "http.request.body.size": request.content_length,
+            "voxareflect.request_id": request_id
+        }, traceparent=request.headers.get("traceparent"))
+        g.request_span_token = tracing.activate(g.request_span)
+
+@app.after_request
+def expose_request_id(response):
+    request_id = structured_logging.current_request_id()
+    if request_id:
+        response.headers["X-Request-ID"] = request_id
+    request_span = g.get("request_span")
+    if request_span is not None:
+        request_span.set_attribute("http.response.status_code", response.status_code)
+        if response.status_code >= 500:
+            request_span.set_status(tracing.STATUS_ERROR, f"HTTP {response.status_code}")
+        if response.is_streamed:
+            # teardown_request runs before a streamed body is produced (e.g. /newChat/stream),
+            # so the span ends when the server closes the response instead.
+            g.request_span_streamed = True
+            response.call_on_close(request_span.end)
+    return response
+
+@app.teardown_request
+def end_request_span(error=None):
+    request_span = g.pop("request_span", None)
+    if request_span is None:
+        return
+    if error is not None:
+        request_span.record_exception(error)
+    tracing.deactivate(g.pop("request_span_token", None))
+    if not g.pop("request_span_streamed", False):
+        request_span.end()
+
 def load_tts_config():
     mode = os.environ.get("VOXAREFLECT_TTS_MODE", "none").strip().lower()
     endpoint = os.environ.get("VOXAREFLECT_TTS_ENDPOINT", "").strip()
@@ -60,12 +135,15 @@ def load_tts_config():
         try:
             headers = json.loads(headers_env)
         except json.JSONDecodeError as decode_error:
-            print("Failed to parse VOXAREFLECT_TTS_HEADERS JSON ==>", decode_error)
+            logger.error("Failed to parse VOXAREFLECT_TTS_HEADERS JSON: %s", decode_error)
             headers = {}
     token_value = os.environ.get("VOXAREFLECT_TTS_AUTH_TOKEN", "").strip()
     if token_value != "" and "Authorization" not in headers:
         headers["Authorization"] = token_value
     openai_model = os.environ.get("OPENAI_TTS_MODEL", "gpt-4o-mini-tts").strip()
+    pipeline_enabled = os.environ.get("VOXAREFLECT_TTS_PIPELINE", "off").strip().lower() in ("1", "on", "true", "yes")
+    pipeline_workers = int(os.environ.get("VOXAREFLECT_TTS_PIPELINE_WORKERS", "4"))
+    pipeline_min_chars = int(os.environ.get("VOXAREFLECT_TTS_PIPELINE_MIN_CHARS", "40"))
     default_voice = os.environ.get("OPENAI_TTS_DEFAULT_VOICE", "").strip()
     if default_voice == "":
         default_voice = legacy_voice
@@ -105,6 +183,9 @@ def load_tts_config():
         "format": audio_format,
         "timeout": timeout,
         "openai_model": openai_model,
+        "pipeline": pipeline_enabled,
+        "pipeline_workers": pipeline_workers,
+        "pipeline_min_chars": pipeline_min_chars,
         "default_voice": default_voice,
         "style_instructions": {
             "warm": warm_instruction,
@@ -119,6 +200,8 @@ def load_tts_config():
 
 tts_config = load_tts_config()
 tts_audio_cache = {}
+tts_playlists = {}
+tts_pipeline_executor = ThreadPoolExecutor(max_workers=tts_config["pipeline_workers"], thread_name_prefix="tts")
 voice_jobs = {}
 
 def cleanup_voice_jobs_locked():
@@ -195,6 +278,9 @@ def cleanup_tts_audio_cache():
             expired_keys.append(audio_id)
     for audio_id in expired_keys:
         tts_audio_cache.pop(audio_id, None)
+    expired_playlists = [playlist_id for playlist_id, playlist in tts_playlists.items() if now - playlist.timestamp > TTS_CACHE_TTL_SECONDS]
+    for playlist_id in expired_playlists:
+        tts_playlists.pop(playlist_id, None)
 
 def store_tts_audio(audio_bytes, content_type):
     with tts_audio_lock:
@@ -228,22 +314,32 @@ def synthesize_speech(text, tts_eligible, style_preset, requested_voice):
         payload["style"] = instruction_text
     # remove empty fields
     payload = {key: value for key, value in payload.items() if value}
-    try:
-        # Use OpenAI's HTTP Text-to-Speech endpoint so API keys remain server-side.
-        response = requests.post(
-            config["endpoint"],
-            json=payload,
-            headers=config.get("headers", {}),
-            timeout=config.get("timeout", 15)
-        )
-        response.raise_for_status()
-    except Exception as error:
-        print("TTS synthesis failed ==>", error)
-        return None, style_config
-    audio_bytes = response.content
-    if not audio_bytes:
-        return None, style_config
-    content_type = response.headers.get("Content-Type", config.get("format", "audio/mpeg"))
+    with tracing.span("tts.synthesize", kind="client", **{
+        "voxareflect.tts.mode": config.get("mode", "none"),
+        "voxareflect.tts.model": payload.get("model"),
+        "voxareflect.tts.voice": payload.get("voice"),
+        "voxareflect.tts.input_chars": len(str(text))
+    }) as tts_span:
+        headers = tracing.upstream_headers(config.get("headers", {}), tts_span)
+        try:
+            # Use OpenAI's HTTP Text-to-Speech endpoint so API keys remain server-side.
+            response = requests.post(
+                config["endpoint"],
+                json=payload,
+                headers=headers,
+                timeout=config.get("timeout", 15)
+            )
+            response.raise_for_status()
+        except Exception as error:
+            tts_span.record_exception(error)
+            logger.error("TTS synthesis failed: %s", error)
+            return None, style_config
+        audio_bytes = response.content
+        tts_span.set_attribute("voxareflect.tts.audio_bytes", len(audio_bytes or b""))
+        if not audio_bytes:
+            return None, style_config
+        content_type = response.headers.get("Content-Type", config.get("format", "audio/mpeg"))
+        tts_span.set_attribute("voxareflect.tts.content_type", content_type)
     audio_id = store_tts_audio(audio_bytes, content_type)
     return {
         "audio_id": audio_id,
@@ -252,33 +348,168 @@ def synthesize_speech(text, tts_eligible, style_preset, requested_voice):
         "voice": style_config["voice"]
     }, style_config
 
-def save(name, data):
-    with open(name + ".json", "w") as file:
-        json_dumps = json.dumps(data, default = lambda o: o.__dict__, indent = 2)
-        file.write(json_dumps)
+# A sentence ends at ., !, ? or … followed by whitespace, or at a line break.
+TTS_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?\u2026])\s+|\n+")
 
-def load(name):
-    with open(name + ".json", "r") as file:
-        file_read = file.read()
-        json_loads = json.loads(file_read)
-        return json_loads
+class TtsSentencePipeline:
+    """
+    Turns streamed reply text into an ordered playlist of audio segments.
+    Each finished sentence (merged up to `pipeline_min_chars`) is synthesized on the
+    TTS pool while the model keeps generating, so the first segment can play early.
+    Segments are served one by one via /tts/playlist/<id> or concatenated via /tts/stream/<id>.
+    """
+
+    def __init__(self, style_preset, requested_voice, started, event_sink=None):
+        self.playlist_id = str(uuid.uuid4())
+        self.style_preset = style_preset
+        self.requested_voice = requested_voice
+        self.started = started
+        self.event_sink = event_sink
+        self.min_chars = tts_config.get("pipeline_min_chars", 40)
+        self.buffer = ""
+        self.segments = []
+        self.complete = False
+        self.received_text = False
+        self.first_audio_seconds = None
+        self.timestamp = time.time()
+        self.condition = threading.Condition()
+        with tts_audio_lock:
+            cleanup_tts_audio_cache()
+            tts_playlists[self.playlist_id] = self
+
+    def feed(self, text):
+        if not text:
+            return
+        self.received_text = True
+        self.buffer += text
+        while True:
+            boundary = None
+            for match in TTS_SENTENCE_BOUNDARY.finditer(self.buffer):
+                if len(self.buffer[:match.start()].strip()) >= self.min_chars:
+                    boundary = match
+                    break
+            if boundary is None:
+                return
+            sentence = self.buffer[:boundary.start()]
+            self.buffer = self.buffer[boundary.end():]
+            self._submit(sentence)
+
+    def reset(self):
+        """Drop everything fed so far (the reply is being replaced)."""
+        with self.condition:
+            for segment in self.segments:
+                segment["status"] = "discarded"
+            self.buffer = ""
+            self.condition.notify_all()
+
+    def finish(self):
+        self._submit(self.buffer)
+        self.buffer = ""
+        with self.condition:
+            self.complete = True
+            self.condition.notify_all()
+
+    def _submit(self, sentence):
+        sentence = sentence.strip()
+        if sentence == "":
+            return
+        with self.condition:
+            index = len(self.segments)
+            self.segments.append({"index": index, "text": sentence, "status": "pending", "audio_id": None})
+        tts_pipeline_executor.submit(propagate(self._synthesize), index, sentence)
 
+    def _synthesize(self, index, sentence):
+        try:
+            synthesized_audio, _ = synthesize_speech(sentence, True, self.style_preset, self.requested_voice)
+        except Exception as error:
+            logger.error("TTS pipeline segment failed: %s", error)
+            synthesized_audio = None
+        with self.condition:
+            segment = self.segments[index]
+            if segment["status"] == "discarded":
+                return
+            if synthesized_audio is None:
+                segment["status"] = "failed"
+            else:
+                segment["status"] = "ready"
+                segment["audio_id"] = synthesized_audio["audio_id"]
+                if self.first_audio_seconds is None and self._first_playable_index() == index:
+                    self.first_audio_seconds = time.perf_counter() - self.started
+            self.condition.notify_all()
+        if synthesized_audio is not None and self.event_sink is not None:
+            self.event_sink("audio", {
+                "playlistId": self.playlist_id,
+                "index": index,
+                "text": sentence,
+                "audioUrl": f"/tts/audio/{synthesized_audio['audio_id']}"
+            })
+
+    def _first_playable_index(self):
+        for segment in self.segments:
+            if segment["status"] == "ready":
+                return segment["index"]
+            if segment["status"] == "pending":
+                return None
+        return None
+
+    def wait_for_first_audio(self, timeout):
+        """Block until the first segment is playable, every segment failed, or the timeout passes."""
+        deadline = time.perf_counter() + timeout
+        with self.condition:
+            while self.first_audio_seconds is None:
+                remaining = deadline - time.perf_counter()
+                live_segments = [segment for segment in self.segments if segment["status"] != "discarded"]
+                all_failed = len(live_segments) > 0 and all(segment["status"] == "failed" for segment in live_segments)
+                if remaining <= 0 or all_failed or (self.complete and len(live_segments) == 0):
+                    break
+                self.condition.wait(timeout=remaining)
+            return self.first_audio_seconds is not None
+
+    def next_segment(self, index, timeout):
+        """
+        Return the next settled (ready or failed) segment at or after `index`,
+        or None once the playlist is complete or nothing settles within `timeout`.
+        """
+        with self.condition:
+            while True:
+                while index < len(self.segments) and self.segments[index]["status"] == "discarded":
+                    index += 1
+                if index < len(self.segments) and self.segments[index]["status"] != "pending":
+                    return dict(self.segments[index])
+                if index >= len(self.segments) and self.complete:
+                    return None
+                if not self.condition.wait(timeout=timeout):
+                    return None
+
+    def describe(self):
+        with self.condition:
+            return {
+                "playlistId": self.playlist_id,
+                "complete": self.complete,
+                "segments": [
+                    {
+                        "index": segment["index"],
+                        "text": segment["text"],
+                        "status": segment["status"],
+                        "audioUrl": f"/tts/audio/{segment['audio_id']}" if segment["audio_id"] else None
+                    }
+                    for segment in self.segments if segment["status"] != "discarded"
+                ]
+            }
 
-def askModel(newMessage, language_for_app, currentText = "", reflection_context = None, conversation_history=None): # returns answer, most_similar_question
-    return chatomatic_engine.answer(newMessage, language_for_app, currentText, reflection_context=reflection_context, conversation_history=conversation_history)
+def get_tts_playlist(playlist_id):
+    with tts_audio_lock:
+        cleanup_tts_audio_cache()
+        return tts_playlists.get(playlist_id)
 
-def conversation_with_id(all_conversations, id):
-    for conversation in all_conversations:
-        if conversation["id"] == id:
-            return conversation
-    return None
+def askModel(newMessage, language_for_app, currentText = "", reflection_context = None, conversation_history=None, on_event=None): # returns answer, most_similar_question
+    return chatomatic_engine.answer(newMessage, language_for_app, currentText, reflection_context=reflection_context, conversation_history=conversation_history, on_event=on_event)
 
 @app.route('/')
 def home():
     return app.send_static_file('index.html')
 
-def return_message_from_openai(messages):
-    global openai_client
+def return_message_from_openai(messages, **request_options):
     # Convert "system" to "developer" role for GPT-5.1 best practices
     messages_updated = []
     for msg in messages:
@@ -287,10 +518,12 @@ def return_message_from_openai(messages):
         else:
             messages_updated.append(msg)
     
-    response = openai_client.chat.completions.create(
+    response = llm_gateway.chat_completions_create(
+        "completion",
         model="gpt-5.1",
         messages=messages_updated,
-        temperature=1.0  # GPT-5.1 requires temperature=1.0 exactly
+        temperature=1.0,  # GPT-5.1 requires temperature=1.0 exactly
+        **request_options
     )
     return response
 
@@ -298,29 +531,106 @@ def askFromGPT(prompt):
     message = return_message_from_openai([{"role": "user", "content": prompt}])
     return message.choices[0].message.content
 
+def askFromGPTJson(prompt):
+    message = return_message_from_openai([{"role": "user", "content": prompt}], response_format={"type": "json_object"})
+    return message.choices[0].message.content
+
+CONVERSATION_HEADER_FIELDS = ["id", "title", "stage", "turnPreset", "time", "messageCount", "revision", "updatedAt"]
+MESSAGE_PAGE_DEFAULT_LIMIT = 50
+MESSAGE_PAGE_MAX_LIMIT = 500
+# `serverTime` handed out for delta sync is backdated by this margin so turns that were
+# being written while the listing was read are delivered again on the next sync.
+SYNC_CLOCK_MARGIN_SECONDS = 2.0
+
+def conversation_listing_etag(username, view, since, headers):
+    fingerprint = [username, view, since]
+    for header in headers:
+        fingerprint.append([header.get("id"), header.get("revision", 0), conversation_updated_at(header)])
+    return hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()
+
 @app.route('/getConversations', methods=['POST'])
 def get_conversations():
     username = str(request.json['username'])
-    lock.acquire()
+    # view="headers" returns the sidebar listing without message bodies;
+    # messages are then fetched per conversation via /getConversationMessages.
+    view = str(request.json.get('view', 'full') or 'full').strip().lower()
+    # since=<serverTime of the last sync> limits the result to conversations changed afterwards.
+    since = request.json.get('since')
+    if not isinstance(since, (int, float)):
+        since = None
     try:
-        conversations = load("conversations")
-        lock.release()
-        if not (username in conversations):
-            return jsonify({"success": True, "result": []})
+        sync_time = time.time() - SYNC_CLOCK_MARGIN_SECONDS
+        headers = conversation_store.list_conversation_headers(username)
+        if since is not None:
+            headers = [header for header in headers if conversation_updated_at(header) > since]
+        etag = conversation_listing_etag(username, view, since, headers)
+        if request.if_none_match.contains(etag):
+            not_modified = Response(status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+        user_conversations = []
+        if view == "headers":
+            for header in headers:
+                new_header = {field: header.get(field) for field in CONVERSATION_HEADER_FIELDS}
+                if not new_header["turnPreset"]:
+                    new_header["turnPreset"] = TURN_PRESET_DEFAULT
+                new_header["updatedAt"] = conversation_updated_at(header)
+                new_header["revision"] = header.get("revision", 0)
+                new_header["phase"] = build_phase_metadata(header.get("stage", ""))
+                user_conversations.append(new_header)
         else:
-            user_conversations = []
-            for conversation in conversations[username]:
+            changed_ids = {header.get("id") for header in headers}
+            for conversation in conversation_store.list_conversations(username):
+                if since is not None and conversation.get("id") not in changed_ids:
+                    continue
                 new_conversation = dict(conversation)
                 if "turnPreset" not in new_conversation or not new_conversation["turnPreset"]:
                     new_conversation["turnPreset"] = TURN_PRESET_DEFAULT
                 new_conversation["phase"] = build_phase_metadata(new_conversation.get("stage", ""))
                 user_conversations.append(new_conversation)
-            return jsonify({"success": True, "result": user_conversations})
-    except Exception as exception:
-        lock.release()
-        print("Error in 'get_conversations' ==>", exception)
+        response = jsonify({"success": True, "result": user_conversations, "serverTime": sync_time, "delta": since is not None})
+        response.set_etag(etag)
+        return response
+    except Exception:
+        logger.exception("Error in 'get_conversations'")
         return jsonify({"success": False, "result": []})
 
+def parse_optional_int(value):
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/getConversationMessages', methods=['POST'])
+def get_conversation_messages():
+    payload = request.get_json(force=True, silent=True) or {}
+    username = str(payload.get('username', ''))
+    conversation_id = parse_optional_int(payload.get('conversationID'))
+    before = parse_optional_int(payload.get('before'))
+    after = parse_optional_int(payload.get('after'))
+    limit = parse_optional_int(payload.get('limit'))
+    if limit is None or limit <= 0:
+        limit = MESSAGE_PAGE_DEFAULT_LIMIT
+    limit = min(limit, MESSAGE_PAGE_MAX_LIMIT)
+    try:
+        page = None
+        if conversation_id is not None:
+            page = conversation_store.get_messages(username, conversation_id, before=before, after=after, limit=limit)
+        if page is None:
+            return jsonify({"success": False, "result": [], "total": 0, "start": 0, "nextCursor": None}), 404
+        return jsonify({
+            "success": True,
+            "result": page["messages"],
+            "total": page["total"],
+            "start": page["start"],
+            "nextCursor": page["nextCursor"]
+        })
+    except Exception:
+        logger.exception("Error in 'get_conversation_messages'")
+        return jsonify({"success": False, "result": [], "total": 0, "start": 0, "nextCursor": None})
+
 @app.route('/addChatToConversation', methods=['POST'])
 def add_chat_to_conversation():
     current_time = time.time()
@@ -330,31 +640,27 @@ def add_chat_to_conversation():
     newMessageSystem = str(request.json['newMessageSystem'])
     buttons = request.json['buttons']
     try:
-        lock.acquire()
-        conversations = load("conversations")
-        lock.release()
-        conversation = conversation_with_id(conversations[username], conversationID)
-        conversation["messages"].append(
-            {
-                "sender": "user",
-                "content": newMessageUser,
-                "buttons": [],
-                "video": "",
-                "time": current_time
-            }
-        )
-        conversation["messages"].append(
-            {
-                "sender": "system",
-                "content": newMessageSystem,
-                "buttons": buttons,
-                "video": "",
-                "time": current_time
-            }
-        )
-        lock.acquire()
-        save("conversations", conversations)
-        lock.release()
+        with conversation_locks.hold(username, conversationID):
+            conversation = conversation_store.get_conversation(username, conversationID)
+            if conversation is None:
+                raise KeyError(f"Conversation {conversationID} not found for user {username}")
+            new_messages = [
+                {
+                    "sender": "user",
+                    "content": newMessageUser,
+                    "buttons": [],
+                    "video": "",
+                    "time": current_time
+                },
+                {
+                    "sender": "system",
+                    "content": newMessageSystem,
+                    "buttons": buttons,
+                    "video": "",
+                    "time": current_time
+                }
+            ]
+            conversation_store.append_messages(username, conversationID, new_messages)
         return jsonify({
             "success": True,
             "result": newMessageSystem,
@@ -368,10 +674,8 @@ def add_chat_to_conversation():
             "turnPreset": conversation.get('turnPreset', TURN_PRESET_DEFAULT),
             "phase": build_phase_metadata(conversation.get("stage", ""))
         })
-    except Exception as error:
-        print("Error in 'add_chat_to_conversation' ==>", error)
-        if lock.locked():
-            lock.release()
+    except Exception:
+        logger.exception("Error in 'add_chat_to_conversation'")
         return jsonify({"success": False, "result": "", "buttons": [], "video": "", "time": current_time, "title": "", "text": "", "stage": "", "id": conversationID})
 
 
@@ -382,23 +686,11 @@ def update_turn_preset():
     raw_preset = request.json.get('turnPreset', TURN_PRESET_DEFAULT)
     normalized_preset = normalize_turn_preset(raw_preset)
     try:
-        lock.acquire()
-        conversations = load("conversations")
-        if username not in conversations:
-            lock.release()
-            return jsonify({"success": False, "turnPreset": normalized_preset})
-        conversation = conversation_with_id(conversations[username], conversation_id)
-        if conversation is None:
-            lock.release()
-            return jsonify({"success": False, "turnPreset": normalized_preset})
-        conversation["turnPreset"] = normalized_preset
-        save("conversations", conversations)
-        lock.release()
-        return jsonify({"success": True, "turnPreset": normalized_preset})
-    except Exception as error:
-        print("Error in 'update_turn_preset' ==>", error)
-        if lock.locked():
-            lock.release()
+        with conversation_locks.hold(username, conversation_id):
+            updated = conversation_store.update_conversation(username, conversation_id, {"turnPreset": normalized_preset})
+        return jsonify({"success": updated, "turnPreset": normalized_preset})
+    except Exception:
+        logger.exception("Error in 'update_turn_preset'")
         return jsonify({"success": False, "turnPreset": normalized_preset})
 
 
@@ -514,6 +806,19 @@ buttonsForEachStage_en = {
     'Action Plan': ['Give me more details about the Action Plan class of the Gibbs reflective cycle.']
 }
 
+gibMirTexts = {
+    'de': "Gib mir einige praktische Ideen, wie ich mit dem Schreiben meines reflektierenden Textes nach dem Gibbs-Modell beginnen kann.",
+    'en': "Give me some practical ideas on how to start writing my reflective text using the Gibbs model."
+}
+
+cannedPrompts = set(gibMirTexts.values())
+for stage_buttons in list(buttonsForEachStage_de.values()) + list(buttonsForEachStage_en.values()):
+    cannedPrompts.update(stage_buttons)
+
+def is_canned_prompt(message):
+    """True for the fixed prompts the UI sends from buttons rather than student answers."""
+    return str(message or "").strip() in cannedPrompts
+
 
 def build_phase_metadata(stage_value):
     total_main_stages = max(len(setOfStages) - 1, 1)
@@ -571,15 +876,15 @@ def advance_stage_if_needed(current_stage, phase_suggestion, calculated_next_pha
         phase_min = max(0, int(turn_rule.get("min", 0)))
         phase_cap = max(1, int(turn_rule.get("max", phase_cap)))
     if isinstance(turns_elapsed, int) and turns_elapsed < phase_min:
-        print(f"DEBUG advance_stage_if_needed: Staying in {current_stage} because turns_elapsed {turns_elapsed} < min {phase_min}")
+        logger.debug("Staying in %s because turns_elapsed %s < min %s", current_stage, turns_elapsed, phase_min)
         return current_stage
     if isinstance(turns_elapsed, int) and turns_elapsed >= phase_cap:
-        print(f"DEBUG advance_stage_if_needed: Forced advance after {turns_elapsed} turns (cap {phase_cap})")
+        logger.info("Forced advance from %s after %s turns (cap %s)", current_stage, turns_elapsed, phase_cap)
         return move_to_next_stage(current_stage)
     
     # NEW: If chatomatic.py already calculated the next phase, use it directly
     if suggestion == "advance" and calculated_next_phase:
-        print(f"DEBUG advance_stage_if_needed: Using calculated_next_phase: {calculated_next_phase}")
+        logger.debug("Using calculated_next_phase: %s", calculated_next_phase)
         return calculated_next_phase
     
     # OLD: Fallback logic if no calculated phase provided
@@ -588,46 +893,31 @@ def advance_stage_if_needed(current_stage, phase_suggestion, calculated_next_pha
     return move_to_next_stage(current_stage)
 
 
-def determine_current_stage_and_if_returned_no(text, old_current_stage):
+def determine_current_stage_and_if_returned_no(text, old_current_stage, username=None):
     old_current_stage_index = 0
     if old_current_stage in setOfStages:
         old_current_stage_index = setOfStages.index(old_current_stage)
     if old_current_stage_index >= len(setOfStages) - 1:
         return "done", False
-    for i in range(old_current_stage_index, len(setOfStages) - 1):
-        stage = setOfStages[i]
-        prompt = "Imagine you are a university teacher. Your student has written the following reflective text:\n\n" + text + "\n\nDo you find any sentence in their text from the '" + stage + "' class of the Gibbs reflective cycle? (This class "
-        if stage == "Description":
-            prompt += "describes the event the student is reflecting on."
-        elif stage == "Feelings":
-            prompt += "describes the thoughts and feelings of the student when they were in the situation."
-        elif stage == 'Evaluation':
-            prompt += "describes the opinion of the student on the positive or negative points of their response at the time of the event."
-        elif stage == "Analysis":
-            prompt += "describes the reasons for the opinion of the student on the incident. It may also refer to references that support the concerns."
-        elif stage == "Conclusion":
-            prompt += "summarizes what happened and what the student gained from the event."
-        elif stage == "Action Plan":
-            prompt += "describes the opinion of the student on what they would do differently if they were faced with a similar situation next time."
-        prompt += ") You should start answering with a clear yes or no. Then, you can explain your answer in 1-2 sentences."
-        response = askFromGPT(prompt)
-        if response.lower().startswith("yes"):
-            continue
-        else:
-            return stage, True
-    return "done", False
+    remaining_stages = setOfStages[old_current_stage_index:len(setOfStages) - 1]
+    if STAGE_CLASSIFIER_MODE == "sequential":
+        missing_stage = first_missing_stage_sequential(text, remaining_stages, askFromGPT, stage_verdict_cache, owner=username)
+    else:
+        missing_stage = first_missing_stage_batched(text, remaining_stages, askFromGPTJson, askFromGPT, stage_verdict_cache, owner=username)
+    if missing_stage is None:
+        return "done", False
+    return missing_stage, True
 
 @app.route('/determineFeedbackAndTitle', methods=['POST'])
 def determine_feedback_and_title():
     text = str(request.json['text'])
     language = str(request.json['language'])
     currentStage = str(request.json['currentStage'])
+    # Optional: lets the stage verdict cache reuse this student's earlier drafts.
+    username = str(request.json.get('username') or '').strip() or None
     try:
-        lock.acquire()
-        conversations = load("conversations")
-        lock.release()
         oldStage = currentStage
-        newStage, didReturn = determine_current_stage_and_if_returned_no(text, oldStage)
+        newStage, didReturn = determine_current_stage_and_if_returned_no(text, oldStage, username)
         if not didReturn:
             if language == "de":
                 feedback = askFromGPT("Stell dir vor, du bist ein Universitätslehrer eines Bachelor-Kurses für Wirtschaftsstudenten. Der Kurs behandelt 'Business Process Management' und lehrt die Grundlagen des Prozessmanagements, die Notation von Geschäftsprozessen, Prozessdesign, Prozessneuentwurf und Prozess-Mining. Neben den Vorlesungen möchtest du nun auch die Studenten mit reflektierenden Schreibübungen zur Reflexion über die gelernten Inhalte und die praktischen Übungen und Fallstudien zum Prozessmanagement engagieren. Dein Student hat folgenden reflektierenden Text geschrieben:\n\n" + str(text).strip() + "\n\nDer Text ist bereits in einem sehr guten Zustand und scheint alle Komponenten aus dem Gibbs-Reflexionszyklus zu enthalten. Du kannst dem Studenten jedoch noch einige Rückmeldungen geben, um sein reflektierendes Schreiben zu verbessern (einschließlich, aber nicht beschränkt auf Rückmeldungen zur Klarheit und Schreibqualität). Bitte gib dem Studenten einige Rückmeldungen. Beginne mit etwas wie 'Fantastisch gemacht mit deinem reflektierenden Text! Es sieht so aus, als ob du fast alle notwendigen Komponenten aus dem Gibbs-Reflexionszyklus einbezogen hast.' und gib dann deine Rückmeldung. Am Ende füge 'Wenn du Fragen hast, lass es mich bitte wissen!' hinzu. Alle deine Rückmeldungen sollten nur auf Deutsch sein. Bitte sprich den Studenten mit 'Du' und nicht mit 'Sie' an, da du als persönlicher Tutor auftreten sollst. Richte das Feedback an den Studenten, nicht an seinen Lehrer.")
@@ -639,10 +929,8 @@ def determine_feedback_and_title():
             else:
                 feedback = guidingQuestionsForEachStage_en[newStage]
         return jsonify({"success": True, "result": feedback, "new_stage": newStage})
-    except Exception as error:
-        print("Error in 'determine_feedback_and_title' ==>", error)
-        if lock.locked():
-            lock.release()
+    except Exception:
+        logger.exception("Error in 'determine_feedback_and_title'")
         return jsonify({"success": False, "result": "", "new_stage": currentStage})
 
 @app.route('/createNewTitle', methods=['POST'])
@@ -652,32 +940,17 @@ def create_new_title():
     username = str(request.json['username'])
     conversationID = int(request.json['conversationID'])
     try:
-        lock.acquire()
-        conversations = load("conversations")
-        lock.release()
-        if not (username in conversations):
-            lock.acquire()
-            lock.release()
+        conversation = conversation_store.get_conversation(username, conversationID)
+        if conversation is None:
             return jsonify({"success": False, "result": "", "buttons": [], "new_title": ""})
+        if language == "de":
+            new_title = askFromGPT("Suggest a very short (2-3 words) title for this German reflective text:\n\n" + text + "\n\nThe title should be appropriate for a reflective text. Only give the title (without any quotes or other symbols) and no other text. Your output should be in German language.")
         else:
-            conversation = conversation_with_id(conversations[username], conversationID)
-            if conversation is not None:
-                if language == "de":
-                    conversation["title"] = askFromGPT("Suggest a very short (2-3 words) title for this German reflective text:\n\n" + text + "\n\nThe title should be appropriate for a reflective text. Only give the title (without any quotes or other symbols) and no other text. Your output should be in German language.")
-                else:
-                    conversation["title"] = askFromGPT("Suggest a very short (2-3 words) title for this reflective text:\n\n" + text + "\n\nThe title should be appropriate for a reflective text. Only give the title (without any quotes or other symbols) and no other text.")
-                lock.acquire()
-                save("conversations", conversations)
-                lock.release()
-                return jsonify({"success": True, "result": conversation["title"], "buttons": [], "new_title": conversation["title"]})
-            else:
-                lock.acquire()
-                lock.release()
-                return jsonify({"success": False, "result": "", "buttons": [], "new_title": ""})
-    except Exception as error:
-        print("Error in 'create_new_title' ==>", error)
-        if lock.locked():
-            lock.release()
+            new_title = askFromGPT("Suggest a very short (2-3 words) title for this reflective text:\n\n" + text + "\n\nThe title should be appropriate for a reflective text. Only give the title (without any quotes or other symbols) and no other text.")
+        conversation_store.update_conversation(username, conversationID, {"title": new_title})
+        return jsonify({"success": True, "result": new_title, "buttons": [], "new_title": new_title})
+    except Exception:
+        logger.exception("Error in 'create_new_title'")
         return jsonify({"success": False, "result": "", "buttons": [], "new_title": ""})
 
 
@@ -691,9 +964,11 @@ def uploadAudio():
     language_hint = str(request.form.get('language', '') or '').strip()
     temp_filename = f'audio-{uuid.uuid4()}.mp4'
     try:
-        file.save(temp_filename)
-    except Exception as error:
-        print("Error saving uploaded audio ==>", error)
+        with tracing.span("audio.save") as save_span:
+            file.save(temp_filename)
+            save_span.set_attribute("file.size", os.path.getsize(temp_filename))
+    except Exception:
+        logger.exception("Error saving uploaded audio")
         return jsonify({"success": False, "result": "", "error": "Failed to save audio"}), 500
     if metadata_raw == "":
         try:
@@ -704,11 +979,11 @@ def uploadAudio():
                 }
                 if language_hint != "":
                     transcription_kwargs["language"] = language_hint
-                transcription = openai_client.audio.transcriptions.create(**transcription_kwargs)
+                transcription = llm_gateway.transcriptions_create(**transcription_kwargs)
             os.remove(temp_filename)
             return jsonify({"success": True, "result": transcription.text})
-        except Exception as error:
-            print("Error in 'uploadAudio' transcription ==>", error)
+        except Exception:
+            logger.exception("Error in 'uploadAudio' transcription")
             try:
                 os.remove(temp_filename)
             except Exception:
@@ -726,7 +1001,8 @@ def uploadAudio():
         return jsonify({"success": False, "result": "", "error": "Invalid metadata"}), 400
     job_id = create_voice_job()
     update_voice_job(job_id, status="queued", result=None, error=None)
-    worker = threading.Thread(target=process_voice_job_async, args=(job_id, temp_filename, metadata), daemon=True)
+    tracing.current_span().set_attribute("voxareflect.voice_job_id", job_id)
+    worker = threading.Thread(target=propagate(process_voice_job_async), args=(job_id, temp_filename, metadata, time.perf_counter()), daemon=True)
     worker.start()
     return jsonify({"success": True, "jobId": job_id})
 
@@ -741,6 +1017,39 @@ def serve_tts_audio(audio_id):
     response.headers["Cache-Control"] = "no-store"
     return response
 
+@app.route('/tts/playlist/<playlist_id>', methods=['GET'])
+def serve_tts_playlist(playlist_id):
+    playlist = get_tts_playlist(playlist_id)
+    if playlist is None:
+        return jsonify({"success": False, "error": "Playlist not found"}), 404
+    result = playlist.describe()
+    result["success"] = True
+    return jsonify(result)
+
+@app.route('/tts/stream/<playlist_id>', methods=['GET'])
+def stream_tts_playlist(playlist_id):
+    """Concatenated audio of a pipelined reply, sent segment by segment as they finish."""
+    playlist = get_tts_playlist(playlist_id)
+    if playlist is None:
+        return jsonify({"success": False, "error": "Playlist not found"}), 404
+    segment_timeout = float(tts_config.get("timeout", 15)) + 5.0
+
+    def generate():
+        index = 0
+        while True:
+            segment = playlist.next_segment(index, segment_timeout)
+            if segment is None:
+                return
+            index = segment["index"] + 1
+            if segment["status"] != "ready":
+                continue
+            with tts_audio_lock:
+                audio_entry = tts_audio_cache.get(segment["audio_id"])
+            if audio_entry is not None:
+                yield audio_entry["bytes"]
+
+    return Response(generate(), mimetype=tts_config.get("format", "audio/mpeg") or "audio/mpeg", headers={"Cache-Control": "no-cache"})
+
 @app.route('/tts/config', methods=['GET'])
 def get_tts_config():
     return jsonify({
@@ -749,10 +1058,86 @@ def get_tts_config():
         "mode": tts_config.get("mode", "none")
     })
 
-def process_chat_turn(payload):
+@app.route('/llmGateway/stats', methods=['GET'])
+def llm_gateway_stats():
+    return jsonify({"success": True, "result": llm_gateway.stats()})
+
+@app.route('/stageVerdictCache/stats', methods=['GET'])
+def stage_verdict_cache_stats():
+    return jsonify({"success": True, "result": stage_verdict_cache.stats()})
+
+@app.route('/promptCache/stats', methods=['GET'])
+def prompt_cache_stats():
+    return jsonify({"success": True, "result": get_prompt_cache_stats()})
+
+@app.route('/tracing/stats', methods=['GET'])
+def tracing_stats():
+    return jsonify({"success": True, "result": tracing.stats()})
+
+# Model label per upstream operation for the turn stage histograms.
+TURN_METRIC_MODELS = {
+    "transcription": "whisper-1",
+    "classifier": chatomatic.VOXAREFLECT_CLASSIFIER_MODEL,
+    "reply": chatomatic.VOXAREFLECT_LLM_MODEL,
+    "tts": tts_config.get("openai_model", "") if tts_config.get("mode", "none") != "none" else ""
+}
+
+def collect_voice_job_counts():
+    with voice_job_lock:
+        statuses = [job_data.get("status", "") for job_data in voice_jobs.values()]
+    counts = {(status,): 0.0 for status in ("queued", "running", "completed", "failed")}
+    for status in statuses:
+        counts[(status,)] = counts.get((status,), 0.0) + 1
+    return counts
+
+def collect_tts_cache_bytes():
+    with tts_audio_lock:
+        return sum(len(audio_data["bytes"]) for audio_data in tts_audio_cache.values())
+
+metrics.voice_jobs_gauge.set_function(collect_voice_job_counts)
+metrics.tts_cache_entries.set_function(lambda: len(tts_audio_cache))
+metrics.tts_cache_bytes.set_function(collect_tts_cache_bytes)
+metrics.conversation_locks_active.set_function(conversation_locks.active_count)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"success": False, "error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+def process_chat_turn(payload, event_sink=None):
+    """
+    Run one chat turn and persist it. When event_sink(name, data) is given, the
+    phase decision and reply deltas are forwarded to it while the turn runs.
+    Log lines of the turn carry its `turnId`, which is also returned; with
+    tracing on, the turn is a `chat_turn` span with one child per stage.
+    """
+    turn_log, turn_token = structured_logging.begin_turn()
+    result = None
+    with tracing.span("chat_turn", **{"voxareflect.turn_id": turn_log.turn_id}) as turn_span:
+        try:
+            result = run_chat_turn(payload, event_sink)
+            result["turnId"] = turn_log.turn_id
+            return result
+        finally:
+            failed = result is None or not result.get("success")
+            if failed:
+                turn_span.set_status(tracing.STATUS_ERROR, "chat turn failed")
+            structured_logging.end_turn(turn_token, failed=failed)
+
+def annotate_turn_span(timing_info, **attributes):
+    """Copy the turn's timings (durations, token estimates, cache-hit flags) and `attributes` onto its span."""
+    turn_span = tracing.current_span()
+    if not turn_span.recording:
+        return
+    turn_span.set_attributes({f"voxareflect.timing.{key}": value for key, value in timing_info.items()})
+    turn_span.set_attributes(attributes)
+
+def run_chat_turn(payload, event_sink=None):
     if payload is None:
         payload = {}
     timing_info = {}
+    turn_started = time.perf_counter()
     def merge_timing_data(meta):
         if not isinstance(meta, dict):
             return
@@ -788,19 +1173,27 @@ def process_chat_turn(payload):
         "suggestion": "none"
     }
     title = "Laufende Reflexion" if language == "de" else "Ongoing Reflection"
+    conversation_lock = None
+    stage_for_prompt = ""
     try:
-        lock.acquire()
-        conversations = load("conversations")
-        lock.release()
+        # Held from the read below until the turn is written, so concurrent turns on
+        # the same conversation queue up while other conversations proceed in parallel.
+        lock_wait_started = time.perf_counter()
+        with tracing.span("conversation_lock.wait"):
+            conversation_lock = conversation_locks.acquire(username, conversationID)
+        timing_info["lock_wait"] = time.perf_counter() - lock_wait_started
         response = ""
         most_similar_question = None
         conversation_entry = None
-        existing_conversation = None
-        stage_for_prompt = ""
-        if username in conversations:
-            existing_conversation = conversation_with_id(conversations[username], conversationID)
+        store_load_started = time.perf_counter()
+        with tracing.span("store.load", **{"voxareflect.store": CONVERSATION_STORE_KIND}) as load_span:
+            existing_conversation = conversation_store.get_conversation(username, conversationID)
+            load_span.set_attribute("voxareflect.store.found", existing_conversation is not None)
             if existing_conversation is not None:
-                stage_for_prompt = existing_conversation.get("stage", "")
+                load_span.set_attribute("voxareflect.store.messages", len(existing_conversation.get("messages") or []))
+        timing_info["store_load"] = time.perf_counter() - store_load_started
+        if existing_conversation is not None:
+            stage_for_prompt = existing_conversation.get("stage", "")
         stored_turn_preset = None
         if existing_conversation is not None:
             stored_turn_preset = existing_conversation.get("turnPreset", TURN_PRESET_DEFAULT)
@@ -814,6 +1207,8 @@ def process_chat_turn(payload):
         phase_meta_payload["turnPreset"] = turn_preset
         phase_meta_payload["turnRules"] = phase_turn_rule
         phase_context_snapshot = build_phase_metadata(stage_for_prompt)
+        # Messages carry the phase they were exchanged in (used by the rolling summary).
+        message_phase = phase_context_snapshot.get("currentStage") or ""
         reflection_context = {
             "current_phase": phase_context_snapshot.get("currentStage"),
             "phase_is_finished": phase_context_snapshot.get("isFinished", False),
@@ -826,11 +1221,50 @@ def process_chat_turn(payload):
         reflection_context["phase_turn_min"] = phase_turn_rule.get("min", 0)
         reflection_context["phase_turn_max"] = phase_turn_rule.get("max", DEFAULT_TURN_CAP)
         reflection_context["skip_phase_classifier"] = skip_classifier_due_to_min
+        reflection_context["defer_summary"] = BACKGROUND_SUMMARY_ENABLED
+        # Same count advance_stage_if_needed sees after this turn, so cap decisions agree.
+        stored_phase_turns = existing_conversation.get("phaseTurns", {}) if existing_conversation is not None else {}
+        reflection_context["phase_turns_after_reply"] = stored_phase_turns.get(phase_context_snapshot.get("currentStage") or "", 0) + 1
+        reflection_context["is_canned_prompt"] = is_canned_prompt(newMessage)
+        reflection_context["rolling_summary"] = existing_conversation.get("rollingSummary") if existing_conversation is not None else None
+        reflection_context["phase_digests"] = existing_conversation.get("phaseDigests") if existing_conversation is not None else None
         reflection_summary = None
-        if not (username in conversations):
+        ideas_prefix = ""
+        tts_pipeline = None
+        if tts_config.get("pipeline") and tts_config["mode"] != "none" and tts_config["endpoint"] != "":
+            tts_pipeline = TtsSentencePipeline(style_preset, requested_voice, turn_started, event_sink=event_sink)
+        model_event_sink = None
+        if event_sink is not None or tts_pipeline is not None:
+            def emit_reply_event(name, data):
+                if tts_pipeline is not None:
+                    if name == "delta":
+                        tts_pipeline.feed(data.get("text", ""))
+                    elif name == "reset":
+                        tts_pipeline.reset()
+                if event_sink is not None:
+                    event_sink(name, data)
+            def forward_model_event(name, data):
+                if name == "phase":
+                    data = dict(data)
+                    data["stage"] = stage_for_prompt
+                    data["turnPreset"] = turn_preset
+                    emit_reply_event(name, data)
+                    if ideas_prefix:
+                        emit_reply_event("delta", {"text": ideas_prefix})
+                    return
+                if name == "reset" and ideas_prefix:
+                    emit_reply_event(name, data)
+                    emit_reply_event("delta", {"text": ideas_prefix})
+                    return
+                emit_reply_event(name, data)
+            model_event_sink = forward_model_event
+        # Only the fields and messages touched by this turn are written back.
+        updated_fields = {}
+        new_messages = []
+        if existing_conversation is None:
             reflection_context["phase_turns_elapsed"] = 0
             response, most_similar_question, response_meta = askModel(
-                newMessage, language, reflection_context=reflection_context, conversation_history=[]
+                newMessage, language, reflection_context=reflection_context, conversation_history=[], on_event=model_event_sink
             )
             phase_meta_payload["suggestion"] = response_meta.get("phaseSuggestion", "none")
             phase_meta_payload["calculatedNextPhase"] = response_meta.get("calculatedNextPhase", None)
@@ -838,112 +1272,69 @@ def process_chat_turn(payload):
             merge_timing_data(response_meta.get("timings"))
             initial_stage = setOfStages[0] if len(setOfStages) > 0 else ""
             conversation_entry = {
-                "id": 0,
+                "id": None,
                 "title": ("Laufende Reflexion" if language == "de" else "Ongoing Reflection"),
                 "studyGroup": studyGroup_to_save,
                 "time": current_time,
                 "text": "",
                 "stage": initial_stage,
                 "turnPreset": turn_preset,
-                "messages": [
-                    {
-                        "sender": "user",
-                        "content": newMessage,
-                        "buttons": [],
-                        "video": "",
-                        "time": current_time
-                    },
-                    {
-                        "sender": "system",
-                        "content": response,
-                        "buttons": most_similar_question.buttons,
-                        "video": most_similar_question.video,
-                        "time": current_time
-                    }
-                ]
+                "messages": []
             }
-            conversations[username] = [conversation_entry]
         else:
-            if existing_conversation is None:
-                new_id = len(conversations[username])
-                reflection_context["phase_turns_elapsed"] = 0
-                response, most_similar_question, response_meta = askModel(
-                    newMessage, language, reflection_context=reflection_context, conversation_history=[]
-                )
-                phase_meta_payload["suggestion"] = response_meta.get("phaseSuggestion", "none")
-                phase_meta_payload["calculatedNextPhase"] = response_meta.get("calculatedNextPhase", None)
-                reflection_summary = response_meta.get("reflectionSummary", None)
-                merge_timing_data(response_meta.get("timings"))
-                initial_stage = setOfStages[0] if len(setOfStages) > 0 else ""
-                conversation_entry = {
-                    "id": new_id,
-                    "title": ("Laufende Reflexion" if language == "de" else "Ongoing Reflection"),
-                    "studyGroup": studyGroup_to_save,
-                    "time": current_time,
-                    "text": "",
-                    "stage": initial_stage,
-                    "turnPreset": turn_preset,
-                    "messages": [
-                        {
-                            "sender": "user",
-                            "content": newMessage,
-                            "buttons": [],
-                            "video": "",
-                            "time": current_time
-                        },
-                        {
-                            "sender": "system",
-                            "content": response,
-                            "buttons": most_similar_question.buttons,
-                            "video": most_similar_question.video,
-                            "time": current_time
-                        }
-                    ]
-                }
-                conversations[username].append(conversation_entry)
-            else:
-                conversation_entry = existing_conversation
-                conversation_entry["turnPreset"] = turn_preset
-                reflection_context["phase_turns_elapsed"] = conversation_entry.get("currentPhaseTurns", 0)
-                response, most_similar_question, response_meta = askModel(
-                    newMessage, language, currentText, reflection_context=reflection_context, conversation_history=conversation_entry.get("messages", [])
-                )
-                phase_meta_payload["suggestion"] = response_meta.get("phaseSuggestion", "none")
-                phase_meta_payload["calculatedNextPhase"] = response_meta.get("calculatedNextPhase", None)
-                reflection_summary = response_meta.get("reflectionSummary", None)
-                merge_timing_data(response_meta.get("timings"))
-                
-                if reflection_summary:
-                    conversation_entry["summary"] = reflection_summary
-                    print(f"Stored reflection summary ({len(reflection_summary)} chars)")
-                
-                gibMirText = "Gib mir einige praktische Ideen, wie ich mit dem Schreiben meines reflektierenden Textes nach dem Gibbs-Modell beginnen kann." if language == "de" else "Give me some practical ideas on how to start writing my reflective text using the Gibbs model."
-                if newMessage == gibMirText:
-                    response = ("Ideen für reflektierendes Schreiben:\n" if language == "de" else "Ideas for reflective writing:\n") + response
-                title = conversation_entry["title"]
-                if len(str(currentText).strip()) > 1:
-                    conversation_entry["text"] = str(currentText)
-                conversation_entry["messages"].append(
-                    {
-                        "sender": "user",
-                        "content": newMessage,
-                        "buttons": [],
-                        "video": "",
-                        "time": current_time
-                    }
-                )
-                conversation_entry["messages"].append(
-                    {
-                        "sender": "system",
-                        "content": response,
-                        "buttons": most_similar_question.buttons,
-                        "video": most_similar_question.video,
-                        "time": current_time
-                    }
-                )
+            conversation_entry = existing_conversation
+            conversation_entry["turnPreset"] = turn_preset
+            updated_fields["turnPreset"] = turn_preset
+            reflection_context["phase_turns_elapsed"] = conversation_entry.get("currentPhaseTurns", 0)
+            gibMirText = gibMirTexts["de"] if language == "de" else gibMirTexts["en"]
+            ideas_prefix = ("Ideen für reflektierendes Schreiben:\n" if language == "de" else "Ideas for reflective writing:\n") if newMessage == gibMirText else ""
+            response, most_similar_question, response_meta = askModel(
+                newMessage, language, currentText, reflection_context=reflection_context, conversation_history=conversation_entry.get("messages", []), on_event=model_event_sink
+            )
+            phase_meta_payload["suggestion"] = response_meta.get("phaseSuggestion", "none")
+            phase_meta_payload["calculatedNextPhase"] = response_meta.get("calculatedNextPhase", None)
+            reflection_summary = response_meta.get("reflectionSummary", None)
+            merge_timing_data(response_meta.get("timings"))
+
+            if ideas_prefix:
+                response = ideas_prefix + response
+            title = conversation_entry["title"]
+            if len(str(currentText).strip()) > 1:
+                conversation_entry["text"] = str(currentText)
+                updated_fields["text"] = conversation_entry["text"]
+        new_messages.append(
+            {
+                "sender": "user",
+                "content": newMessage,
+                "buttons": [],
+                "video": "",
+                "time": current_time,
+                "phase": message_phase
+            }
+        )
+        new_messages.append(
+            {
+                "sender": "system",
+                "content": response,
+                "buttons": most_similar_question.buttons,
+                "video": most_similar_question.video,
+                "time": current_time,
+                "phase": message_phase
+            }
+        )
+        summary_request = response_meta.get("summaryRequest")
+        rolling_summary = response_meta.get("rollingSummary")
+        if rolling_summary is not None:
+            conversation_entry["rollingSummary"] = rolling_summary
+            updated_fields["rollingSummary"] = rolling_summary
+        if summary_request:
+            conversation_entry["summaryStatus"] = "pending"
+            updated_fields["summaryStatus"] = "pending"
         if reflection_summary:
             conversation_entry["summary"] = reflection_summary
-            conversation_entry["messages"].append(
+            updated_fields["summary"] = reflection_summary
+            logger.info("Stored reflection summary (%d chars)", len(reflection_summary))
+            new_messages.append(
                 {
                     "sender": "system",
                     "content": reflection_summary,
@@ -952,8 +1343,6 @@ def process_chat_turn(payload):
                     "time": current_time
                 }
             )
-        if conversation_entry is None:
-            raise Exception("Conversation could not be created or retrieved.")
         phase_turns_map = conversation_entry.setdefault("phaseTurns", {})
         current_phase_for_turns = phase_context_snapshot.get("currentStage") or ""
         current_phase_turn_rule = get_phase_turn_rule(current_phase_for_turns, turn_preset)
@@ -972,57 +1361,139 @@ def process_chat_turn(payload):
             turns_elapsed=new_turn_total,
             turn_rule=current_phase_turn_rule
         )
-        print(f"DEBUG: Stage update: {current_stage_value} -> {updated_stage_value} (suggestion: {suggestion_value}, calculated: {calculated_next_phase_value})")
+        logger.debug("Stage update: %s -> %s (suggestion: %s, calculated: %s)", current_stage_value, updated_stage_value, suggestion_value, calculated_next_phase_value)
         conversation_entry["stage"] = updated_stage_value
 
         updated_phase_snapshot = build_phase_metadata(updated_stage_value)
         updated_phase_name = updated_phase_snapshot.get("currentStage")
+        finished_phase_messages = None
         if updated_phase_name and updated_phase_name != current_phase_for_turns:
             conversation_entry["currentPhaseTurns"] = 0
+            if PHASE_DIGESTS_ENABLED and current_phase_for_turns and updated_stage_value != "done":
+                previous_messages = existing_conversation.get("messages", []) if existing_conversation is not None else []
+                finished_phase_messages = [
+                    message for message in list(previous_messages) + new_messages
+                    if message.get("phase") == current_phase_for_turns
+                ]
         else:
             conversation_entry["currentPhaseTurns"] = new_turn_total
+        updated_fields["phaseTurns"] = phase_turns_map
+        updated_fields["stage"] = conversation_entry["stage"]
+        updated_fields["currentPhaseTurns"] = conversation_entry["currentPhaseTurns"]
+        store_save_started = time.perf_counter()
+        with tracing.span("store.save", **{
+            "voxareflect.store": CONVERSATION_STORE_KIND,
+            "voxareflect.store.operation": "create" if existing_conversation is None else "append",
+            "voxareflect.store.new_messages": len(new_messages),
+            "voxareflect.store.fields": sorted(updated_fields)
+        }):
+            if existing_conversation is None:
+                conversation_entry["messages"] = new_messages
+                conversation_entry = conversation_store.create_conversation(username, conversation_entry)
+            elif not conversation_store.append_messages(username, conversation_entry["id"], new_messages, updated_fields):
+                raise Exception("Conversation could not be created or retrieved.")
+        timing_info["store_save"] = time.perf_counter() - store_save_started
+        conversation_locks.release(conversation_lock)
+        conversation_lock = None
+        summary_job_id = None
+        if summary_request:
+            summary_job_id = start_summary_job(username, conversation_entry["id"], summary_request)
+        if finished_phase_messages:
+            # Own thread, like the summary job: a digest must not take a slot from the
+            # hedged and speculative calls on the shared LLM executor.
+            threading.Thread(
+                target=propagate(store_phase_digest),
+                args=(username, conversation_entry["id"], current_phase_for_turns, finished_phase_messages),
+                daemon=True
+            ).start()
         title = conversation_entry.get("title", title)
         to_return_text = conversation_entry.get("text", "")
         to_return_stage = conversation_entry.get("stage", "")
         conversation_id_to_return = conversation_entry.get("id", 0)
-        lock.acquire()
-        save("conversations", conversations)
-        lock.release()
         phase_info = build_phase_metadata(conversation_entry.get("stage", ""))
         if most_similar_question is None:
             most_similar_question = SimpleNamespace(buttons = [], video = "")
         tts_eligible = True if str(response).strip() != "" else False
         tts_start = time.perf_counter()
-        synthesized_audio, resolved_style = synthesize_speech(response, tts_eligible, style_preset, requested_voice)
-        timing_info["tts"] = time.perf_counter() - tts_start
-        tts_payload = {
-            "enabled": synthesized_audio is not None,
-            "mode": tts_config.get("mode", "none"),
-            "stylePreset": resolved_style["style_preset"],
-            "voice": resolved_style["voice"],
-            "allowedVoices": tts_config.get("allowed_voices", [])
-        }
-        if synthesized_audio is not None:
-            if has_request_context():
-                tts_payload["audioUrl"] = url_for('serve_tts_audio', audio_id=synthesized_audio["audio_id"])
-            else:
-                tts_payload["audioUrl"] = f"/tts/audio/{synthesized_audio['audio_id']}"
+        if tts_pipeline is not None:
+            if not tts_pipeline.received_text and tts_eligible:
+                tts_pipeline.feed(response)
+            tts_pipeline.finish()
+            # Only the first segment is awaited; later ones keep synthesizing behind /tts/stream.
+            with tracing.span("tts.first_audio_wait", **{"voxareflect.tts.segments": len(tts_pipeline.segments)}) as wait_span:
+                has_first_audio = tts_pipeline.wait_for_first_audio(tts_config.get("timeout", 15))
+                wait_span.set_attribute("voxareflect.tts.first_audio", has_first_audio)
+            timing_info["tts"] = time.perf_counter() - tts_start
+            if tts_pipeline.first_audio_seconds is not None:
+                timing_info["tts_first_audio"] = tts_pipeline.first_audio_seconds
+            resolved_style = get_tts_style_config(style_preset, requested_voice)
+            tts_payload = {
+                "enabled": has_first_audio,
+                "mode": tts_config.get("mode", "none"),
+                "stylePreset": resolved_style["style_preset"],
+                "voice": resolved_style["voice"],
+                "allowedVoices": tts_config.get("allowed_voices", [])
+            }
+            if has_first_audio:
+                tts_payload["pipelined"] = True
+                tts_payload["audioUrl"] = f"/tts/stream/{tts_pipeline.playlist_id}"
+                tts_payload["playlistUrl"] = f"/tts/playlist/{tts_pipeline.playlist_id}"
+        else:
+            synthesized_audio, resolved_style = synthesize_speech(response, tts_eligible, style_preset, requested_voice)
+            timing_info["tts"] = time.perf_counter() - tts_start
+            if synthesized_audio is not None:
+                timing_info["tts_first_audio"] = time.perf_counter() - turn_started
+            tts_payload = {
+                "enabled": synthesized_audio is not None,
+                "mode": tts_config.get("mode", "none"),
+                "stylePreset": resolved_style["style_preset"],
+                "voice": resolved_style["voice"],
+                "allowedVoices": tts_config.get("allowed_voices", [])
+            }
+            if synthesized_audio is not None:
+                if has_request_context():
+                    tts_payload["audioUrl"] = url_for('serve_tts_audio', audio_id=synthesized_audio["audio_id"])
+                else:
+                    tts_payload["audioUrl"] = f"/tts/audio/{synthesized_audio['audio_id']}"
 
+        timing_info["turn_total"] = time.perf_counter() - turn_started
         timing_labels = [
             ("transcription", "Whisper"),
             ("classification", "Classifier"),
+            ("response_first_token", "First token"),
             ("response_generation", "Response"),
-            ("tts", "TTS")
+            ("tts", "TTS"),
+            ("tts_first_audio", "First audio"),
+            ("lock_wait", "Lock wait"),
+            ("store_load", "Store load"),
+            ("store_save", "Store save"),
+            ("turn_total", "Turn")
         ]
         timing_parts = []
         for key, label in timing_labels:
             value = timing_info.get(key)
             if isinstance(value, (int, float)):
                 timing_parts.append(f"{label}: {value:.3f}s")
-        if timing_parts:
-            print("DEBUG: Turn timing summary => " + " | ".join(timing_parts))
-        else:
-            print("DEBUG: Turn timing summary => No timing data collected.")
+        logger.info("Turn completed: " + (" | ".join(timing_parts) or "no timing data"), extra={"fields": {
+            "conversationId": conversation_id_to_return,
+            "phase": current_phase_for_turns,
+            "stage": to_return_stage,
+            "language": language,
+            "timings": {key: round(value, 4) for key, value in timing_info.items()}
+        }})
+        metrics.record_turn(timing_info, current_phase_for_turns, language, "success", models=TURN_METRIC_MODELS)
+        annotate_turn_span(
+            timing_info,
+            **{
+                "voxareflect.conversation_id": conversation_id_to_return,
+                "voxareflect.phase": current_phase_for_turns,
+                "voxareflect.stage": to_return_stage,
+                "voxareflect.language": language,
+                "voxareflect.phase_suggestion": suggestion_value,
+                "voxareflect.reply_chars": len(str(response)),
+                "voxareflect.summary_pending": summary_job_id is not None
+            }
+        )
 
         return {
             "success": True,
@@ -1041,12 +1512,19 @@ def process_chat_turn(payload):
             "phase": phase_info,
             "phaseMeta": phase_meta_payload,
             "reflectionSummary": conversation_entry.get("summary", None),
-            "summaryMessage": reflection_summary
+            "summaryMessage": reflection_summary,
+            "summaryPending": summary_job_id is not None,
+            "summaryJobId": summary_job_id,
+            "timings": timing_info
         }
     except Exception as error:
-        print("Error in 'new_chat' ==>", error)
-        if lock.locked():
-            lock.release()
+        logger.exception("Error in 'new_chat'")
+        if conversation_lock is not None:
+            conversation_locks.release(conversation_lock)
+        timing_info["turn_total"] = time.perf_counter() - turn_started
+        metrics.record_turn(timing_info, build_phase_metadata(stage_for_prompt).get("currentStage"), language, "error", models=TURN_METRIC_MODELS)
+        annotate_turn_span(timing_info, **{"voxareflect.phase": build_phase_metadata(stage_for_prompt).get("currentStage"), "voxareflect.language": language})
+        tracing.current_span().record_exception(error)
         fallback_style = get_tts_style_config(style_preset, requested_voice)
         tts_payload = {
             "enabled": False,
@@ -1072,11 +1550,19 @@ def process_chat_turn(payload):
             "phase": build_phase_metadata(""),
             "phaseMeta": phase_meta_payload,
             "reflectionSummary": None,
-            "summaryMessage": None
+            "summaryMessage": None,
+            "summaryPending": False,
+            "summaryJobId": None,
+            "timings": timing_info
         }
 
-def process_voice_job_async(job_id, audio_path, payload):
+def process_voice_job_async(job_id, audio_path, payload, queued_at=None):
     update_voice_job(job_id, status="running", error=None)
+    job_span = tracing.start_span("voice_job", kind="consumer", attributes={
+        "voxareflect.voice_job_id": job_id,
+        "voxareflect.queue_wait_seconds": (time.perf_counter() - queued_at) if queued_at is not None else None
+    })
+    job_span_token = tracing.activate(job_span)
     try:
         language_hint = str((payload or {}).get("language", "") or "").strip()
         transcription_start = time.perf_counter()
@@ -1087,9 +1573,10 @@ def process_voice_job_async(job_id, audio_path, payload):
             }
             if language_hint != "":
                 transcription_kwargs["language"] = language_hint
-            transcription = openai_client.audio.transcriptions.create(**transcription_kwargs)
+            transcription = llm_gateway.transcriptions_create(**transcription_kwargs)
         transcription_duration = time.perf_counter() - transcription_start
         transcript_text = (getattr(transcription, "text", "") or "").strip()
+        job_span.set_attribute("voxareflect.transcript_chars", len(transcript_text))
         if transcript_text == "":
             raise ValueError("Transcription returned no text.")
         chat_payload = dict(payload or {})
@@ -1101,14 +1588,130 @@ def process_voice_job_async(job_id, audio_path, payload):
         chat_result["userMessage"] = transcript_text
         chat_result["transcript"] = transcript_text
         update_voice_job(job_id, status="completed", result=chat_result, error=None)
+        if not chat_result.get("success"):
+            job_span.set_status(tracing.STATUS_ERROR, "chat turn failed")
     except Exception as error:
-        print("Error in async voice job ==>", error)
+        logger.exception("Error in async voice job %s", job_id)
+        job_span.record_exception(error)
         update_voice_job(job_id, status="failed", error=str(error))
     finally:
         try:
             os.remove(audio_path)
         except Exception:
             pass
+        tracing.deactivate(job_span_token)
+        job_span.end()
+
+def store_phase_digest(username, conversation_id, phase_name, phase_messages):
+    """Digest a phase that was just left and merge it into the conversation's `phaseDigests`."""
+    with tracing.span("phase_digest_job", **{"voxareflect.phase": phase_name, "voxareflect.phase_messages": len(phase_messages)}) as digest_span:
+        try:
+            digest_text = chatomatic_engine.generate_phase_digest(phase_name, phase_messages)
+            digest_span.set_attribute("voxareflect.digest_chars", len(digest_text or ""))
+            if not digest_text:
+                return
+            with conversation_locks.hold(username, conversation_id), tracing.span("store.save", **{
+                "voxareflect.store": CONVERSATION_STORE_KIND, "voxareflect.store.operation": "update", "voxareflect.store.fields": ["phaseDigests"]
+            }):
+                conversation = conversation_store.get_conversation(username, conversation_id)
+                if conversation is None:
+                    return
+                phase_digests = dict(conversation.get("phaseDigests") or {})
+                phase_digests[phase_name] = digest_text
+                conversation_store.update_conversation(username, conversation_id, {"phaseDigests": phase_digests})
+        except Exception as error:
+            digest_span.record_exception(error)
+            logger.exception("Error storing phase digest")
+
+def start_summary_job(username, conversation_id, summary_request):
+    job_id = create_voice_job()
+    update_voice_job(job_id, status="queued", result=None, error=None, kind="summary", username=username, conversationID=conversation_id)
+    worker = threading.Thread(target=propagate(process_summary_job_async), args=(job_id, username, conversation_id, summary_request), daemon=True)
+    worker.start()
+    return job_id
+
+def process_summary_job_async(job_id, username, conversation_id, summary_request):
+    """Generate the reflection summary and append it to the conversation like the inline path does."""
+    update_voice_job(job_id, status="running", error=None)
+    with tracing.span("summary_job", kind="consumer", **{"voxareflect.summary_job_id": job_id, "voxareflect.conversation_id": conversation_id}) as summary_span:
+        try:
+            summary_start = time.perf_counter()
+            summary_text = chatomatic_engine.generate_summary(
+                summary_request.get("question", ""),
+                summary_request.get("reply", ""),
+                summary_request.get("reflective_text", ""),
+                summary_request.get("conversation_history", []),
+                phase_digests=summary_request.get("phase_digests")
+            )
+            summary_duration = time.perf_counter() - summary_start
+            if not summary_text:
+                raise ValueError("Summary generation returned no text.")
+            summary_message = {
+                "sender": "system",
+                "content": summary_text,
+                "buttons": [],
+                "video": "",
+                "time": time.time()
+            }
+            summary_span.set_attribute("voxareflect.summary_chars", len(summary_text))
+            with conversation_locks.hold(username, conversation_id), tracing.span("store.save", **{
+                "voxareflect.store": CONVERSATION_STORE_KIND, "voxareflect.store.operation": "append", "voxareflect.store.new_messages": 1
+            }):
+                stored = conversation_store.append_messages(
+                    username, conversation_id, [summary_message], {"summary": summary_text, "summaryStatus": "ready"}
+                )
+            if not stored:
+                raise Exception("Conversation could not be updated with the summary.")
+            logger.info("Stored background reflection summary (%d chars) in %.3fs", len(summary_text), summary_duration)
+            update_voice_job(job_id, status="completed", error=None, result={
+                "id": conversation_id,
+                "reflectionSummary": summary_text,
+                "summaryMessage": summary_message,
+                "summaryDuration": summary_duration
+            })
+        except Exception as error:
+            summary_span.record_exception(error)
+            logger.exception("Error in background summary job %s", job_id)
+            try:
+                with conversation_locks.hold(username, conversation_id):
+                    conversation_store.update_conversation(username, conversation_id, {"summaryStatus": "failed"})
+            except Exception as store_error:
+                logger.error("Could not record failed summary status: %s", store_error)
+            update_voice_job(job_id, status="failed", error=str(error))
+
+@app.route('/summaryStatus', methods=['GET', 'POST'])
+def summary_status():
+    """
+    Poll a background summary by `jobId`, or by `username` + `conversationID`
+    (answered from the stored conversation, so it also works after the job expired).
+    """
+    payload = request.get_json(silent=True) or {}
+    job_id = request.args.get('jobId') or payload.get('jobId')
+    if job_id:
+        job_entry = get_voice_job(job_id)
+        if job_entry is None or job_entry.get("kind") != "summary":
+            return jsonify({"success": False, "error": "Job not found"}), 404
+        return jsonify({
+            "success": True,
+            "status": job_entry.get("status", "pending"),
+            "result": job_entry.get("result"),
+            "error": job_entry.get("error")
+        })
+    username = str(request.args.get('username') or payload.get('username') or '')
+    conversation_id = parse_optional_int(request.args.get('conversationID', payload.get('conversationID')))
+    if username == "" or conversation_id is None:
+        return jsonify({"success": False, "error": "Missing jobId or username/conversationID"}), 400
+    conversation = conversation_store.get_conversation(username, conversation_id)
+    if conversation is None:
+        return jsonify({"success": False, "error": "Conversation not found"}), 404
+    summary_text = conversation.get("summary")
+    status_value = conversation.get("summaryStatus") or ("ready" if summary_text else "none")
+    return jsonify({
+        "success": True,
+        "status": "completed" if status_value == "ready" else status_value,
+        "result": {"id": conversation_id, "reflectionSummary": summary_text} if summary_text else None,
+        "error": None
+    })
 
 @app.route('/newChat', methods=['POST'])
 def new_chat():
@@ -1116,6 +1719,47 @@ def new_chat():
     result = process_chat_turn(payload)
     return jsonify(result)
 
+SSE_KEEPALIVE_SECONDS = 15.0
+
+def format_sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/newChat/stream', methods=['POST'])
+def new_chat_stream():
+    """
+    Server-sent-events variant of /newChat. Emits "phase" once the classifier has
+    decided, "delta" events with reply text as it is generated, and a "final" event
+    carrying the same body /newChat returns (stage, TTS URL, summary). The turn is
+    persisted before "final" is sent, even if the client disconnects earlier.
+    """
+    payload = request.get_json(force=True, silent=True) or {}
+    events = queue.Queue()
+
+    def run_turn():
+        result = None
+        try:
+            result = process_chat_turn(payload, event_sink=lambda name, data: events.put((name, data)))
+        finally:
+            events.put(("final", result if result is not None else {"success": False}))
+
+    threading.Thread(target=propagate(run_turn), daemon=True).start()
+
+    def generate():
+        while True:
+            try:
+                name, data = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse_event(name, data)
+            if name == "final":
+                break
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @app.route('/voiceJobStatus', methods=['GET'])
 def voice_job_status():
     job_id = request.args.get('jobId') or request.args.get('job_id')
@@ -1134,6 +1778,50 @@ def voice_job_status():
         "error": job_entry.get("error")
     })
 
+@app.route('/responseCache/stats', methods=['GET'])
+def response_cache_stats():
+    return jsonify({"success": True, "result": response_cache.stats()})
+
+def prewarm_response_cache():
+    """
+    Generate cached replies for every canned prompt (stage buttons and the ideas prompt)
+    per phase, language and style preset, using the default turn preset.
+    """
+    jobs = []
+    for language, stage_buttons in (("de", buttonsForEachStage_de), ("en", buttonsForEachStage_en)):
+        for stage_name in setOfStages:
+            if stage_name == "done":
+                continue
+            prompts = list(stage_buttons.get(stage_name, [])) + [gibMirTexts[language]]
+            turn_rule = get_phase_turn_rule(stage_name, TURN_PRESET_DEFAULT)
+            for style_preset in tts_config["style_instructions"].keys():
+                for prompt in prompts:
+                    context = {
+                        "current_phase": stage_name,
+                        "phase_is_finished": False,
+                        "style_preset": style_preset,
+                        "language": language,
+                        "phase_turns_elapsed": 0,
+                        "turn_preset": TURN_PRESET_DEFAULT,
+                        "phase_turn_min": 0,
+                        "phase_turn_max": turn_rule.get("max", DEFAULT_TURN_CAP),
+                        "is_canned_prompt": True
+                    }
+                    jobs.append(chatomatic.get_llm_executor().submit(
+                        chatomatic_engine.askGPT, prompt, language, "", context, []
+                    ))
+    failures = 0
+    for job in jobs:
+        try:
+            job.result()
+        except Exception as error:
+            failures += 1
+            logger.warning("Response cache prewarm failed: %s", error)
+    logger.info("Response cache prewarmed: %d entries (%d failures)", response_cache.stats()["entries"], failures)
+
+if response_cache.enabled and RESPONSE_CACHE_PREWARM:
+    threading.Thread(target=prewarm_response_cache, daemon=True).start()
+
 
 if __name__ == '__main__':
     app.run(host = '0.0.0.0', port = 5001, debug = True)
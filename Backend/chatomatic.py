@@ -1,9 +1,19 @@
 import json
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
 
 # Import the reflection system prompt builder
 from reflection_system_prompt import build_reflection_system_prompt, get_phase_metadata
+from phase_preclassifier import preclassify_phase, is_confident, should_audit, preclassifier_stats
+from response_cache import response_cache, carries_student_context
+from llm_gateway import LLMGateway, usage_attributes
+from context_builder import build_turn_context, estimate_tokens, update_rolling_summary, truncate_to_tokens, CONTEXT_MAX_MESSAGE_TOKENS
+from structured_logging import log_payload, propagate
+import tracing
+
+logger = logging.getLogger(__name__)
 
 # Try to load the model name from environment or use default
 import os
@@ -15,6 +25,64 @@ VOXAREFLECT_CLASSIFIER_MODEL = os.environ.get("VOXAREFLECT_CLASSIFIER_MODEL", ""
 if VOXAREFLECT_CLASSIFIER_MODEL == "":
     VOXAREFLECT_CLASSIFIER_MODEL = VOXAREFLECT_LLM_MODEL  # fall back to main model
 
+# Speculative mode starts the phase classifier and the reply for the likely
+# next phase(s) at the same time, so a turn costs max() instead of sum() of
+# the two round trips. "off" (default) keeps the sequential two-call flow.
+VOXAREFLECT_SPECULATIVE_PHASE = os.environ.get("VOXAREFLECT_SPECULATIVE_PHASE", "off").strip().lower() in ("1", "on", "true", "yes")
+# Above this confidence only the likely branch is generated instead of both.
+VOXAREFLECT_SPECULATIVE_CONFIDENCE = float(os.environ.get("VOXAREFLECT_SPECULATIVE_CONFIDENCE", "0.8"))
+VOXAREFLECT_LLM_WORKERS = int(os.environ.get("VOXAREFLECT_LLM_WORKERS", "16"))
+
+STAGE_SEQUENCE = ['Description', 'Feelings', 'Evaluation', 'Analysis', 'Conclusion', 'Action Plan', 'done']
+
+_llm_executor = None
+
+
+def get_llm_executor():
+    """Shared pool for LLM calls that run concurrently within one turn."""
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = ThreadPoolExecutor(max_workers=VOXAREFLECT_LLM_WORKERS, thread_name_prefix="llm")
+    return _llm_executor
+
+
+def extract_response_text(response):
+    """Return the text of a Responses API result (output_text or the first message text part)."""
+    if hasattr(response, "output_text") and response.output_text:
+        return response.output_text
+    output_items = getattr(response, "output", None)
+    if output_items is None:
+        return None
+    if not isinstance(output_items, list):
+        output_items = [output_items]
+    for item in output_items:
+        if getattr(item, "type", "") != "message":
+            continue
+        for content_item in getattr(item, "content", None) or []:
+            content_type = getattr(content_item, "type", "")
+            text_value = getattr(content_item, "text", None)
+            if text_value and content_type in ("output_text", "text", ""):
+                return text_value
+    return None
+
+
+def response_token_count(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return 0
+    total = getattr(usage, "total_tokens", None)
+    if isinstance(total, int):
+        return total
+    return int(getattr(usage, "input_tokens", 0) or 0) + int(getattr(usage, "output_tokens", 0) or 0)
+
+
+def next_stage(phase_name):
+    if phase_name in STAGE_SEQUENCE:
+        current_index = STAGE_SEQUENCE.index(phase_name)
+        if current_index < len(STAGE_SEQUENCE) - 1:
+            return STAGE_SEQUENCE[current_index + 1]
+    return phase_name
+
 
 class GPTResponse:
     def __init__(self, answers, buttons=None, video="", phase_suggestion="none", calculated_next_phase=None, reflection_summary=None):
@@ -26,10 +94,376 @@ class GPTResponse:
         self.reflection_summary = reflection_summary
 
 class Chatomatic:
-    def __init__(self, openai_client):
-        self.openai_client = openai_client
+    def __init__(self, openai_client, llm_gateway=None):
+        # Calls go through the gateway (timeouts, retries, circuit breaker, stats).
+        self.llm_gateway = llm_gateway if llm_gateway is not None else LLMGateway(openai_client)
+
+    @property
+    def openai_client(self):
+        return self.llm_gateway.client
+
+    @openai_client.setter
+    def openai_client(self, client):
+        self.llm_gateway.client = client
+
+    def _build_phase_decision_prompt(self, context, question, classifier_history_block):
+        current_phase_name = context.get('current_phase', 'Description')
+        phase_metadata = get_phase_metadata(current_phase_name)
+        criteria = phase_metadata.get("goal", "Student has addressed the current phase.")
+        depth_cue = phase_metadata.get("depth_cue", "Ask clarifying follow-ups if the response is vague.")
+        turn_target = phase_metadata.get("turn_target", 4)
+        context_turn_max = context.get("phase_turn_max")
+        if isinstance(context_turn_max, (int, float)):
+            turn_target = int(context_turn_max)
+        turn_minimum = context.get("phase_turn_min", 0)
+        turns_elapsed = context.get("phase_turns_elapsed", 0)
+
+        phase_decision_prompt = (
+            f"You are evaluating if a student can advance from the '{current_phase_name}' phase of Gibbs reflection.\n\n"
+            f"**Phase goal:** {criteria}\n"
+            f"**Depth cue:** {depth_cue}\n"
+            f"**Suggested maximum turns for this phase:** {turn_target}\n"
+        )
+        if isinstance(turn_minimum, int) and turn_minimum > 0:
+            phase_decision_prompt += f"**Minimum turns before evaluating advance:** {turn_minimum}\n"
+        phase_decision_prompt += (
+            f"**Turns used so far:** {turns_elapsed}\n\n"
+            f"**Student's response:** {question}\n"
+        )
+        if classifier_history_block:
+            phase_decision_prompt += f"{classifier_history_block}\n"
+        phase_decision_prompt += (
+            "\nAnalyze the depth and completeness of the student's response.\n"
+            "Use the turn guidance to keep the reflection moving: if the essentials are covered and the student reached the suggested maximum, lean toward \"advance\". Only choose \"stay\" when key elements are still missing, even if that exceeds the target.\n"
+            "Output ONLY a JSON object:\n"
+            '{"suggestion": "advance"} if criteria are clearly met\n'
+            '{"suggestion": "stay"} if response does not meet the criteria\n'
+        )
+        return phase_decision_prompt
+
+    def _run_phase_classifier(self, phase_decision_prompt, question, timings):
+        """Make the classifier call and return "stay", "advance" or "none"."""
+        log_payload(logger, "classifier_instructions", phase_decision_prompt, model=VOXAREFLECT_CLASSIFIER_MODEL)
+        log_payload(logger, "classifier_input", question, model=VOXAREFLECT_CLASSIFIER_MODEL)
+
+        classifier_start = time.perf_counter()
+        try:
+            phase_response = self.llm_gateway.responses_create(
+                "classifier",
+                timings=timings,
+                model=VOXAREFLECT_CLASSIFIER_MODEL,
+                instructions=phase_decision_prompt,
+                input=question,
+                temperature=1.0,
+                reasoning={"effort": "low"}
+            )
+        finally:
+            timings["classification"] = time.perf_counter() - classifier_start
+
+        phase_text = extract_response_text(phase_response)
+        phase_text = phase_text.strip() if isinstance(phase_text, str) else None
+        logger.debug("Phase decision text: %s", phase_text)
+
+        phase_suggestion = "none"
+        if phase_text:
+            try:
+                phase_text = phase_text.replace('```json', '').replace('```', '').strip()
+                phase_data = json.loads(phase_text)
+                phase_suggestion = phase_data.get("suggestion", "none").lower()
+                if phase_suggestion in ["stay", "advance", "none"]:
+                    logger.info("Phase classifier suggestion: %s", phase_suggestion, extra={"fields": {
+                        "suggestion": phase_suggestion, "seconds": round(timings["classification"], 3)
+                    }})
+                else:
+                    logger.warning("Unexpected phase suggestion: %s", phase_suggestion)
+                    phase_suggestion = "none"
+            except (json.JSONDecodeError, KeyError, AttributeError) as e:
+                logger.error("Failed to parse phase decision JSON: %s", e)
+                log_payload(logger, "classifier_output", phase_text)
+                phase_suggestion = "none"
+        return phase_suggestion
+
+    def _audit_local_decision(self, phase_decision_prompt, question, local_decision):
+        """Background check of a skipped classifier call, used only for the agreement rate."""
+        try:
+            llm_suggestion = self._run_phase_classifier(phase_decision_prompt, question, {})
+            preclassifier_stats.record_audit(local_decision, llm_suggestion)
+        except Exception as audit_error:
+            logger.warning("Pre-classifier audit call failed: %s: %s", type(audit_error).__name__, audit_error)
+
+    def _build_response_instructions(self, context, updated_phase, turn_context):
+        updated_context = dict(context)
+        updated_context["current_phase"] = updated_phase
+        updated_context["phase_is_finished"] = (updated_phase == "done")
+
+        updated_system_message = build_reflection_system_prompt(updated_context)
+        if turn_context["student_text"]:
+            updated_system_message += "\n\nThis is the reflective text of the student so far:\n" + turn_context["student_text"]
+        updated_system_message += turn_context["summary_block"] + turn_context["history_block"]
+        if updated_phase == "done":
+            updated_system_message += (
+                "\n\n# Final Turn Instructions\n"
+                "Thank the student for their last response, confirm the reflection is complete, and inform them you are generating a short summary that will appear next. "
+                "Do not include the summary itself in this reply."
+            )
+        return updated_system_message
+
+    def _request_response(self, instructions, question, timings=None):
+        """Make the response-generation call and return the raw API result."""
+        return self.llm_gateway.responses_create(
+            "reply",
+            timings=timings,
+            model=VOXAREFLECT_LLM_MODEL,
+            instructions=instructions,
+            input=question,
+            temperature=1.0,
+            reasoning={"effort": "low"}
+        )
+
+    def _stream_response(self, instructions, question, timings, on_event, started):
+        """
+        Stream the reply, forwarding each text delta as a "delta" event.
+        Returns a response-like object carrying the full text and usage.
+        """
+        stream = self.llm_gateway.responses_create(
+            "reply_stream",
+            model=VOXAREFLECT_LLM_MODEL,
+            instructions=instructions,
+            input=question,
+            temperature=1.0,
+            reasoning={"effort": "low"},
+            stream=True
+        )
+        parts = []
+        final_response = None
+        for event in stream:
+            event_type = getattr(event, "type", "")
+            if event_type == "response.output_text.delta":
+                delta = getattr(event, "delta", "") or ""
+                if delta == "":
+                    continue
+                if not parts:
+                    timings["response_first_token"] = time.perf_counter() - started
+                parts.append(delta)
+                on_event("delta", {"text": delta})
+            elif event_type == "response.completed":
+                final_response = getattr(event, "response", None)
+            elif event_type in ("response.failed", "error"):
+                raise RuntimeError(f"Streaming response failed: {event_type}")
+        text = "".join(parts)
+        if text == "" and final_response is not None:
+            text = extract_response_text(final_response) or ""
+        return SimpleNamespace(
+            id=getattr(final_response, "id", None),
+            output_text=text,
+            usage=getattr(final_response, "usage", None),
+            streamed=bool(parts)
+        )
+
+    def _generate_response(self, instructions, question, timings, on_event=None):
+        logger.debug("Generating reply (%d instruction chars)", len(instructions))
+        log_payload(logger, "reply_instructions", instructions, model=VOXAREFLECT_LLM_MODEL)
+        log_payload(logger, "reply_input", question, model=VOXAREFLECT_LLM_MODEL)
+
+        response_call_start = time.perf_counter()
+        with tracing.span("reply.generate", **{
+            "gen_ai.request.model": VOXAREFLECT_LLM_MODEL,
+            "voxareflect.instruction_chars": len(instructions),
+            "voxareflect.streamed": on_event is not None
+        }) as reply_span:
+            try:
+                if on_event is not None:
+                    msg = self._stream_response(instructions, question, timings, on_event, response_call_start)
+                else:
+                    msg = self._request_response(instructions, question, timings)
+            finally:
+                timings["response_generation"] = time.perf_counter() - response_call_start
+            reply_span.set_attributes(usage_attributes(msg))
+            reply_span.set_attribute("voxareflect.reply_chars", len(extract_response_text(msg) or ""))
+            if "response_first_token" in timings:
+                reply_span.set_attribute("voxareflect.first_token_seconds", timings["response_first_token"])
+        return msg
+
+    def _run_speculative_turn(self, context, question, turn_context, phase_decision_prompt, timings, local_decision):
+        """
+        Start the classifier and the reply branch(es) at once and keep the reply
+        whose phase matches the classifier's decision. The pre-classifier's lean
+        picks the branch; below VOXAREFLECT_SPECULATIVE_CONFIDENCE both are generated.
+        Returns (suggestion, updated_phase, msg).
+        """
+        current_phase = context.get("current_phase")
+        advance_phase = next_stage(current_phase)
+        likely = local_decision["suggestion"]
+        confidence = local_decision["confidence"]
+        branches = {"stay": current_phase, "advance": advance_phase}
+        if confidence >= VOXAREFLECT_SPECULATIVE_CONFIDENCE:
+            launched = [likely]
+        else:
+            launched = ["stay", "advance"]
+        if advance_phase == current_phase:
+            launched = ["stay"]
+
+        executor = get_llm_executor()
+        turn_start = time.perf_counter()
+        classifier_timings = {}
+        classifier_future = executor.submit(propagate(self._run_phase_classifier), phase_decision_prompt, question, classifier_timings)
+        branch_instructions = {}
+        branch_futures = {}
+        branch_started = {}
+        for branch in launched:
+            branch_instructions[branch] = self._build_response_instructions(context, branches[branch], turn_context)
+            branch_started[branch] = time.perf_counter()
+            branch_futures[branch] = executor.submit(propagate(self._request_response), branch_instructions[branch], question)
+        logger.debug("Speculative turn launched branches %s (likely %s, confidence %.2f)", launched, likely, confidence)
+
+        phase_suggestion = classifier_future.result()
+        timings.update(classifier_timings)
+        chosen = "advance" if (phase_suggestion == "advance" and advance_phase != current_phase) else "stay"
+        updated_phase = branches[chosen]
+
+        wasted_tokens = 0
+        for branch, future in branch_futures.items():
+            if branch == chosen:
+                continue
+            if future.cancel():
+                continue
+            if future.done() and future.exception() is None:
+                wasted_tokens += response_token_count(future.result()) or estimate_tokens(branch_instructions[branch])
+            else:
+                # Still running: the call cannot be aborted, so count its prompt as spent.
+                wasted_tokens += estimate_tokens(branch_instructions[branch]) + estimate_tokens(question)
+
+        if chosen in branch_futures:
+            msg = branch_futures[chosen].result()
+            timings["response_generation"] = time.perf_counter() - branch_started[chosen]
+            timings["speculative_hit"] = 1.0
+        else:
+            logger.info("Speculation missed (%s not launched); generating it now", chosen)
+            msg = self._generate_response(
+                self._build_response_instructions(context, updated_phase, turn_context),
+                question,
+                timings
+            )
+            timings["speculative_hit"] = 0.0
+        timings["speculative_branches"] = float(len(launched))
+        timings["speculative_wasted_tokens"] = float(wasted_tokens)
+        timings["speculative_turn"] = time.perf_counter() - turn_start
+        return phase_suggestion, updated_phase, msg
+
+    def generate_phase_digest(self, phase_name, phase_messages):
+        """
+        Short digest of what the student worked out in one phase, made with the
+        classifier model when the phase is left. Returns None on failure.
+        """
+        transcript_lines = []
+        for msg_item in phase_messages or []:
+            sender = "Student" if msg_item.get("sender") == "user" else "Coach"
+            transcript_lines.append(f"{sender}: {truncate_to_tokens(msg_item.get('content', ''), CONTEXT_MAX_MESSAGE_TOKENS)}")
+        if not transcript_lines:
+            return None
+        instructions = (
+            f"You condense one phase ('{phase_name}') of a student's Gibbs reflection into a digest for a later summary.\n"
+            "Write 2-4 sentences stating the concrete facts, feelings, judgements, insights or plans the student expressed. "
+            "Do not add advice or evaluation. Use the language of the conversation."
+        )
+        digest_start = time.perf_counter()
+        try:
+            digest_response = self.llm_gateway.responses_create(
+                "digest",
+                model=VOXAREFLECT_CLASSIFIER_MODEL,
+                instructions=instructions,
+                input="\n".join(transcript_lines),
+                temperature=1.0,
+                reasoning={"effort": "low"}
+            )
+        except Exception as digest_error:
+            logger.error("Phase digest for %s failed: %s: %s", phase_name, type(digest_error).__name__, digest_error)
+            return None
+        digest_text = extract_response_text(digest_response)
+        logger.info("Phase digest for %s (%d chars) in %.3fs", phase_name, len(digest_text or ""), time.perf_counter() - digest_start)
+        log_payload(logger, "phase_digest", digest_text, phase=phase_name)
+        return digest_text.strip() if isinstance(digest_text, str) and digest_text.strip() else None
+
+    def generate_summary(self, question, new_result, reflective_text, conversation_history, phase_digests=None):
+        """
+        Summarize a finished reflection (medium reasoning). Returns None on failure.
+        With `phase_digests`, digested phases are represented by their digest and only
+        messages of the remaining phases are sent verbatim.
+        """
+        logger.info("Generating reflection summary")
+        phase_digests = {phase: digest for phase, digest in (phase_digests or {}).items() if digest}
+
+        # Build full conversation history for summary
+        summary_context = (
+            "You are a reflective learning expert analyzing a completed student reflection.\n\n"
+            "The student has completed a Gibbs reflection cycle through a guided conversation. "
+            + ("Review the phase digests and the remaining conversation below to understand their journey.\n\n"
+               if phase_digests else "Review the entire conversation below to understand their journey.\n\n") +
+            "Provide a comprehensive summary that includes:\n\n"
+            "1. **Key Insights** (2-3 sentences): What did they learn? What connections did they make between their experience and theory?\n"
+            "2. **Action Plans** (bullet points): What concrete steps did they commit to? Be specific.\n"
+            "3. **Growth Observed** (1-2 sentences): How did their understanding evolve from description to action?\n\n"
+            "Keep it concise, actionable, and supportive.\n\n"
+            "Ensure that the language of the summary is the same as the language used in the conversation.\n\n"
+        )
 
-    def askGPT(self, question, language_for_app, current_text, reflection_context=None, conversation_history=None):
+        if phase_digests:
+            summary_context += "--- PHASE DIGESTS ---\n\n"
+            ordered_phases = [phase for phase in STAGE_SEQUENCE if phase in phase_digests]
+            ordered_phases += [phase for phase in phase_digests if phase not in STAGE_SEQUENCE]
+            for phase in ordered_phases:
+                summary_context += f"{phase}: {phase_digests[phase]}\n\n"
+        summary_context += "--- CONVERSATION HISTORY ---\n\n"
+
+        # Include the conversation history of every phase that has no digest
+        if conversation_history:
+            for msg_item in conversation_history:
+                if msg_item.get("phase") in phase_digests:
+                    continue
+                sender = "Student" if msg_item.get("sender") == "user" else "Coach"
+                summary_context += f"{sender}: {msg_item.get('content', '')}\n\n"
+
+        # Add current exchange
+        summary_context += f"Student: {question}\n\n"
+        summary_context += f"Coach: {new_result}\n\n"
+        summary_context += "--- END OF CONVERSATION ---\n\n"
+        summary_context += f"Student's accumulated reflection text:\n{reflective_text}\n\n"
+        summary_context += "Now provide your summary analysis in the correct language."
+
+        summary_text = None
+        try:
+            summary_response = self.llm_gateway.responses_create(
+                "summary",
+                model=VOXAREFLECT_LLM_MODEL,
+                instructions="You are an expert in reflective learning and student development. Analyze thoughtfully and provide actionable feedback.",
+                input=summary_context,
+                temperature=1.0,
+                reasoning={"effort": "medium"}
+            )
+
+            # Extract summary text
+            summary_text = extract_response_text(summary_response)
+
+            # Check for reasoning content
+            if hasattr(summary_response, 'reasoning') and summary_response.reasoning:
+                log_payload(logger, "summary_reasoning", summary_response.reasoning)
+
+            if summary_text:
+                logger.info("Generated summary (%d chars)", len(summary_text))
+                log_payload(logger, "summary", summary_text)
+            else:
+                logger.warning("Summary generation returned empty text")
+
+        except Exception as summary_error:
+            logger.error("Summary generation failed: %s: %s", type(summary_error).__name__, summary_error)
+            summary_text = None
+        return summary_text
+
+    def askGPT(self, question, language_for_app, current_text, reflection_context=None, conversation_history=None, on_event=None):
+        """
+        Run one coaching turn. When on_event(name, data) is given, a "phase" event is
+        emitted once the phase decision is known and the reply is streamed as "delta" events.
+        """
         # Gather reflection-specific context for the system prompt builder.
         context = reflection_context or {
             "language": language_for_app,
@@ -39,265 +473,97 @@ class Chatomatic:
             "phase_turns_elapsed": 0,
         }
         timings = {}
-        skip_phase_classifier = bool(context.get("skip_phase_classifier", False))
-        # System prompt content lives in reflection_system_prompt.py for easier editing.
-        system_message = build_reflection_system_prompt(context)
-        if len(str(current_text).strip()) > 5:
-            system_message += "\n\nThis is the reflective text of the student so far:\n" + str(current_text).strip()
-        
-        # Build messages with recent conversation context (last 6 messages = 3 turns)
-        messages = [{"role": "system", "content": system_message}]
-        recent_history_block = ""
-        classifier_history_block = ""
-        if conversation_history and len(conversation_history) > 0:
-            recent_messages = conversation_history[-12:]  # Last 6 turns
-            formatted_history = []
-            for msg in recent_messages:
-                sender = msg.get("sender")
-                content = msg.get("content", "")
-                if sender == "user":
-                    formatted_history.append(f"Student: {content}")
-                    messages.append({"role": "user", "content": content})
-                elif sender == "system":
-                    formatted_history.append(f"Coach: {content}")
-                    messages.append({"role": "assistant", "content": content})
-            if formatted_history:
-                recent_history_block = "\n\nRecent conversation history (last 6 turns):\n" + "\n".join(formatted_history)
-
-            phase_turns_elapsed = int(context.get("phase_turns_elapsed", 0) or 0)
-            classifier_recent = []
-            if phase_turns_elapsed > 0:
-                classifier_slice_count = min(len(conversation_history), phase_turns_elapsed * 2)
-                classifier_recent = conversation_history[-classifier_slice_count:]
-            formatted_classifier_history = []
-            for msg in classifier_recent:
-                sender = msg.get("sender")
-                content = msg.get("content", "")
-                if sender == "user":
-                    formatted_classifier_history.append(f"Student: {content}")
-                elif sender == "system":
-                    formatted_classifier_history.append(f"Coach: {content}")
-            if formatted_classifier_history:
-                turn_label = "current phase"
-                if phase_turns_elapsed == 1:
-                    span_label = "last turn in current phase"
-                else:
-                    span_label = f"last {phase_turns_elapsed} turns in current phase"
-                classifier_history_block = f"\n\nRecent conversation history ({span_label}):\n" + "\n".join(formatted_classifier_history)
-        
-        # Add current question
-        messages.append({"role": "user", "content": question})
-        
+        # Student text, rolling summary and recent messages, sized to the token budget.
+        # The Chat Completions message list is only assembled if the fallback path is taken.
+        rolling_summary, rolling_summary_changed = update_rolling_summary(
+            context.get("rolling_summary"), conversation_history, context.get("current_phase")
+        )
+        turn_context = build_turn_context(
+            build_reflection_system_prompt(context), question, current_text, conversation_history,
+            rolling_summary=rolling_summary, phase_turns_elapsed=context.get("phase_turns_elapsed", 0)
+        )
+        timings["context_tokens"] = float(turn_context["estimated_tokens"])
+        timings["context_dropped_messages"] = float(turn_context["dropped_messages"])
+
         phase_suggestion = "none"
         new_result = ""
+        summary_request = None
         updated_phase = context.get("current_phase")  # Track potentially updated phase
-        
-        print("=" * 50)
-        print("DEBUG: Starting askGPT method")
-        print(f"DEBUG: Question: {question[:100]}...")
-        print(f"DEBUG: Current phase: {updated_phase}")
-        print("=" * 50)
-        
+
+        logger.debug("askGPT turn started", extra={"fields": {"phase": updated_phase, "questionChars": len(question or "")}})
+
         try:
             # ========== STEP 1: Phase Decision with Clear Criteria ==========
-            
-            current_phase_name = context.get('current_phase', 'Description')
-            phase_metadata = get_phase_metadata(current_phase_name)
-            criteria = phase_metadata.get("goal", "Student has addressed the current phase.")
-            depth_cue = phase_metadata.get("depth_cue", "Ask clarifying follow-ups if the response is vague.")
-            turn_target = phase_metadata.get("turn_target", 4)
-            context_turn_max = context.get("phase_turn_max")
-            if isinstance(context_turn_max, (int, float)):
-                turn_target = int(context_turn_max)
-            turn_minimum = context.get("phase_turn_min", 0)
-            turns_elapsed = context.get("phase_turns_elapsed", 0)
-            
-            phase_decision_prompt = (
-                f"You are evaluating if a student can advance from the '{current_phase_name}' phase of Gibbs reflection.\n\n"
-                f"**Phase goal:** {criteria}\n"
-                f"**Depth cue:** {depth_cue}\n"
-                f"**Suggested maximum turns for this phase:** {turn_target}\n"
-            )
-            if isinstance(turn_minimum, int) and turn_minimum > 0:
-                phase_decision_prompt += f"**Minimum turns before evaluating advance:** {turn_minimum}\n"
-            phase_decision_prompt += (
-                f"**Turns used so far:** {turns_elapsed}\n\n"
-                f"**Student's response:** {question}\n"
-            )
-            if classifier_history_block:
-                phase_decision_prompt += f"{classifier_history_block}\n"
-            phase_decision_prompt += (
-                "\nAnalyze the depth and completeness of the student's response.\n"
-                "Use the turn guidance to keep the reflection moving: if the essentials are covered and the student reached the suggested maximum, lean toward \"advance\". Only choose \"stay\" when key elements are still missing, even if that exceeds the target.\n"
-                "Output ONLY a JSON object:\n"
-                '{"suggestion": "advance"} if criteria are clearly met\n'
-                '{"suggestion": "stay"} if response does not meet the criteria\n'
-            )
+            phase_decision_prompt = self._build_phase_decision_prompt(context, question, turn_context["classifier_history_block"])
 
-            phase_response = None
-            if skip_phase_classifier:
-                print("DEBUG: Skipping phase decision classifier due to minimum turn requirement.")
-                phase_suggestion = "stay"
+            msg = None
+            local_decision = preclassify_phase(context, question)
+            skip_llm_classifier = is_confident(local_decision)
+            preclassifier_stats.record_decision(local_decision, skip_llm_classifier)
+            if skip_llm_classifier:
+                logger.info("Skipping phase decision classifier (%s, confidence %.2f) -> %s", local_decision["reason"], local_decision["confidence"], local_decision["suggestion"])
+                phase_suggestion = local_decision["suggestion"]
                 timings["classification"] = 0.0
+                timings["classifier_skipped"] = 1.0
+                if should_audit(local_decision):
+                    get_llm_executor().submit(propagate(self._audit_local_decision), phase_decision_prompt, question, local_decision)
+            elif VOXAREFLECT_SPECULATIVE_PHASE and updated_phase and on_event is None:
+                # Streaming turns use the sequential path so only the kept reply is streamed.
+                phase_suggestion, updated_phase, msg = self._run_speculative_turn(
+                    context, question, turn_context, phase_decision_prompt, timings, local_decision
+                )
+                if updated_phase != context.get("current_phase"):
+                    logger.info("Advancing phase from %s to %s", context.get("current_phase"), updated_phase)
             else:
-                print("=" * 70)
-                print("DEBUG: Phase decision classifier payload:")
-                print(f"MODEL: {VOXAREFLECT_CLASSIFIER_MODEL}")
-                print("INSTRUCTIONS:")
-                print(phase_decision_prompt)
-                print("-" * 70)
-                print("INPUT:")
-                print(question)
-                print("=" * 70)
-
-                classifier_start = time.perf_counter()
-                try:
-                    phase_response = self.openai_client.responses.create(
-                        model=VOXAREFLECT_CLASSIFIER_MODEL,
-                        instructions=phase_decision_prompt,
-                        input=question,
-                        temperature=1.0,
-                        reasoning={"effort": "low"}
-                    )
-                finally:
-                    timings["classification"] = time.perf_counter() - classifier_start
-
-                print("DEBUG: Phase decision API call completed")
-                print(f"DEBUG: Phase response type: {type(phase_response)}")
-                
-                # Parse JSON from text response
-                phase_text = None
-                if hasattr(phase_response, 'output_text') and phase_response.output_text:
-                    phase_text = phase_response.output_text.strip()
-                elif hasattr(phase_response, 'output') and isinstance(phase_response.output, list):
-                    for item in phase_response.output:
-                        if hasattr(item, 'type') and item.type == 'message':
-                            if hasattr(item, 'content') and isinstance(item.content, list):
-                                for content_item in item.content:
-                                    if hasattr(content_item, 'text'):
-                                        phase_text = content_item.text.strip()
-                                        break
-                        if phase_text:
-                            break
-                
-                print(f"DEBUG: Phase decision text: {phase_text}")
-                
-                # Parse the JSON
-                if phase_text:
-                    try:
-                        phase_text = phase_text.replace('```json', '').replace('```', '').strip()
-                        phase_data = json.loads(phase_text)
-                        phase_suggestion = phase_data.get("suggestion", "none").lower()
-                        if phase_suggestion in ["stay", "advance", "none"]:
-                            print(f"DEBUG: Phase suggestion parsed: {phase_suggestion}")
-                        else:
-                            print(f"WARNING: Unexpected phase suggestion: {phase_suggestion}")
-                            phase_suggestion = "none"
-                    except (json.JSONDecodeError, KeyError, AttributeError) as e:
-                        print(f"ERROR: Failed to parse phase decision JSON: {e}")
-                        phase_suggestion = "none"
-            
+                phase_suggestion = self._run_phase_classifier(phase_decision_prompt, question, timings)
+
             # ========== CALCULATE NEXT PHASE ==========
-            if phase_suggestion == "advance" and updated_phase:
-                stage_sequence = ['Description', 'Feelings', 'Evaluation', 'Analysis', 'Conclusion', 'Action Plan', 'done']
-                if updated_phase in stage_sequence:
-                    current_index = stage_sequence.index(updated_phase)
-                    if current_index < len(stage_sequence) - 1:
-                        updated_phase = stage_sequence[current_index + 1]
-                        print(f"DEBUG: Advancing phase from {context.get('current_phase')} to {updated_phase}")
-            
+            if msg is None and phase_suggestion == "advance" and updated_phase:
+                if updated_phase in STAGE_SEQUENCE and next_stage(updated_phase) != updated_phase:
+                    updated_phase = next_stage(updated_phase)
+                    logger.info("Advancing phase from %s to %s", context.get("current_phase"), updated_phase)
+
+            if on_event is not None:
+                on_event("phase", {"suggestion": phase_suggestion, "calculatedNextPhase": updated_phase})
+
             # ========== STEP 2: Response Generation with Clean Prompt ==========
-            updated_context = dict(context)
-            updated_context["current_phase"] = updated_phase
-            updated_context["phase_is_finished"] = (updated_phase == "done")
-            
-            # Clean prompt - no override needed!
-            updated_system_message = build_reflection_system_prompt(updated_context)
-            if len(str(current_text).strip()) > 5:
-                updated_system_message += "\n\nThis is the reflective text of the student so far:\n" + str(current_text).strip()
-            if recent_history_block:
-                updated_system_message += recent_history_block
-            if updated_phase == "done":
-                updated_system_message += (
-                    "\n\n# Final Turn Instructions\n"
-                    "Thank the student for their last response, confirm the reflection is complete, and inform them you are generating a short summary that will appear next. "
-                    "Do not include the summary itself in this reply."
+            response_cache_key = None
+            if msg is None:
+                response_cache_key = response_cache.key_for(
+                    question, updated_phase, context.get("language"), context.get("style_preset"),
+                    context.get("turn_preset"), is_canned_prompt=bool(context.get("is_canned_prompt"))
                 )
-            
-            print("=" * 70)
-            print("DEBUG: NOW CALLING STEP 2 - RESPONSE GENERATION (separate API call)")
-            print("=" * 70)
-            print(f"DEBUG: System message length: {len(updated_system_message)} chars")
-            print("=" * 70)
-            print("DEBUG: Response generation payload:")
-            print(f"MODEL: {VOXAREFLECT_LLM_MODEL}")
-            print("INSTRUCTIONS:")
-            print(updated_system_message)
-            print("-" * 70)
-            print("INPUT:")
-            print(question)
-            print("=" * 70)
-
-            response_call_start = time.perf_counter()
-            try:
-                msg = self.openai_client.responses.create(
-                    model=VOXAREFLECT_LLM_MODEL,
-                    instructions=updated_system_message,
-                    input=question,
-                    temperature=1.0,
-                    reasoning={"effort": "low"}
-                )
-            finally:
-                timings["response_generation"] = time.perf_counter() - response_call_start
+                cached_reply = response_cache.get(response_cache_key)
+                if cached_reply is not None:
+                    logger.info("Serving reply from response cache for phase %s", updated_phase)
+                    msg = SimpleNamespace(id="response-cache", output_text=cached_reply)
+                    timings["response_generation"] = 0.0
+                    timings["response_cache_hit"] = 1.0
+                    response_cache_key = None
+                    if on_event is not None:
+                        on_event("delta", {"text": cached_reply})
+            if msg is None:
+                updated_system_message = self._build_response_instructions(context, updated_phase, turn_context)
+                msg = self._generate_response(updated_system_message, question, timings, on_event=on_event)
+
+            logger.debug("Reply received (response id %s)", getattr(msg, "id", None))
 
-            print("DEBUG: STEP 2 COMPLETED")
-            print(f"DEBUG: Step 2 response type: {type(msg)}")
-            print(f"DEBUG: Step 2 response id: {getattr(msg, 'id', 'NO ID')}")
-            
             # Check for reasoning content
             if hasattr(msg, 'reasoning') and msg.reasoning:
-                print("=" * 70)
-                print("🧠 REASONING CONTENT:")
-                print("=" * 70)
-                print(msg.reasoning)
-                print("=" * 70)
-            else:
-                print("DEBUG: No reasoning content in response")
-            
-            print(f"DEBUG: Step 1 phase_response id: {getattr(phase_response, 'id', 'NO ID')}")
-            print(f"DEBUG: Are they the same object? {msg is phase_response}")
-            
+                log_payload(logger, "reply_reasoning", msg.reasoning)
+
             # Extract text response
-            new_result = None
-            
-            # Method 1: Direct output_text attribute
-            if hasattr(msg, "output_text") and msg.output_text:
-                new_result = msg.output_text
-                print(f"DEBUG: Got result from output_text")
-            
-            # Method 2: output attribute with message type
-            if not new_result and hasattr(msg, "output"):
-                output_items = msg.output if isinstance(msg.output, list) else [msg.output]
-                for item in output_items:
-                    item_type = getattr(item, "type", "")
-                    if item_type == "message":
-                        content_list = getattr(item, "content", [])
-                        for content_item in content_list:
-                            content_type = getattr(content_item, "type", "")
-                            if content_type == "output_text" or content_type == "text":
-                                text_value = getattr(content_item, "text", None)
-                                if text_value:
-                                    new_result = text_value
-                                    print(f"DEBUG: Got result from output[].content[].text")
-                                    break
-                    if new_result:
-                        break
-            
+            new_result = extract_response_text(msg)
+
             # Ensure we have a string, even if empty
             if not isinstance(new_result, str):
                 new_result = ""
-                print("WARNING: No valid response text found, using empty string")
-            
+                logger.warning("No valid response text found, using empty string")
+            # Only replies written without the student's text or history are shared through
+            # the cache; anything else could echo one student's words to another.
+            if not carries_student_context(current_text, conversation_history):
+                response_cache.put(response_cache_key, new_result)
+
             # ========== STEP 3: Generate Summary if Reflection Complete ==========
             summary_text = None
             reflective_text = str(current_text or "").strip()
@@ -310,104 +576,52 @@ class Chatomatic:
             # Check if we've reached the end of reflection
             if updated_phase == "done":
                 # Only skip if there is literally nothing to summarise
-                if has_reflection_content:
-                    print("=" * 70)
-                    print("SUMMARY: Generating reflection summary with medium reasoning")
-                    print("=" * 70)
-                    
-                    # Build full conversation history for summary
-                    summary_context = (
-                        "You are a reflective learning expert analyzing a completed student reflection.\n\n"
-                        "The student has completed a Gibbs reflection cycle through a guided conversation. "
-                        "Review the entire conversation below to understand their journey.\n\n"
-                        "Provide a comprehensive summary that includes:\n\n"
-                        "1. **Key Insights** (2-3 sentences): What did they learn? What connections did they make between their experience and theory?\n"
-                        "2. **Action Plans** (bullet points): What concrete steps did they commit to? Be specific.\n"
-                        "3. **Growth Observed** (1-2 sentences): How did their understanding evolve from description to action?\n\n"
-                        "Keep it concise, actionable, and supportive.\n\n"
-                        "Ensure that the language of the summary is the same as the language used in the conversation.\n\n"
-                        "--- CONVERSATION HISTORY ---\n\n"
+                if has_reflection_content and context.get("defer_summary"):
+                    # The caller generates the summary in the background from this request.
+                    summary_request = {
+                        "question": question,
+                        "reply": new_result,
+                        "reflective_text": reflective_text,
+                        "conversation_history": list(conversation_history or []),
+                        "phase_digests": context.get("phase_digests")
+                    }
+                elif has_reflection_content:
+                    summary_text = self.generate_summary(
+                        question, new_result, reflective_text, conversation_history, phase_digests=context.get("phase_digests")
                     )
-                    
-                    # Include FULL conversation history for summary
-                    if conversation_history:
-                        for msg_item in conversation_history:
-                            sender = "Student" if msg_item.get("sender") == "user" else "Coach"
-                            summary_context += f"{sender}: {msg_item.get('content', '')}\n\n"
-                    
-                    # Add current exchange
-                    summary_context += f"Student: {question}\n\n"
-                    summary_context += f"Coach: {new_result}\n\n"
-                    summary_context += "--- END OF CONVERSATION ---\n\n"
-                    summary_context += f"Student's accumulated reflection text:\n{reflective_text}\n\n"
-                    summary_context += "Now provide your summary analysis in the correct language."
-                    
-                    try:
-                        summary_response = self.openai_client.responses.create(
-                            model=VOXAREFLECT_LLM_MODEL,
-                            instructions="You are an expert in reflective learning and student development. Analyze thoughtfully and provide actionable feedback.",
-                            input=summary_context,
-                            temperature=1.0,
-                            reasoning={"effort": "medium"}
-                        )
-                        
-                        # Extract summary text
-                        if hasattr(summary_response, 'output_text') and summary_response.output_text:
-                            summary_text = summary_response.output_text
-                        elif hasattr(summary_response, 'output') and isinstance(summary_response.output, list):
-                            for item in summary_response.output:
-                                if hasattr(item, 'content') and isinstance(item.content, list):
-                                    for content_item in item.content:
-                                        if hasattr(content_item, 'text'):
-                                            summary_text = content_item.text
-                                            break
-                        
-                        # Check for reasoning content
-                        if hasattr(summary_response, 'reasoning') and summary_response.reasoning:
-                            print("=" * 70)
-                            print("SUMMARY REASONING:")
-                            print("=" * 70)
-                            print(summary_response.reasoning)
-                            print("=" * 70)
-                        
-                        if summary_text:
-                            print(f"DEBUG: Generated summary ({len(summary_text)} chars)")
-                        else:
-                            print("WARNING: Summary generation returned empty text")
-                    
-                    except Exception as summary_error:
-                        print(f"ERROR generating summary: {type(summary_error).__name__}: {summary_error}")
-                        summary_text = None
                 else:
-                    print("DEBUG: Skipping summary - no reflection content available")
+                    logger.info("Skipping summary - no reflection content available")
 
             # Validate phase_suggestion
             if phase_suggestion not in {"stay", "advance", "none"}:
                 phase_suggestion = "none"
         except Exception as e:
             # Fall back to the legacy chat completions API when the Responses API fails or is unavailable.
-            print(f"ERROR: Exception in Responses API: {type(e).__name__}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Responses API call failed (%s); using the Chat Completions fallback", type(e).__name__)
             
-            # Convert "system" to "developer" role for GPT-5.1 best practices
-            messages_updated = []
-            for msg_item in messages:
-                if msg_item["role"] == "system":
-                    messages_updated.append({"role": "developer", "content": msg_item["content"]})
-                else:
-                    messages_updated.append(msg_item)
+            # System prompt content lives in reflection_system_prompt.py for easier editing.
+            system_message = build_reflection_system_prompt(context)
+            if turn_context["student_text"]:
+                system_message += "\n\nThis is the reflective text of the student so far:\n" + turn_context["student_text"]
+            system_message += turn_context["summary_block"]
+            # Use the "developer" role for the system prompt (GPT-5.1 best practices)
+            messages_updated = [{"role": "developer", "content": system_message}] + turn_context["history_messages"]
+            messages_updated.append({"role": "user", "content": question})
             
-            print("DEBUG: Using fallback Chat Completions API")
             fallback_start = time.perf_counter()
-            msg = self.openai_client.chat.completions.create(
+            msg = self.llm_gateway.chat_completions_create(
+                "reply_fallback",
                 model=VOXAREFLECT_LLM_MODEL,
                 messages=messages_updated,
                 temperature=1.0  # GPT-5.1 requires temperature=1.0 exactly
             )
             timings["response_generation"] = time.perf_counter() - fallback_start
             new_result = msg.choices[0].message.content
-            print(f"DEBUG: Fallback result: {new_result[:100] if new_result else 'None'}...")
+            logger.info("Fallback reply received (%d chars)", len(new_result or ""))
+            if on_event is not None:
+                # Anything streamed before the failure is superseded by the fallback reply.
+                on_event("reset", {})
+                on_event("delta", {"text": new_result or ""})
             
             # Phase suggestion stays "none" in fallback since we can't determine it
             phase_suggestion = "none"
@@ -416,7 +630,7 @@ class Chatomatic:
         
         # CRITICAL: Ensure we never return None - frontend expects strings
         if new_result is None or not isinstance(new_result, str):
-            print(f"WARNING: new_result was {type(new_result)}, converting to empty string")
+            logger.warning("Reply was %s, converting to empty string", type(new_result).__name__)
             new_result = ""
         
         # Structured metadata hook for phase progression
@@ -425,14 +639,33 @@ class Chatomatic:
             "phaseSuggestion": phase_suggestion,
             "calculatedNextPhase": updated_phase,
             "reflectionSummary": summary_text,
+            "summaryRequest": summary_request,
+            "rollingSummary": rolling_summary if rolling_summary_changed else None,
             "timings": timings
         }
-        print(f"DEBUG: Returning meta: {meta}")
+        logger.debug("askGPT meta", extra={"fields": {"phaseSuggestion": phase_suggestion, "calculatedNextPhase": updated_phase, "timings": timings}})
         return new_result, meta
 
-    def answer(self, question, language_for_app, current_text, reflection_context=None, conversation_history=None):
+    def answer(self, question, language_for_app, current_text, reflection_context=None, conversation_history=None, on_event=None):
         # Generate response directly with GPT
-        completion, meta = self.askGPT(question, language_for_app, current_text, reflection_context, conversation_history=conversation_history)
+        with tracing.span("reflection.answer", **{
+            "voxareflect.phase": (reflection_context or {}).get("current_phase"),
+            "voxareflect.language": language_for_app,
+            "voxareflect.question_chars": len(question or ""),
+            "voxareflect.history_messages": len(conversation_history or []),
+            "voxareflect.streamed": on_event is not None
+        }) as answer_span:
+            completion, meta = self.askGPT(question, language_for_app, current_text, reflection_context, conversation_history=conversation_history, on_event=on_event)
+            turn_timings = meta.get("timings", {})
+            answer_span.set_attributes({
+                "voxareflect.phase_suggestion": meta.get("phaseSuggestion"),
+                "voxareflect.calculated_next_phase": meta.get("calculatedNextPhase"),
+                "voxareflect.context_tokens": int(turn_timings.get("context_tokens", 0)),
+                "voxareflect.classifier_skipped": bool(turn_timings.get("classifier_skipped")),
+                "voxareflect.response_cache.hit": bool(turn_timings.get("response_cache_hit")),
+                "voxareflect.speculative_hit": bool(turn_timings["speculative_hit"]) if "speculative_hit" in turn_timings else None,
+                "voxareflect.summary_inline": bool(meta.get("reflectionSummary"))
+            })
         
         # Create GPTResponse object
         gpt_response = GPTResponse(
@@ -446,8 +679,8 @@ class Chatomatic:
             "phaseSuggestion": meta.get("phaseSuggestion", "none"),
             "calculatedNextPhase": meta.get("calculatedNextPhase", None),
             "reflectionSummary": meta.get("reflectionSummary", None),
+            "summaryRequest": meta.get("summaryRequest", None),
+            "rollingSummary": meta.get("rollingSummary", None),
             "timings": meta.get("timings", {})
         }
-        
-        print(f"DEBUG answer(): Returning response_meta: {response_meta}")
         return completion, gpt_response, response_meta
@@ -0,0 +1,187 @@
+"""
+Token-budgeted context assembly for a chat turn.
+
+The reply call gets the system prompt, the student's reflective text, a
+rolling per-phase summary of older turns and as many recent messages as fit
+into `VOXAREFLECT_CONTEXT_TOKEN_BUDGET`. Tokens are estimated locally
+(about four characters per token), so no tokenizer or extra API call is
+needed. History is selected once and rendered either as a text block for the
+Responses API instructions or as chat messages for the Chat Completions
+fallback, never both.
+
+Messages that leave the recent window are folded into the rolling summary
+(short extractive snippets of the student's answers, grouped by phase). The
+summary is stored on the conversation as `rollingSummary` and only the new
+messages are processed on each turn.
+"""
+
+import os
+import re
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("VOXAREFLECT_CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_RECENT_MESSAGES = int(os.environ.get("VOXAREFLECT_CONTEXT_RECENT_MESSAGES", "12"))
+CONTEXT_MAX_TEXT_TOKENS = int(os.environ.get("VOXAREFLECT_CONTEXT_MAX_TEXT_TOKENS", "1500"))
+CONTEXT_MAX_MESSAGE_TOKENS = int(os.environ.get("VOXAREFLECT_CONTEXT_MAX_MESSAGE_TOKENS", "400"))
+SUMMARY_TOKENS_PER_PHASE = int(os.environ.get("VOXAREFLECT_CONTEXT_SUMMARY_TOKENS_PER_PHASE", "200"))
+SUMMARY_SNIPPET_TOKENS = 40
+# Room kept free for per-turn additions such as the final-turn instructions.
+RESERVED_TOKENS = 150
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+TRUNCATION_MARK = " […] "
+
+
+def estimate_tokens(text):
+    """Rough local token estimate (about four characters per token)."""
+    return max(1, len(str(text or "")) // 4)
+
+
+def truncate_to_tokens(text, max_tokens, keep="both"):
+    """
+    Shorten `text` to roughly `max_tokens`. `keep` selects which part survives:
+    "head", "tail", or "both" (start and end, with a marker in between).
+    """
+    text = str(text or "")
+    max_chars = max(0, int(max_tokens) * 4)
+    if len(text) <= max_chars:
+        return text
+    if max_chars == 0:
+        return ""
+    if keep == "head":
+        return text[:max_chars].rstrip() + TRUNCATION_MARK.rstrip()
+    if keep == "tail":
+        return TRUNCATION_MARK.lstrip() + text[-max_chars:].lstrip()
+    half = max_chars // 2
+    return text[:half].rstrip() + TRUNCATION_MARK + text[-half:].lstrip()
+
+
+def _first_sentence(text):
+    text = " ".join(str(text or "").split())
+    return SENTENCE_END.split(text, maxsplit=1)[0] if text else ""
+
+
+def _speaker(sender):
+    if sender == "user":
+        return "Student", "user"
+    if sender == "system":
+        return "Coach", "assistant"
+    return None, None
+
+
+def update_rolling_summary(rolling_summary, history, default_phase, recent_messages=CONTEXT_RECENT_MESSAGES):
+    """
+    Fold messages that have left the recent window into the per-phase summary.
+    Returns (summary, changed). Only student messages contribute, each as its
+    first sentence; every phase keeps its most recent snippets within
+    SUMMARY_TOKENS_PER_PHASE.
+    """
+    history = history or []
+    summary = {"phases": {}, "coveredCount": 0}
+    if isinstance(rolling_summary, dict):
+        summary["phases"] = {phase: list(items) for phase, items in (rolling_summary.get("phases") or {}).items()}
+        summary["coveredCount"] = int(rolling_summary.get("coveredCount", 0) or 0)
+    if summary["coveredCount"] > len(history):
+        # History was rewritten underneath us; start over.
+        summary = {"phases": {}, "coveredCount": 0}
+    target = max(0, len(history) - recent_messages)
+    if target <= summary["coveredCount"]:
+        return summary, False
+    for message in history[summary["coveredCount"]:target]:
+        if message.get("sender") != "user":
+            continue
+        snippet = truncate_to_tokens(_first_sentence(message.get("content", "")), SUMMARY_SNIPPET_TOKENS, keep="head")
+        if snippet == "":
+            continue
+        phase = message.get("phase") or default_phase or "Description"
+        items = summary["phases"].setdefault(phase, [])
+        items.append(snippet)
+        while len(items) > 1 and estimate_tokens(" / ".join(items)) > SUMMARY_TOKENS_PER_PHASE:
+            items.pop(0)
+    summary["coveredCount"] = target
+    return summary, True
+
+
+def render_rolling_summary(rolling_summary, max_tokens):
+    if not isinstance(rolling_summary, dict) or not rolling_summary.get("phases") or max_tokens <= 0:
+        return ""
+    lines = [f"- {phase}: {' / '.join(items)}" for phase, items in rolling_summary["phases"].items() if items]
+    if not lines:
+        return ""
+    block = "\n\nEarlier in this conversation (student answers, summarized by phase):\n" + "\n".join(lines)
+    return truncate_to_tokens(block, max_tokens, keep="tail")
+
+
+def build_turn_context(system_prompt, question, current_text, history, rolling_summary=None,
+                       phase_turns_elapsed=0, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Select what goes into the reply call around `system_prompt` and `question`.
+
+    Returns a dict with
+    - student_text: the reflective text, shortened to fit ("" when too short to matter)
+    - summary_block / history_block: text appended to the instructions
+    - history_messages: the same recent messages as chat messages (fallback path)
+    - classifier_history_block: the current phase's exchanges for the phase classifier
+    - estimated_tokens, dropped_messages: what the selection costs and left out
+    """
+    history = history or []
+    remaining = budget - estimate_tokens(system_prompt) - estimate_tokens(question) - RESERVED_TOKENS
+
+    student_text = str(current_text or "").strip()
+    if len(student_text) <= 5:
+        student_text = ""
+    if student_text:
+        student_text = truncate_to_tokens(student_text, max(0, min(CONTEXT_MAX_TEXT_TOKENS, int(remaining * 0.4))))
+        remaining -= estimate_tokens(student_text)
+
+    summary_block = render_rolling_summary(rolling_summary, max(0, int(remaining * 0.25)))
+    if summary_block:
+        remaining -= estimate_tokens(summary_block)
+
+    window = history[-CONTEXT_RECENT_MESSAGES:] if CONTEXT_RECENT_MESSAGES > 0 else []
+    selected = []
+    for message in reversed(window):
+        label, role = _speaker(message.get("sender"))
+        if label is None:
+            continue
+        content = truncate_to_tokens(message.get("content", ""), CONTEXT_MAX_MESSAGE_TOKENS)
+        cost = estimate_tokens(content) + 3
+        if cost > remaining:
+            break
+        remaining -= cost
+        selected.append((label, role, content))
+    selected.reverse()
+
+    history_block = ""
+    history_messages = []
+    if selected:
+        turn_count = (len(selected) + 1) // 2
+        history_block = f"\n\nRecent conversation history (last {turn_count} turns):\n" + "\n".join(
+            f"{label}: {content}" for label, _, content in selected
+        )
+        history_messages = [{"role": role, "content": content} for _, role, content in selected]
+
+    classifier_history_block = ""
+    phase_turns_elapsed = int(phase_turns_elapsed or 0)
+    if phase_turns_elapsed > 0 and history:
+        classifier_slice_count = min(len(history), phase_turns_elapsed * 2, CONTEXT_RECENT_MESSAGES or len(history))
+        classifier_lines = []
+        for message in history[-classifier_slice_count:]:
+            label, _ = _speaker(message.get("sender"))
+            if label is not None:
+                classifier_lines.append(f"{label}: {truncate_to_tokens(message.get('content', ''), CONTEXT_MAX_MESSAGE_TOKENS)}")
+        if classifier_lines:
+            if phase_turns_elapsed == 1:
+                span_label = "last turn in current phase"
+            else:
+                span_label = f"last {phase_turns_elapsed} turns in current phase"
+            classifier_history_block = f"\n\nRecent conversation history ({span_label}):\n" + "\n".join(classifier_lines)
+
+    return {
+        "student_text": student_text,
+        "summary_block": summary_block,
+        "history_block": history_block,
+        "history_messages": history_messages,
+        "classifier_history_block": classifier_history_block,
+        "estimated_tokens": budget - remaining - RESERVED_TOKENS,
+        "dropped_messages": len([m for m in window if _speaker(m.get("sender"))[0] is not None]) - len(selected)
+    }
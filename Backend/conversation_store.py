@@ -0,0 +1,1188 @@
+"""
+Conversation persistence for the reflection backend.
+
+`ConversationStore` describes the handful of operations app.py needs
+(list, fetch, create, append a turn, update fields). Three implementations
+are provided:
+
+- `JsonFileConversationStore` keeps the legacy `conversations.json` layout.
+- `SQLiteConversationStore` keeps conversations and messages in their own
+  tables (WAL mode) so a turn only touches the rows it changes.
+- `JournalConversationStore` keeps everything in memory, appends one
+  newline-delimited record per write to a journal and periodically folds
+  the journal into a snapshot.
+
+`CachedConversationStore` can wrap any of them to keep active users in
+memory and flush their changes in grouped commits.
+
+Run `python conversation_store.py migrate` to import an existing
+`conversations.json` into the SQLite database.
+"""
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JSON_PATH = "conversations.json"
+DEFAULT_SQLITE_PATH = "conversations.sqlite3"
+DEFAULT_JOURNAL_DIR = "conversation_journal"
+
+
+class ConversationStore:
+    """
+    Interface shared by every persistence backend.
+
+    Conversations are plain dicts in the shape the frontend already consumes
+    (id, title, studyGroup, time, text, stage, turnPreset, messages, ...).
+    Every write bumps the conversation's `revision` and `updatedAt`.
+    Every method returns copies, so callers may mutate results freely.
+    """
+
+    def has_user(self, username: str) -> bool:
+        raise NotImplementedError
+
+    def list_conversations(self, username: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def get_conversation(self, username: str, conversation_id: int) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list_conversation_headers(self, username: str) -> List[Dict]:
+        """
+        Conversations without their messages, each with a `messageCount`.
+        Backends override this when they can avoid loading message bodies.
+        """
+        return [_conversation_header(conversation) for conversation in self.list_conversations(username)]
+
+    def get_messages(self, username: str, conversation_id: int, before: Optional[int] = None, after: Optional[int] = None, limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Return a page of one conversation's messages, addressed by position.
+
+        Without cursors the newest `limit` messages are returned. `before`
+        pages backwards (messages with position < before), `after` pages
+        forwards (position > after). Returns None for unknown conversations,
+        otherwise {"messages", "start", "total", "nextCursor"} where
+        `nextCursor` is the `before` value for the previous page (None when
+        the start of the conversation is reached).
+        """
+        conversation = self.get_conversation(username, conversation_id)
+        if conversation is None:
+            return None
+        return _page_messages(conversation.get("messages", []), before, after, limit)
+
+    def create_conversation(self, username: str, conversation: Dict) -> Dict:
+        """
+        Insert a new conversation. When `conversation["id"]` is None the next
+        free id for the user is assigned. Returns the stored conversation.
+        """
+        raise NotImplementedError
+
+    def append_messages(self, username: str, conversation_id: int, messages: List[Dict], fields: Optional[Dict] = None) -> bool:
+        """
+        Append messages and optionally update top-level fields in one step.
+        Returns False when the conversation does not exist.
+        """
+        raise NotImplementedError
+
+    def update_conversation(self, username: str, conversation_id: int, fields: Dict) -> bool:
+        return self.append_messages(username, conversation_id, [], fields)
+
+    def apply_batch(self, records: List[Dict]) -> None:
+        """
+        Apply a list of write records in order. Records use the journal format:
+        {"op": "create", "username", "conversation"} or
+        {"op": "append", "username", "id", "messages", "fields"}.
+        Backends override this to commit the whole batch at once.
+        """
+        for record in records:
+            if record.get("op") == "create":
+                self.create_conversation(record["username"], record["conversation"])
+            elif record.get("op") == "append":
+                self.append_messages(record["username"], record["id"], record.get("messages") or [], record.get("fields"))
+
+    def export_all(self) -> Dict[str, List[Dict]]:
+        """Return every user's conversations in the legacy JSON layout."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _find_conversation(conversations, conversation_id):
+    for conversation in conversations:
+        if conversation.get("id") == conversation_id:
+            return conversation
+    return None
+
+
+def _next_conversation_id(conversations):
+    used_ids = [conversation.get("id", -1) for conversation in conversations if isinstance(conversation.get("id"), int)]
+    if not used_ids:
+        return 0
+    return max(max(used_ids) + 1, len(conversations))
+
+
+def _conversation_header(conversation):
+    header = {key: value for key, value in conversation.items() if key != "messages"}
+    header["messageCount"] = len(conversation.get("messages") or [])
+    return header
+
+
+def _page_bounds(total, before=None, after=None, limit=None):
+    """Translate cursor arguments into a [start, end) slice of a conversation."""
+    if after is not None:
+        start = max(0, int(after) + 1)
+        end = total if limit is None else min(total, start + int(limit))
+    else:
+        end = total if before is None else max(0, min(total, int(before)))
+        start = 0 if limit is None else max(0, end - int(limit))
+    return start, max(start, end)
+
+
+def _page_messages(messages, before=None, after=None, limit=None):
+    start, end = _page_bounds(len(messages), before, after, limit)
+    return {
+        "messages": copy.deepcopy(messages[start:end]),
+        "start": start,
+        "total": len(messages),
+        "nextCursor": start if start > 0 else None
+    }
+
+
+def _strip_messages(fields):
+    if not fields:
+        return {}
+    return {key: value for key, value in fields.items() if key != "messages"}
+
+
+def _stamp_created(conversation):
+    """Give a new conversation its first revision unless a caching layer already did."""
+    conversation.setdefault("revision", 1)
+    conversation.setdefault("updatedAt", time.time())
+    return conversation
+
+
+def _stamped_updates(conversation, fields):
+    """
+    Field updates for one write, including the bumped `revision` counter and
+    `updatedAt` timestamp used for delta sync. Values already present in
+    `fields` (e.g. assigned by the cache before a flush) are kept.
+    """
+    updates = _strip_messages(fields)
+    if "revision" not in updates:
+        updates["revision"] = int(conversation.get("revision", 0) or 0) + 1
+    if "updatedAt" not in updates:
+        updates["updatedAt"] = time.time()
+    return updates
+
+
+def conversation_updated_at(conversation):
+    """Last modification time; conversations written before revisions existed fall back to `time`."""
+    value = conversation.get("updatedAt", conversation.get("time", 0))
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+def _apply_journal_record(data, record):
+    """Apply one journal record to a legacy-layout dict. Used live and during recovery."""
+    operation = record.get("op")
+    username = record.get("username")
+    if operation == "create":
+        data.setdefault(username, []).append(_stamp_created(copy.deepcopy(record["conversation"])))
+    elif operation == "append":
+        conversation = _find_conversation(data.get(username, []), record.get("id"))
+        if conversation is not None:
+            conversation.update(_stamped_updates(conversation, record.get("fields")))
+            conversation.setdefault("messages", []).extend(copy.deepcopy(record.get("messages") or []))
+
+
+def _shallow_conversation_copy(conversation):
+    """Copy of a conversation that later `_apply_journal_record` calls cannot change."""
+    copied = dict(conversation)
+    if "messages" in copied:
+        copied["messages"] = list(copied["messages"])
+    return copied
+
+
+class JsonFileConversationStore(ConversationStore):
+    """
+    Legacy backend: the whole `conversations.json` file is read and rewritten
+    on every operation. Writes go through a temporary file so a crash never
+    leaves a half-written database behind.
+    """
+
+    def __init__(self, path: str = DEFAULT_JSON_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(self.path):
+            self._write({})
+
+    def _read(self):
+        with open(self.path, "r") as file:
+            return json.loads(file.read())
+
+    def _write(self, data):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(json.dumps(data, default=lambda o: o.__dict__, indent=2))
+        os.replace(temp_path, self.path)
+
+    def has_user(self, username):
+        with self._lock:
+            return username in self._read()
+
+    def list_conversations(self, username):
+        with self._lock:
+            return self._read().get(username, [])
+
+    def get_conversation(self, username, conversation_id):
+        with self._lock:
+            return _find_conversation(self._read().get(username, []), conversation_id)
+
+    def create_conversation(self, username, conversation):
+        with self._lock:
+            data = self._read()
+            user_conversations = data.setdefault(username, [])
+            entry = copy.deepcopy(conversation)
+            entry.setdefault("messages", [])
+            if entry.get("id") is None:
+                entry["id"] = _next_conversation_id(user_conversations)
+            _stamp_created(entry)
+            user_conversations.append(entry)
+            self._write(data)
+            return copy.deepcopy(entry)
+
+    def append_messages(self, username, conversation_id, messages, fields=None):
+        with self._lock:
+            data = self._read()
+            conversation = _find_conversation(data.get(username, []), conversation_id)
+            if conversation is None:
+                return False
+            conversation.update(_stamped_updates(conversation, fields))
+            conversation.setdefault("messages", []).extend(copy.deepcopy(messages or []))
+            self._write(data)
+            return True
+
+    def apply_batch(self, records):
+        if not records:
+            return
+        with self._lock:
+            data = self._read()
+            for record in records:
+                _apply_journal_record(data, record)
+            self._write(data)
+
+    def export_all(self):
+        with self._lock:
+            return self._read()
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    username TEXT NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (username, conversation_id)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    conversation_id INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation
+    ON messages (username, conversation_id, message_id);
+"""
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    SQLite backend in WAL mode. Conversation fields live in the
+    `conversations` table (one JSON document per row) and every message is
+    its own row in `messages`, so appending a turn inserts two or three
+    small rows instead of rewriting the whole database.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        connection = self._connection()
+        connection.executescript(_SQLITE_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def _load_messages(self, connection, username, conversation_id):
+        rows = connection.execute(
+            "SELECT data FROM messages WHERE username = ? AND conversation_id = ? ORDER BY message_id",
+            (username, conversation_id)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _insert_messages(self, connection, username, conversation_id, messages):
+        connection.executemany(
+            "INSERT INTO messages (username, conversation_id, data) VALUES (?, ?, ?)",
+            [(username, conversation_id, json.dumps(message, default=lambda o: o.__dict__)) for message in messages]
+        )
+
+    def has_user(self, username):
+        row = self._connection().execute(
+            "SELECT 1 FROM conversations WHERE username = ? LIMIT 1", (username,)
+        ).fetchone()
+        return row is not None
+
+    def list_conversations(self, username):
+        connection = self._connection()
+        conversation_rows = connection.execute(
+            "SELECT conversation_id, data FROM conversations WHERE username = ? ORDER BY rowid",
+            (username,)
+        ).fetchall()
+        message_rows = connection.execute(
+            "SELECT conversation_id, data FROM messages WHERE username = ? ORDER BY message_id",
+            (username,)
+        ).fetchall()
+        messages_by_conversation = {}
+        for conversation_id, message_data in message_rows:
+            messages_by_conversation.setdefault(conversation_id, []).append(json.loads(message_data))
+        conversations = []
+        for conversation_id, conversation_data in conversation_rows:
+            conversation = json.loads(conversation_data)
+            conversation["messages"] = messages_by_conversation.get(conversation_id, [])
+            conversations.append(conversation)
+        return conversations
+
+    def list_conversation_headers(self, username):
+        connection = self._connection()
+        conversation_rows = connection.execute(
+            "SELECT conversation_id, data FROM conversations WHERE username = ? ORDER BY rowid",
+            (username,)
+        ).fetchall()
+        counts = dict(connection.execute(
+            "SELECT conversation_id, COUNT(*) FROM messages WHERE username = ? GROUP BY conversation_id",
+            (username,)
+        ).fetchall())
+        headers = []
+        for conversation_id, conversation_data in conversation_rows:
+            header = json.loads(conversation_data)
+            header["messageCount"] = counts.get(conversation_id, 0)
+            headers.append(header)
+        return headers
+
+    def get_messages(self, username, conversation_id, before=None, after=None, limit=None):
+        connection = self._connection()
+        exists = connection.execute(
+            "SELECT 1 FROM conversations WHERE username = ? AND conversation_id = ?",
+            (username, conversation_id)
+        ).fetchone()
+        if exists is None:
+            return None
+        total = connection.execute(
+            "SELECT COUNT(*) FROM messages WHERE username = ? AND conversation_id = ?",
+            (username, conversation_id)
+        ).fetchone()[0]
+        start, end = _page_bounds(total, before, after, limit)
+        rows = connection.execute(
+            "SELECT data FROM messages WHERE username = ? AND conversation_id = ? ORDER BY message_id LIMIT ? OFFSET ?",
+            (username, conversation_id, end - start, start)
+        ).fetchall()
+        return {
+            "messages": [json.loads(row[0]) for row in rows],
+            "start": start,
+            "total": total,
+            "nextCursor": start if start > 0 else None
+        }
+
+    def get_conversation(self, username, conversation_id):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT data FROM conversations WHERE username = ? AND conversation_id = ?",
+            (username, conversation_id)
+        ).fetchone()
+        if row is None:
+            return None
+        conversation = json.loads(row[0])
+        conversation["messages"] = self._load_messages(connection, username, conversation_id)
+        return conversation
+
+    def _create_in_transaction(self, connection, username, conversation):
+        entry = copy.deepcopy(conversation)
+        messages = entry.pop("messages", None) or []
+        if entry.get("id") is None:
+            row = connection.execute(
+                "SELECT MAX(conversation_id), COUNT(*) FROM conversations WHERE username = ?",
+                (username,)
+            ).fetchone()
+            max_id, count = row
+            entry["id"] = 0 if max_id is None else max(max_id + 1, count)
+        _stamp_created(entry)
+        connection.execute(
+            "INSERT INTO conversations (username, conversation_id, data) VALUES (?, ?, ?)",
+            (username, entry["id"], json.dumps(entry, default=lambda o: o.__dict__))
+        )
+        self._insert_messages(connection, username, entry["id"], messages)
+        entry["messages"] = messages
+        return entry
+
+    def _append_in_transaction(self, connection, username, conversation_id, messages, fields):
+        row = connection.execute(
+            "SELECT data FROM conversations WHERE username = ? AND conversation_id = ?",
+            (username, conversation_id)
+        ).fetchone()
+        if row is None:
+            return False
+        conversation = json.loads(row[0])
+        conversation.update(_stamped_updates(conversation, fields))
+        connection.execute(
+            "UPDATE conversations SET data = ? WHERE username = ? AND conversation_id = ?",
+            (json.dumps(conversation, default=lambda o: o.__dict__), username, conversation_id)
+        )
+        if messages:
+            self._insert_messages(connection, username, conversation_id, messages)
+        return True
+
+    def _transaction(self, work):
+        connection = self._connection()
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(connection)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return result
+
+    def create_conversation(self, username, conversation):
+        return self._transaction(lambda connection: self._create_in_transaction(connection, username, conversation))
+
+    def append_messages(self, username, conversation_id, messages, fields=None):
+        return self._transaction(
+            lambda connection: self._append_in_transaction(connection, username, conversation_id, messages, fields)
+        )
+
+    def apply_batch(self, records):
+        if not records:
+            return
+
+        def apply_all(connection):
+            for record in records:
+                if record.get("op") == "create":
+                    self._create_in_transaction(connection, record["username"], record["conversation"])
+                elif record.get("op") == "append":
+                    self._append_in_transaction(
+                        connection, record["username"], record["id"], record.get("messages") or [], record.get("fields")
+                    )
+
+        self._transaction(apply_all)
+
+    def export_all(self):
+        connection = self._connection()
+        usernames = [row[0] for row in connection.execute(
+            "SELECT DISTINCT username FROM conversations ORDER BY username"
+        ).fetchall()]
+        return {username: self.list_conversations(username) for username in usernames}
+
+    def import_all(self, data: Dict[str, List[Dict]]) -> int:
+        """
+        Bulk-load conversations in the legacy JSON layout inside a single
+        transaction. Existing rows for the same (username, id) are replaced.
+        Returns the number of imported conversations.
+        """
+        connection = self._connection()
+        imported = 0
+        with self._write_lock:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                for username, conversations in (data or {}).items():
+                    for index, conversation in enumerate(conversations or []):
+                        entry = dict(conversation)
+                        messages = entry.pop("messages", None) or []
+                        if not isinstance(entry.get("id"), int):
+                            entry["id"] = index
+                        connection.execute(
+                            "DELETE FROM messages WHERE username = ? AND conversation_id = ?",
+                            (username, entry["id"])
+                        )
+                        connection.execute(
+                            "INSERT OR REPLACE INTO conversations (username, conversation_id, data) VALUES (?, ?, ?)",
+                            (username, entry["id"], json.dumps(entry, default=lambda o: o.__dict__))
+                        )
+                        self._insert_messages(connection, username, entry["id"], messages)
+                        imported += 1
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return imported
+
+    def is_empty(self) -> bool:
+        row = self._connection().execute("SELECT 1 FROM conversations LIMIT 1").fetchone()
+        return row is None
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class JournalConversationStore(ConversationStore):
+    """
+    Memory-resident store backed by an append-only journal.
+
+    Each write is applied in memory and queued as one JSON line. A writer
+    thread appends everything queued since its last pass and fsyncs once
+    per batch (group commit); callers return once their record is durable.
+    A compactor thread periodically writes the in-memory state to a
+    snapshot and starts a new journal segment, deleting the folded ones.
+    Startup recovery loads the snapshot and replays the newer records.
+
+    Files inside `directory`:
+    - snapshot.json             {"journalSeq": N, "conversations": {...}}
+    - journal-<segment>.jsonl   one record per line, each with a "seq"
+    """
+
+    def __init__(self, directory, seed_json_path=None, batch_window=0.005, compact_interval=300.0, compact_records=5000):
+        self.directory = directory
+        self.batch_window = batch_window
+        self.compact_interval = compact_interval
+        self.compact_records = compact_records
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._journal_condition = threading.Condition()
+        self._pending = []
+        self._last_seq = 0
+        self._durable_seq = 0
+        self._records_since_snapshot = 0
+        self._closed = False
+        self._writer_error = None
+        self._data = {}
+        self._segment = 0
+        self._recover(seed_json_path)
+        self._journal_file = open(self._segment_path(self._segment), "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._writer_loop, name="conversation-journal-writer", daemon=True)
+        self._writer.start()
+        self._compact_wakeup = threading.Event()
+        self._compactor = threading.Thread(target=self._compactor_loop, name="conversation-journal-compactor", daemon=True)
+        self._compactor.start()
+
+    # ----- files and recovery -----
+
+    def _snapshot_path(self):
+        return os.path.join(self.directory, "snapshot.json")
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"journal-{segment:08d}.jsonl")
+
+    def _segments(self):
+        segments = []
+        for path in glob.glob(os.path.join(self.directory, "journal-*.jsonl")):
+            name = os.path.basename(path)
+            try:
+                segments.append(int(name[len("journal-"):-len(".jsonl")]))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def _recover(self, seed_json_path):
+        snapshot_seq = 0
+        if os.path.exists(self._snapshot_path()):
+            with open(self._snapshot_path(), "r", encoding="utf-8") as file:
+                snapshot = json.loads(file.read())
+            self._data = snapshot.get("conversations", {})
+            snapshot_seq = int(snapshot.get("journalSeq", 0))
+        elif seed_json_path and os.path.exists(seed_json_path) and not self._segments():
+            with open(seed_json_path, "r") as file:
+                self._data = json.loads(file.read()) or {}
+            # Persist the seed before the first segment exists; otherwise the next boot
+            # finds a segment, skips the seed and replays the journal onto nothing.
+            self._write_snapshot(json.dumps({"journalSeq": 0, "conversations": self._data}, default=lambda o: o.__dict__))
+            logger.info("Seeded conversation journal from %s", seed_json_path)
+        self._last_seq = snapshot_seq
+        replayed = 0
+        segments = self._segments()
+        for segment in segments:
+            with open(self._segment_path(segment), "r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.strip()
+                    if line == "":
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write; everything before it is intact.
+                        logger.warning("Skipping unreadable journal record in segment %s", segment)
+                        continue
+                    seq = int(record.get("seq", 0))
+                    if seq <= snapshot_seq:
+                        continue
+                    _apply_journal_record(self._data, record)
+                    self._last_seq = max(self._last_seq, seq)
+                    replayed += 1
+        self._durable_seq = self._last_seq
+        self._records_since_snapshot = replayed
+        self._segment = (segments[-1] + 1) if segments else 0
+        if replayed:
+            logger.info("Recovered conversation journal: replayed %d records after snapshot seq %d", replayed, snapshot_seq)
+
+    # ----- journal writer (group commit) -----
+
+    def _log(self, record):
+        """Queue a record (caller holds self._lock) and return its sequence number."""
+        with self._journal_condition:
+            self._last_seq += 1
+            record["seq"] = self._last_seq
+            self._pending.append(json.dumps(record, default=lambda o: o.__dict__))
+            self._records_since_snapshot += 1
+            self._journal_condition.notify_all()
+            return self._last_seq
+
+    def _wait_durable(self, seq):
+        with self._journal_condition:
+            while self._durable_seq < seq and self._writer_error is None:
+                self._journal_condition.wait()
+            if self._writer_error is not None:
+                raise RuntimeError(f"Conversation journal write failed: {self._writer_error}")
+        if self._records_since_snapshot >= self.compact_records:
+            self._compact_wakeup.set()
+
+    def _writer_loop(self):
+        while True:
+            with self._journal_condition:
+                while not self._pending and not self._closed:
+                    self._journal_condition.wait()
+                if not self._pending and self._closed:
+                    return
+            if self.batch_window > 0:
+                # Let concurrent turns join this batch so they share one fsync.
+                time.sleep(self.batch_window)
+            with self._journal_condition:
+                batch = self._pending
+                self._pending = []
+                batch_seq = self._last_seq
+                journal_file = self._journal_file
+            try:
+                journal_file.write("\n".join(batch) + "\n")
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            except Exception as error:
+                with self._journal_condition:
+                    self._writer_error = error
+                    self._journal_condition.notify_all()
+                logger.exception("Conversation journal write failed")
+                return
+            with self._journal_condition:
+                self._durable_seq = max(self._durable_seq, batch_seq)
+                self._journal_condition.notify_all()
+
+    def _drain(self):
+        with self._journal_condition:
+            target = self._last_seq
+        self._wait_durable(target)
+
+    # ----- compaction -----
+
+    def _compactor_loop(self):
+        while not self._closed:
+            self._compact_wakeup.wait(self.compact_interval)
+            self._compact_wakeup.clear()
+            if self._closed:
+                return
+            if self._records_since_snapshot == 0:
+                continue
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Conversation journal compaction failed")
+
+    def _write_snapshot(self, snapshot_text):
+        """Atomically replace snapshot.json (temp file, fsync, rename)."""
+        temp_path = self._snapshot_path() + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(snapshot_text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self._snapshot_path())
+
+    def compact(self):
+        """Fold every journal segment into a fresh snapshot."""
+        with self._lock:
+            self._drain()
+            with self._journal_condition:
+                snapshot_seq = self._last_seq
+                old_segment = self._segment
+                self._segment += 1
+                old_file = self._journal_file
+                self._journal_file = open(self._segment_path(self._segment), "a", encoding="utf-8")
+                self._records_since_snapshot = 0
+            # Records only replace fields and append messages, so copying the lists and
+            # conversation dicts is enough to serialize this state without the lock.
+            conversations = {
+                username: [_shallow_conversation_copy(conversation) for conversation in user_conversations]
+                for username, user_conversations in self._data.items()
+            }
+        snapshot_text = json.dumps({"journalSeq": snapshot_seq, "conversations": conversations}, default=lambda o: o.__dict__)
+        old_file.close()
+        self._write_snapshot(snapshot_text)
+        for segment in self._segments():
+            if segment <= old_segment:
+                os.remove(self._segment_path(segment))
+        return snapshot_seq
+
+    # ----- ConversationStore API -----
+
+    def has_user(self, username):
+        with self._lock:
+            return username in self._data
+
+    def list_conversations(self, username):
+        with self._lock:
+            return copy.deepcopy(self._data.get(username, []))
+
+    def get_conversation(self, username, conversation_id):
+        with self._lock:
+            return copy.deepcopy(_find_conversation(self._data.get(username, []), conversation_id))
+
+    def list_conversation_headers(self, username):
+        with self._lock:
+            return copy.deepcopy([_conversation_header(conversation) for conversation in self._data.get(username, [])])
+
+    def get_messages(self, username, conversation_id, before=None, after=None, limit=None):
+        with self._lock:
+            conversation = _find_conversation(self._data.get(username, []), conversation_id)
+            if conversation is None:
+                return None
+            return _page_messages(conversation.get("messages", []), before, after, limit)
+
+    def create_conversation(self, username, conversation):
+        with self._lock:
+            entry = copy.deepcopy(conversation)
+            entry.setdefault("messages", [])
+            if entry.get("id") is None:
+                entry["id"] = _next_conversation_id(self._data.get(username, []))
+            _stamp_created(entry)
+            record = {"op": "create", "username": username, "conversation": entry}
+            _apply_journal_record(self._data, record)
+            seq = self._log(record)
+        self._wait_durable(seq)
+        return copy.deepcopy(entry)
+
+    def append_messages(self, username, conversation_id, messages, fields=None):
+        with self._lock:
+            conversation = _find_conversation(self._data.get(username, []), conversation_id)
+            if conversation is None:
+                return False
+            record = {
+                "op": "append",
+                "username": username,
+                "id": conversation_id,
+                "messages": list(messages or []),
+                "fields": _stamped_updates(conversation, fields)
+            }
+            _apply_journal_record(self._data, record)
+            seq = self._log(record)
+        self._wait_durable(seq)
+        return True
+
+    def apply_batch(self, records):
+        if not records:
+            return
+        seq = 0
+        with self._lock:
+            for record in records:
+                record = copy.deepcopy(record)
+                if record.get("op") == "create":
+                    if record["conversation"].get("id") is None:
+                        record["conversation"]["id"] = _next_conversation_id(self._data.get(record["username"], []))
+                    _stamp_created(record["conversation"])
+                elif record.get("op") == "append":
+                    conversation = _find_conversation(self._data.get(record["username"], []), record.get("id"))
+                    if conversation is not None:
+                        record["fields"] = _stamped_updates(conversation, record.get("fields"))
+                _apply_journal_record(self._data, record)
+                seq = self._log(record)
+        self._wait_durable(seq)
+
+    def export_all(self):
+        with self._lock:
+            return copy.deepcopy(self._data)
+
+    def close(self):
+        if self._closed:
+            return
+        self._drain()
+        with self._journal_condition:
+            self._closed = True
+            self._journal_condition.notify_all()
+        self._compact_wakeup.set()
+        # A compaction in progress swaps in a new journal file; let it finish first.
+        self._compactor.join()
+        self._writer.join(timeout=5)
+        self._journal_file.close()
+
+
+class CachedConversationStore(ConversationStore):
+    """
+    Resident cache in front of another store, for deployments where one
+    process owns the data.
+
+    A user's conversations are loaded from the backing store on first
+    access and kept as `{conversation id: conversation}`, so lookups by id
+    are O(1). Writes update the cache immediately and mark the conversation
+    dirty; dirty conversations are flushed to the backing store in one
+    `apply_batch` call once `flush_writes` writes have accumulated or every
+    `flush_interval` seconds. At most `max_users` users stay resident: the
+    least recently used user without unflushed writes is evicted first.
+    `close()` flushes everything that is still pending.
+    """
+
+    def __init__(self, backing: ConversationStore, max_users=500, flush_interval=1.0, flush_writes=50):
+        self.backing = backing
+        self.max_users = max(1, int(max_users))
+        self.flush_interval = flush_interval
+        self.flush_writes = max(1, int(flush_writes))
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._users = OrderedDict()
+        self._dirty = OrderedDict()
+        self._dirty_writes = 0
+        self._flushing_users = set()
+        self._closed = False
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "flushes": 0, "flushed_records": 0}
+        self._flush_wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="conversation-cache-flusher", daemon=True)
+        self._flusher.start()
+
+    # ----- residency -----
+
+    def _user_locked(self, username):
+        conversations = self._users.get(username)
+        if conversations is not None:
+            self._users.move_to_end(username)
+            self.stats["hits"] += 1
+            return conversations
+        self.stats["misses"] += 1
+        conversations = OrderedDict(
+            (conversation.get("id"), conversation) for conversation in self.backing.list_conversations(username)
+        )
+        self._users[username] = conversations
+        self._evict_locked(keep=username)
+        return conversations
+
+    def _evict_locked(self, keep=None):
+        if len(self._users) <= self.max_users:
+            return
+        # Users with pending or in-flight writes must stay resident, otherwise a
+        # reload from the backing store could miss changes not yet flushed.
+        dirty_users = {username for username, _ in self._dirty} | self._flushing_users
+        for username in list(self._users.keys()):
+            if len(self._users) <= self.max_users:
+                break
+            if username in dirty_users or username == keep:
+                continue
+            self._users.pop(username, None)
+            self.stats["evictions"] += 1
+        if len(self._users) > self.max_users:
+            # Every surplus user still has pending writes; flush soon so they become evictable.
+            self._flush_wakeup.set()
+
+    # ----- dirty tracking and flushing -----
+
+    def _mark_dirty_locked(self, username, conversation_id, messages=None, fields=None, created=False):
+        key = (username, conversation_id)
+        entry = self._dirty.get(key)
+        if entry is None:
+            entry = {"created": False, "messages": [], "fields": {}}
+            self._dirty[key] = entry
+        if created:
+            entry["created"] = True
+        entry["messages"].extend(copy.deepcopy(messages or []))
+        entry["fields"].update(copy.deepcopy(_strip_messages(fields)))
+        self._dirty_writes += 1
+        if self._dirty_writes >= self.flush_writes:
+            self._flush_wakeup.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_wakeup.wait(self.flush_interval)
+            self._flush_wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Conversation cache flush failed")
+
+    def flush(self) -> int:
+        """Write every dirty conversation to the backing store. Returns the record count."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                dirty = self._dirty
+                self._dirty = OrderedDict()
+                self._dirty_writes = 0
+                self._flushing_users = {username for username, _ in dirty}
+                records = []
+                for (username, conversation_id), entry in dirty.items():
+                    if entry["created"]:
+                        conversation = self._users.get(username, {}).get(conversation_id)
+                        records.append({"op": "create", "username": username, "conversation": copy.deepcopy(conversation)})
+                    else:
+                        records.append({
+                            "op": "append",
+                            "username": username,
+                            "id": conversation_id,
+                            "messages": entry["messages"],
+                            "fields": entry["fields"]
+                        })
+            try:
+                self.backing.apply_batch(records)
+            except Exception:
+                with self._lock:
+                    self._requeue_locked(dirty)
+                    self._flushing_users = set()
+                raise
+            with self._lock:
+                self._flushing_users = set()
+                self.stats["flushes"] += 1
+                self.stats["flushed_records"] += len(records)
+                self._evict_locked()
+            return len(records)
+
+    def _requeue_locked(self, failed):
+        newer = self._dirty
+        self._dirty = OrderedDict()
+        for key, entry in list(failed.items()) + list(newer.items()):
+            merged = self._dirty.get(key)
+            if merged is None:
+                self._dirty[key] = entry
+                continue
+            merged["created"] = merged["created"] or entry["created"]
+            merged["messages"].extend(entry["messages"])
+            merged["fields"].update(entry["fields"])
+        self._dirty_writes = len(self._dirty)
+
+    # ----- ConversationStore API -----
+
+    def has_user(self, username):
+        with self._lock:
+            return len(self._user_locked(username)) > 0
+
+    def list_conversations(self, username):
+        with self._lock:
+            return copy.deepcopy(list(self._user_locked(username).values()))
+
+    def get_conversation(self, username, conversation_id):
+        with self._lock:
+            return copy.deepcopy(self._user_locked(username).get(conversation_id))
+
+    def list_conversation_headers(self, username):
+        with self._lock:
+            return copy.deepcopy([_conversation_header(conversation) for conversation in self._user_locked(username).values()])
+
+    def get_messages(self, username, conversation_id, before=None, after=None, limit=None):
+        with self._lock:
+            conversation = self._user_locked(username).get(conversation_id)
+            if conversation is None:
+                return None
+            return _page_messages(conversation.get("messages", []), before, after, limit)
+
+    def create_conversation(self, username, conversation):
+        with self._lock:
+            conversations = self._user_locked(username)
+            entry = copy.deepcopy(conversation)
+            entry.setdefault("messages", [])
+            if entry.get("id") is None:
+                entry["id"] = _next_conversation_id(list(conversations.values()))
+            _stamp_created(entry)
+            conversations[entry["id"]] = entry
+            self._mark_dirty_locked(username, entry["id"], created=True)
+            return copy.deepcopy(entry)
+
+    def append_messages(self, username, conversation_id, messages, fields=None):
+        with self._lock:
+            conversation = self._user_locked(username).get(conversation_id)
+            if conversation is None:
+                return False
+            updates = _stamped_updates(conversation, fields)
+            conversation.update(copy.deepcopy(updates))
+            conversation.setdefault("messages", []).extend(copy.deepcopy(messages or []))
+            self._mark_dirty_locked(username, conversation_id, messages, updates)
+            return True
+
+    def export_all(self):
+        self.flush()
+        return self.backing.export_all()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_wakeup.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        self.backing.close()
+
+
+class ConversationLockHandle:
+    def __init__(self, key, entry, wait_seconds):
+        self.key = key
+        self.entry = entry
+        self.wait_seconds = wait_seconds
+
+
+class ConversationLockRegistry:
+    """
+    One lock per (username, conversation id), created on demand and dropped
+    once nobody holds or waits for it. A chat turn holds its conversation's
+    lock from the initial read until its messages are written, so two turns
+    on the same conversation cannot overwrite each other while turns of
+    unrelated students run in parallel.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}
+        self.total_wait_seconds = 0.0
+
+    def acquire(self, username, conversation_id):
+        """Block until the conversation is free. Returns a handle for `release`."""
+        key = (str(username), conversation_id)
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = {"lock": threading.Lock(), "users": 0}
+                self._locks[key] = entry
+            entry["users"] += 1
+        wait_start = time.perf_counter()
+        entry["lock"].acquire()
+        waited = time.perf_counter() - wait_start
+        with self._guard:
+            self.total_wait_seconds += waited
+        return ConversationLockHandle(key, entry, waited)
+
+    def release(self, handle):
+        handle.entry["lock"].release()
+        with self._guard:
+            handle.entry["users"] -= 1
+            if handle.entry["users"] == 0 and self._locks.get(handle.key) is handle.entry:
+                self._locks.pop(handle.key, None)
+
+    @contextmanager
+    def hold(self, username, conversation_id):
+        handle = self.acquire(username, conversation_id)
+        try:
+            yield handle
+        finally:
+            self.release(handle)
+
+    def active_count(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+
+def migrate_json_to_sqlite(json_path: str = DEFAULT_JSON_PATH, sqlite_path: str = DEFAULT_SQLITE_PATH) -> int:
+    """Import a legacy conversations.json file into a SQLite store."""
+    with open(json_path, "r") as file:
+        data = json.loads(file.read())
+    store = SQLiteConversationStore(sqlite_path)
+    try:
+        return store.import_all(data)
+    finally:
+        store.close()
+
+
+def _create_backing_store() -> ConversationStore:
+    """
+    Build the persistence backend selected by `VOXAREFLECT_CONVERSATION_STORE`
+    ("sqlite" by default, "journal" for the append-only journal, or "json"
+    for the legacy single-file layout). A fresh SQLite database or journal
+    directory is seeded from conversations.json on first boot.
+    """
+    backend = os.environ.get("VOXAREFLECT_CONVERSATION_STORE", "sqlite").strip().lower()
+    json_path = os.environ.get("VOXAREFLECT_CONVERSATIONS_JSON", DEFAULT_JSON_PATH).strip() or DEFAULT_JSON_PATH
+    if backend == "json":
+        return JsonFileConversationStore(json_path)
+    if backend == "journal":
+        return JournalConversationStore(
+            os.environ.get("VOXAREFLECT_JOURNAL_DIR", DEFAULT_JOURNAL_DIR).strip() or DEFAULT_JOURNAL_DIR,
+            seed_json_path=json_path,
+            batch_window=float(os.environ.get("VOXAREFLECT_JOURNAL_BATCH_MS", "5")) / 1000.0,
+            compact_interval=float(os.environ.get("VOXAREFLECT_JOURNAL_COMPACT_SECONDS", "300")),
+            compact_records=int(os.environ.get("VOXAREFLECT_JOURNAL_COMPACT_RECORDS", "5000"))
+        )
+    if backend != "sqlite":
+        logger.warning("Unknown VOXAREFLECT_CONVERSATION_STORE '%s', falling back to sqlite", backend)
+    sqlite_path = os.environ.get("VOXAREFLECT_SQLITE_PATH", DEFAULT_SQLITE_PATH).strip() or DEFAULT_SQLITE_PATH
+    store = SQLiteConversationStore(sqlite_path)
+    if store.is_empty() and os.path.exists(json_path):
+        try:
+            with open(json_path, "r") as file:
+                legacy_data = json.loads(file.read())
+            if legacy_data:
+                imported = store.import_all(legacy_data)
+                logger.info("Imported %d conversations from %s into %s", imported, json_path, sqlite_path)
+        except (OSError, json.JSONDecodeError) as error:
+            logger.error("Skipping import of %s: %s", json_path, error)
+    return store
+
+
+def create_conversation_store() -> ConversationStore:
+    """
+    Build the configured backend and, when `VOXAREFLECT_CONVERSATION_CACHE`
+    is enabled, wrap it in a `CachedConversationStore`. Only enable the cache
+    when a single server process owns the data.
+    """
+    store = _create_backing_store()
+    cache_flag = os.environ.get("VOXAREFLECT_CONVERSATION_CACHE", "0").strip().lower()
+    if cache_flag in ("1", "true", "yes", "on"):
+        return CachedConversationStore(
+            store,
+            max_users=int(os.environ.get("VOXAREFLECT_CACHE_MAX_USERS", "500")),
+            flush_interval=float(os.environ.get("VOXAREFLECT_CACHE_FLUSH_SECONDS", "1.0")),
+            flush_writes=int(os.environ.get("VOXAREFLECT_CACHE_FLUSH_WRITES", "50"))
+        )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VoxaReflect conversation store utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Import conversations.json into SQLite")
+    migrate_parser.add_argument("--source", default=DEFAULT_JSON_PATH)
+    migrate_parser.add_argument("--target", default=DEFAULT_SQLITE_PATH)
+    export_parser = subparsers.add_parser("export", help="Dump the SQLite store back to JSON")
+    export_parser.add_argument("--source", default=DEFAULT_SQLITE_PATH)
+    export_parser.add_argument("--target", default=DEFAULT_JSON_PATH)
+    args = parser.parse_args()
+    if args.command == "migrate":
+        imported = migrate_json_to_sqlite(args.source, args.target)
+        print(f"Imported {imported} conversations from {args.source} into {args.target}")
+    elif args.command == "export":
+        store = SQLiteConversationStore(args.source)
+        try:
+            JsonFileConversationStore(args.target)._write(store.export_all())
+        finally:
+            store.close()
+        print(f"Exported conversations from {args.source} to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+Shared access layer for OpenAI calls.
+
+Every model call (phase classifier, reply, digests, summary, title/feedback
+completions, Whisper) goes through one `LLMGateway` so they share:
+
+- one OpenAI client with a pooled, keep-alive HTTP connection pool
+- a per-operation timeout
+- retries with exponential backoff and full jitter on 429, 5xx, timeouts and
+  connection errors (the SDK's own retries are switched off so attempts are
+  counted here)
+- a circuit breaker that fails fast while the upstream keeps failing
+- per-operation call, retry, error and latency counters (`stats()`), and
+  per-attempt latency/error metrics by operation and model for `/metrics`
+- optional request hedging: when a call has not returned by a percentile of
+  the operation's recent latencies, an identical request is sent and the
+  first successful answer wins, within a cap on the share of hedged calls
+- one trace span per call (`llm.<operation>`) with the model, attempts,
+  retries as events and the token usage reported by the API
+
+Streaming calls are retried only while opening the stream and never hedged;
+once events are flowing, errors are left to the caller's fallback.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import openai
+from openai import OpenAI
+
+import metrics
+import tracing
+from structured_logging import propagate
+
+logger = logging.getLogger(__name__)
+
+LLM_TIMEOUT_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_TIMEOUT", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.environ.get("VOXAREFLECT_LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_BACKOFF_MAX", "8"))
+LLM_POOL_MAX_CONNECTIONS = int(os.environ.get("VOXAREFLECT_LLM_POOL_MAX_CONNECTIONS", "64"))
+LLM_POOL_MAX_KEEPALIVE = int(os.environ.get("VOXAREFLECT_LLM_POOL_MAX_KEEPALIVE", "32"))
+LLM_POOL_KEEPALIVE_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_POOL_KEEPALIVE", "30"))
+LLM_BREAKER_FAILURES = int(os.environ.get("VOXAREFLECT_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_BREAKER_RESET", "30"))
+
+# Per-operation timeouts; operations not listed use LLM_TIMEOUT_SECONDS.
+OPERATION_TIMEOUTS = {
+    "classifier": float(os.environ.get("VOXAREFLECT_LLM_CLASSIFIER_TIMEOUT", "20")),
+    "reply": LLM_TIMEOUT_SECONDS,
+    "reply_stream": LLM_TIMEOUT_SECONDS,
+    "digest": float(os.environ.get("VOXAREFLECT_LLM_DIGEST_TIMEOUT", "60")),
+    "summary": float(os.environ.get("VOXAREFLECT_LLM_SUMMARY_TIMEOUT", "120")),
+    "transcription": float(os.environ.get("VOXAREFLECT_LLM_TRANSCRIPTION_TIMEOUT", "120")),
+}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Hedging (off by default): duplicate a slow call once it passes HEDGE_PERCENTILE of recent latencies.
+LLM_HEDGE_ENABLED = os.environ.get("VOXAREFLECT_LLM_HEDGE", "off").strip().lower() in ("1", "on", "true", "yes")
+LLM_HEDGE_OPERATIONS = {
+    name.strip() for name in os.environ.get("VOXAREFLECT_LLM_HEDGE_OPERATIONS", "classifier,reply").split(",") if name.strip()
+}
+LLM_HEDGE_PERCENTILE = float(os.environ.get("VOXAREFLECT_LLM_HEDGE_PERCENTILE", "95"))
+# Upper bound on hedged calls as a share of hedgeable calls (the extra load hedging may add).
+LLM_HEDGE_MAX_RATE = float(os.environ.get("VOXAREFLECT_LLM_HEDGE_MAX_RATE", "0.05"))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("VOXAREFLECT_LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get("VOXAREFLECT_LLM_HEDGE_MIN_DELAY", "0.2"))
+LLM_HEDGE_WORKERS = int(os.environ.get("VOXAREFLECT_LLM_HEDGE_WORKERS", "16"))
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open."""
+
+
+def is_retryable_error(error):
+    """429, 5xx, timeouts and connection failures are worth another attempt."""
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        status_code = getattr(error, "status_code", None) or 0
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return False
+
+
+def backoff_delay(attempt, base=LLM_BACKOFF_BASE_SECONDS, cap=LLM_BACKOFF_MAX_SECONDS):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+    return value if 0 <= value <= LLM_BACKOFF_MAX_SECONDS else None
+
+
+def _upload_size(upload):
+    """Size in bytes of an uploaded file object (Whisper audio), or None."""
+    if upload is None or not hasattr(upload, "fileno"):
+        return None
+    try:
+        return os.fstat(upload.fileno()).st_size
+    except (OSError, ValueError):
+        return None
+
+
+def usage_attributes(result):
+    """Span attributes for the model and token usage of a Responses or Chat Completions result."""
+    attributes = {}
+    model = getattr(result, "model", None)
+    if isinstance(model, str) and model:
+        attributes["gen_ai.response.model"] = model
+    usage = getattr(result, "usage", None)
+    if usage is None:
+        return attributes
+    input_tokens = getattr(usage, "input_tokens", None)
+    if input_tokens is None:
+        input_tokens = getattr(usage, "prompt_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    if output_tokens is None:
+        output_tokens = getattr(usage, "completion_tokens", None)
+    input_details = getattr(usage, "input_tokens_details", None) or getattr(usage, "prompt_tokens_details", None)
+    output_details = getattr(usage, "output_tokens_details", None) or getattr(usage, "completion_tokens_details", None)
+    for key, value in (
+        ("gen_ai.usage.input_tokens", input_tokens),
+        ("gen_ai.usage.output_tokens", output_tokens),
+        # Prompt-cache hits: input tokens served from OpenAI's prefix cache.
+        ("voxareflect.llm.cached_input_tokens", getattr(input_details, "cached_tokens", None)),
+        ("voxareflect.llm.reasoning_tokens", getattr(output_details, "reasoning_tokens", None))
+    ):
+        if isinstance(value, int):
+            attributes[key] = value
+    return attributes
+
+
+def _build_http_client():
+    """Pooled keep-alive HTTP client for the installed SDK, or None to use the SDK default."""
+    try:
+        import httpx2 as http_module
+        client_class = getattr(openai, "DefaultHttpx2Client", None)
+    except ImportError:
+        try:
+            import httpx as http_module
+            client_class = getattr(openai, "DefaultHttpxClient", None)
+        except ImportError:
+            return None
+    if client_class is None:
+        return None
+    limits = http_module.Limits(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_POOL_KEEPALIVE_SECONDS
+    )
+    timeout = http_module.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+    return client_class(limits=limits, timeout=timeout)
+
+
+def create_openai_client(api_key, base_url=None):
+    """OpenAI client with a tuned connection pool; retries are left to the gateway."""
+    client_kwargs = {"api_key": api_key, "max_retries": 0, "timeout": LLM_TIMEOUT_SECONDS}
+    if base_url:
+        client_kwargs["base_url"] = base_url
+    http_client = _build_http_client()
+    if http_client is not None:
+        client_kwargs["http_client"] = http_client
+    return OpenAI(**client_kwargs)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and rejects calls
+    for `reset_seconds`. Then a single trial call is let through ("half_open"): success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_seconds=LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.error("LLM circuit breaker opened after %d consecutive failures", self.consecutive_failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutiveFailures": self.consecutive_failures,
+                "timesOpened": self.times_opened
+            }
+
+
+class LatencyTracker:
+    """Recent successful latencies per operation, for the hedge delay."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, operation, seconds):
+        with self._lock:
+            self._samples.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, operation, percentile, min_samples=1):
+        with self._lock:
+            samples = sorted(self._samples.get(operation, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        index = min(len(samples) - 1, int(round((percentile / 100.0) * (len(samples) - 1))))
+        return samples[index]
+
+
+class HedgeBudget:
+    """Allows a hedge only while hedges stay within `max_rate` of the recent hedgeable calls."""
+
+    def __init__(self, max_rate=LLM_HEDGE_MAX_RATE, window=LATENCY_WINDOW):
+        self.max_rate = max(0.0, max_rate)
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._recorded = 0
+
+    def record_call(self):
+        """Record a hedgeable call and return its slot for `try_acquire`."""
+        with self._lock:
+            self._recent.append(False)
+            self._recorded += 1
+            return self._recorded - 1
+
+    def try_acquire(self, slot):
+        """Mark `slot` as hedged if the budget allows; False once it has left the window."""
+        with self._lock:
+            position = slot - (self._recorded - len(self._recent))
+            if position < 0 or position >= len(self._recent):
+                return False
+            hedged = sum(1 for value in self._recent if value)
+            if hedged + 1 > self.max_rate * len(self._recent):
+                return False
+            self._recent[position] = True
+            return True
+
+
+class OperationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, operation, **counts):
+        with self._lock:
+            entry = self._operations.setdefault(operation, {
+                "calls": 0, "successes": 0, "errors": 0, "retries": 0, "timeouts": 0,
+                "rateLimited": 0, "rejected": 0, "hedges": 0, "hedgeWins": 0,
+                "totalSeconds": 0.0, "maxSeconds": 0.0
+            })
+            for name, value in counts.items():
+                if name == "seconds":
+                    entry["totalSeconds"] += value
+                    entry["maxSeconds"] = max(entry["maxSeconds"], value)
+                else:
+                    entry[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            operations = {name: dict(entry) for name, entry in self._operations.items()}
+        for entry in operations.values():
+            completed = entry["successes"] + entry["errors"]
+            entry["avgSeconds"] = (entry["totalSeconds"] / completed) if completed else 0.0
+        return operations
+
+
+class LLMGateway:
+    def __init__(self, client, max_retries=LLM_MAX_RETRIES, breaker=None,
+                 hedge_enabled=LLM_HEDGE_ENABLED, hedge_operations=LLM_HEDGE_OPERATIONS):
+        self.client = client
+        self.max_retries = max(0, max_retries)
+        self.breaker = breaker or CircuitBreaker()
+        self.operation_stats = OperationStats()
+        self.latencies = LatencyTracker()
+        self.hedge_enabled = hedge_enabled
+        self.hedge_operations = set(hedge_operations)
+        self.hedge_budget = HedgeBudget()
+        self._hedge_executor = None
+        self._hedge_executor_lock = threading.Lock()
+
+    def call(self, operation, method, **kwargs):
+        """
+        Run `method(**kwargs)` (an SDK create method) under the gateway's timeout,
+        retry and circuit-breaker policy, recording stats under `operation`.
+        """
+        kwargs.setdefault("timeout", OPERATION_TIMEOUTS.get(operation, LLM_TIMEOUT_SECONDS))
+        self.operation_stats.record(operation, calls=1)
+        model = str(kwargs.get("model", "") or "")
+        with tracing.span(f"llm.{operation}", kind="client", **{
+            "gen_ai.operation.name": operation,
+            "gen_ai.request.model": model,
+            "voxareflect.llm.stream": True if kwargs.get("stream") else None,
+            "voxareflect.llm.upload_bytes": _upload_size(kwargs.get("file"))
+        }) as llm_span:
+            extra_headers = tracing.upstream_headers(kwargs.get("extra_headers"), llm_span)
+            if extra_headers:
+                kwargs["extra_headers"] = extra_headers
+            result = self._call_with_retries(operation, method, model, llm_span, kwargs)
+            llm_span.set_attributes(usage_attributes(result))
+            return result
+
+    def _call_with_retries(self, operation, method, model, llm_span, kwargs):
+        """The attempt loop of `call`; failed attempts become events on `llm_span`."""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.operation_stats.record(operation, rejected=1, errors=1)
+                metrics.llm_errors_total.inc(operation=operation, model=model, kind="circuit_open")
+                raise CircuitOpenError(f"LLM circuit breaker is open; '{operation}' call rejected")
+            started = time.perf_counter()
+            try:
+                result = method(**kwargs)
+            except Exception as error:
+                elapsed = time.perf_counter() - started
+                retryable = is_retryable_error(error)
+                if retryable:
+                    self.breaker.record_failure()
+                else:
+                    # The upstream answered; a bad request says nothing about its health.
+                    self.breaker.record_success()
+                self.operation_stats.record(
+                    operation,
+                    timeouts=int(isinstance(error, openai.APITimeoutError)),
+                    rateLimited=int(isinstance(error, openai.RateLimitError))
+                )
+                metrics.llm_attempt_seconds.observe(elapsed, operation=operation, model=model, outcome="error")
+                metrics.llm_errors_total.inc(operation=operation, model=model, kind=metrics.classify_llm_error(error))
+                llm_span.set_attribute("voxareflect.llm.attempts", attempt + 1)
+                if not retryable or attempt >= self.max_retries:
+                    self.operation_stats.record(operation, errors=1, seconds=elapsed)
+                    raise
+                delay = _retry_after_seconds(error)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                llm_span.add_event("llm.retry", **{
+                    "voxareflect.llm.attempt": attempt + 1,
+                    "error.type": metrics.classify_llm_error(error),
+                    "voxareflect.llm.attempt_seconds": elapsed,
+                    "voxareflect.llm.retry_delay_seconds": delay
+                })
+                logger.warning("LLM '%s' attempt %d failed (%s); retrying in %.2fs", operation, attempt + 1, type(error).__name__, delay)
+                self.operation_stats.record(operation, retries=1)
+                metrics.llm_retries_total.inc(operation=operation, model=model)
+                attempt += 1
+                time.sleep(delay)
+                self._rewind_uploads(kwargs)
+                continue
+            elapsed = time.perf_counter() - started
+            self.breaker.record_success()
+            self.operation_stats.record(operation, successes=1, seconds=elapsed)
+            self.latencies.record(operation, elapsed)
+            metrics.llm_attempt_seconds.observe(elapsed, operation=operation, model=model, outcome="success")
+            llm_span.set_attribute("voxareflect.llm.attempts", attempt + 1)
+            return result
+
+    def hedge_delay(self, operation):
+        """Seconds after which `operation` gets a hedge, or None while too few latencies are known."""
+        delay = self.latencies.percentile(operation, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES)
+        return None if delay is None else max(LLM_HEDGE_MIN_DELAY_SECONDS, delay)
+
+    def _get_hedge_executor(self):
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=max(2, LLM_HEDGE_WORKERS), thread_name_prefix="llm-hedge")
+            return self._hedge_executor
+
+    def call_hedged(self, operation, method, timings=None, **kwargs):
+        """
+        Like `call`, but if the call is still running after `hedge_delay(operation)`
+        and the hedge budget allows it, an identical request is started and the first
+        successful result is returned. The slower request cannot be aborted and is
+        left to finish in the background. `timings` gains `hedges` / `hedge_wins`.
+        """
+        hedge_slot = self.hedge_budget.record_call()
+        delay = self.hedge_delay(operation)
+        if delay is None:
+            return self.call(operation, method, **kwargs)
+        executor = self._get_hedge_executor()
+        primary = executor.submit(propagate(self.call), operation, method, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.hedge_budget.try_acquire(hedge_slot):
+            return primary.result()
+
+        logger.info("LLM '%s' still running after %.2fs; sending hedge request", operation, delay)
+        tracing.current_span().add_event("llm.hedge", **{"gen_ai.operation.name": operation, "voxareflect.llm.hedge_delay_seconds": delay})
+        hedge = executor.submit(propagate(self.call), operation, method, **kwargs)
+        self.operation_stats.record(operation, hedges=1)
+        if timings is not None:
+            timings["hedges"] = timings.get("hedges", 0.0) + 1.0
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    first_error = first_error or future.exception()
+                    continue
+                if future is hedge:
+                    self.operation_stats.record(operation, hedgeWins=1)
+                    tracing.current_span().add_event("llm.hedge_won", **{"gen_ai.operation.name": operation})
+                    if timings is not None:
+                        timings["hedge_wins"] = timings.get("hedge_wins", 0.0) + 1.0
+                return future.result()
+        raise first_error
+
+    @staticmethod
+    def _rewind_uploads(kwargs):
+        upload = kwargs.get("file")
+        if hasattr(upload, "seek"):
+            upload.seek(0)
+
+    def _should_hedge(self, operation, kwargs):
+        return self.hedge_enabled and operation in self.hedge_operations and not kwargs.get("stream")
+
+    def responses_create(self, operation, timings=None, **kwargs):
+        if self._should_hedge(operation, kwargs):
+            return self.call_hedged(operation, self.client.responses.create, timings=timings, **kwargs)
+        return self.call(operation, self.client.responses.create, **kwargs)
+
+    def chat_completions_create(self, operation, **kwargs):
+        return self.call(operation, self.client.chat.completions.create, **kwargs)
+
+    def transcriptions_create(self, operation="transcription", **kwargs):
+        return self.call(operation, self.client.audio.transcriptions.create, **kwargs)
+
+    def stats(self):
+        operations = self.operation_stats.snapshot()
+        if self.hedge_enabled:
+            for name in self.hedge_operations & set(operations):
+                operations[name]["hedgeDelaySeconds"] = self.hedge_delay(name)
+        return {
+            "circuitBreaker": self.breaker.snapshot(),
+            "hedging": {
+                "enabled": self.hedge_enabled,
+                "operations": sorted(self.hedge_operations),
+                "percentile": LLM_HEDGE_PERCENTILE,
+                "maxRate": LLM_HEDGE_MAX_RATE
+            },
+            "operations": operations
+        }
@@ -0,0 +1,301 @@
+"""
+In-process metrics served in the Prometheus text format at `/metrics`.
+
+Counters, gauges and histograms keep their values per label combination
+behind one lock each; `registry.render()` writes every metric in the text
+exposition format (version 0.0.4). Values that already live elsewhere
+(voice job queue, TTS cache, conversation locks) are read at scrape time
+through collector callbacks instead of being mirrored on every change.
+
+The metrics recorded by the backend are defined at the bottom of this
+module; `VOXAREFLECT_METRICS=off` turns recording and the endpoint off.
+"""
+
+import logging
+import math
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get("VOXAREFLECT_METRICS", "on").strip().lower() not in ("0", "off", "false", "no")
+
+# Seconds; covers cache hits and local rules up to slow summaries and Whisper uploads.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Lock waits are usually zero and only grow while another turn on the same conversation runs.
+LOCK_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape_label(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A gauge set directly or, with `set_function`, computed at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def set_function(self, function):
+        """`function()` returns a number (no labels) or a dict of label-value tuples to numbers."""
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            try:
+                result = self._function()
+            except Exception as error:
+                logger.error("Metrics collector for %s failed: %s", self.name, error)
+                result = {}
+            items = sorted(result.items()) if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(value))}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        value = float(value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][index] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def snapshot(self, **labels):
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return None if entry is None else {"counts": list(entry["counts"]), "sum": entry["sum"], "count": entry["count"]}
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, {"counts": list(entry["counts"]), "sum": entry["sum"], "count": entry["count"]}) for key, entry in self._values.items())
+        lines = self.header()
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{labels} {entry['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Keys of the turn `timings` dict that are durations in seconds, with the upstream
+# operation whose model serves them (None: no model involved).
+TURN_STAGE_OPERATIONS = {
+    "transcription": "transcription",
+    "classification": "classifier",
+    "response_first_token": "reply",
+    "response_generation": "reply",
+    "tts": "tts",
+    "tts_first_audio": "tts",
+    "store_load": None,
+    "store_save": None,
+    "lock_wait": None,
+    "turn_total": None
+}
+
+turn_stage_seconds = registry.histogram(
+    "voxareflect_turn_stage_seconds",
+    "Duration of each stage of a chat turn.",
+    ("stage", "phase", "language", "model")
+)
+turns_total = registry.counter(
+    "voxareflect_turns_total",
+    "Chat turns processed, by phase the turn was answered in and outcome.",
+    ("phase", "language", "outcome")
+)
+store_operation_seconds = registry.histogram(
+    "voxareflect_store_operation_seconds",
+    "Duration of conversation store reads and writes made by chat turns.",
+    ("operation",)
+)
+conversation_lock_wait_seconds = registry.histogram(
+    "voxareflect_conversation_lock_wait_seconds",
+    "Time a turn waited for its conversation lock.",
+    buckets=LOCK_WAIT_BUCKETS
+)
+llm_attempt_seconds = registry.histogram(
+    "voxareflect_llm_attempt_seconds",
+    "Duration of each upstream LLM attempt (retries are separate attempts).",
+    ("operation", "model", "outcome")
+)
+llm_errors_total = registry.counter(
+    "voxareflect_llm_errors_total",
+    "Failed upstream LLM attempts, by error kind.",
+    ("operation", "model", "kind")
+)
+llm_retries_total = registry.counter(
+    "voxareflect_llm_retries_total",
+    "Upstream LLM attempts that were retried.",
+    ("operation", "model")
+)
+voice_jobs_gauge = registry.gauge(
+    "voxareflect_voice_jobs",
+    "Voice jobs currently held, by status (queued and running form the queue depth).",
+    ("status",)
+)
+tts_cache_entries = registry.gauge("voxareflect_tts_cache_entries", "Synthesized audio clips held in the TTS cache.")
+tts_cache_bytes = registry.gauge("voxareflect_tts_cache_bytes", "Bytes of synthesized audio held in the TTS cache.")
+conversation_locks_active = registry.gauge("voxareflect_conversation_locks_active", "Conversation locks currently held or awaited.")
+
+
+def record_turn(timings, phase, language, outcome, models=None):
+    """Record one chat turn's `timings` (seconds per stage) and its outcome."""
+    if not METRICS_ENABLED:
+        return
+    phase = phase or "none"
+    language = language or "unknown"
+    models = models or {}
+    for stage, operation in TURN_STAGE_OPERATIONS.items():
+        value = (timings or {}).get(stage)
+        if not isinstance(value, (int, float)):
+            continue
+        model = models.get(operation, "") if operation else ""
+        turn_stage_seconds.observe(value, stage=stage, phase=phase, language=language, model=model)
+    for stage in ("store_load", "store_save"):
+        value = (timings or {}).get(stage)
+        if isinstance(value, (int, float)):
+            store_operation_seconds.observe(value, operation=stage[len("store_"):])
+    if isinstance((timings or {}).get("lock_wait"), (int, float)):
+        conversation_lock_wait_seconds.observe(timings["lock_wait"])
+    turns_total.inc(phase=phase, language=language, outcome=outcome)
+
+
+def classify_llm_error(error):
+    """Short label for an upstream failure (timeout, rate_limited, status_5xx, ...)."""
+    name = type(error).__name__
+    if name == "CircuitOpenError":
+        return "circuit_open"
+    if "Timeout" in name:
+        return "timeout"
+    if name == "RateLimitError":
+        return "rate_limited"
+    if "Connection" in name:
+        return "connection"
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return f"status_{status // 100}xx"
+    return "other"
+
+
+def render():
+    return registry.render()
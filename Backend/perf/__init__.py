@@ -0,0 +1,6 @@
+"""
+Performance and concurrency harnesses for the VoxaReflect backend.
+
+Run the scripts from the Backend directory as modules, for example
+`python -m perf.stress_conversation_turns`.
+"""
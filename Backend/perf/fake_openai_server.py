@@ -0,0 +1,437 @@
+"""
+Local stand-in for the OpenAI endpoints the backend uses, for offline load and
+latency testing of the whole app.
+
+Implemented (OpenAI wire format, enough for the `openai` SDK):
+- POST /v1/responses               (plain and `stream: true` server-sent events)
+- POST /v1/chat/completions
+- POST /v1/audio/transcriptions
+- POST /v1/audio/speech             (also used as the TTS HTTP endpoint)
+- GET  /stats, POST /reset          (request/error counters of this server)
+
+Answers are recognized from the prompt: phase-classifier JSON, the batched
+and per-stage Gibbs stage checks, phase digests, the final summary and coach
+replies each get a fitting canned or templated answer. `--outputs` loads
+extra rules from a JSON file, e.g.
+    {"rules": [{"endpoint": "responses", "match": "Action Plan", "text": "What will you try next time? ({words} words)"}]}
+Templates may use {words} (input word count), {phase}, {model} and {excerpt}.
+
+Latency is drawn per request from a distribution, per endpoint if wanted:
+    fixed:0.3   uniform:0.2:0.8   normal:0.5:0.1   lognormal:<median>:<sigma>
+For streamed responses it is the time to the first delta; further deltas
+follow every `--stream-interval` seconds. Error injection answers a share of
+requests with 429/5xx (`--error-rate`, `--error-statuses`), and `--hang-rate`
+stalls requests for `--hang-seconds` to exercise client timeouts.
+
+Point the backend at it with
+    VOXAREFLECT_OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+    VOXAREFLECT_TTS_MODE=openai
+    VOXAREFLECT_TTS_ENDPOINT=http://127.0.0.1:8765/v1/audio/speech
+(OPENAI_API_KEY may then be left empty.)
+
+Usage (from Backend/):
+    python -m perf.fake_openai_server --port 8765
+    python -m perf.fake_openai_server --latency lognormal:0.6:0.5 --latency responses=lognormal:1.2:0.4 --error-rate 0.02
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENDPOINTS = {
+    "/v1/responses": "responses",
+    "/v1/chat/completions": "chat",
+    "/v1/audio/transcriptions": "transcriptions",
+    "/v1/audio/speech": "speech"
+}
+
+PHASE_PATTERN = re.compile(r'The current phase is: "([^"]+)"')
+CLASSIFIER_PHASE_PATTERN = re.compile(r"advance from the '([^']+)' phase")
+BATCHED_STAGE_PATTERN = re.compile(r'^- "([^"]+)":', re.MULTILINE)
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+FILLER_WORDS = (
+    "that sounds like an important moment and it helps to look at it closely "
+    "so we can understand what it meant for you and how it shaped your next steps"
+).split()
+
+
+def parse_latency(spec):
+    """Turn "fixed:0.3", "uniform:a:b", "normal:mean:sd" or "lognormal:median:sigma" into a sampler."""
+    parts = str(spec).strip().split(":")
+    kind = parts[0].lower()
+    try:
+        values = [float(part) for part in parts[1:]]
+        if kind == "fixed" and len(values) == 1:
+            return lambda: values[0]
+        if kind == "uniform" and len(values) == 2:
+            return lambda: random.uniform(values[0], values[1])
+        if kind == "normal" and len(values) == 2:
+            return lambda: max(0.0, random.gauss(values[0], values[1]))
+        if kind == "lognormal" and len(values) == 2:
+            return lambda: random.lognormvariate(math.log(max(values[0], 1e-6)), values[1])
+        if len(parts) == 1:
+            fixed_value = float(kind)
+            return lambda: fixed_value
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid latency distribution: {spec}")
+
+
+def parse_per_endpoint(values, parse_value, default):
+    """["0.1", "responses=0.2"] -> {endpoint: parsed} with the bare value as default for all."""
+    settings = {name: default for name in ENDPOINTS.values()}
+    for raw in values or []:
+        if "=" in raw:
+            endpoint, value = raw.split("=", 1)
+            if endpoint not in settings:
+                raise argparse.ArgumentTypeError(f"unknown endpoint '{endpoint}' (use one of {sorted(settings)})")
+            settings[endpoint] = parse_value(value)
+        else:
+            parsed = parse_value(raw)
+            settings = {name: parsed for name in settings}
+    return settings
+
+
+class FakeBehaviour:
+    """Latency, error and output settings shared by all request handlers."""
+
+    def __init__(self, args):
+        self.latency = parse_per_endpoint(args.latency, parse_latency, parse_latency("fixed:0.05"))
+        self.error_rate = parse_per_endpoint(args.error_rate, float, 0.0)
+        self.error_statuses = [int(status) for status in args.error_statuses.split(",") if status.strip()]
+        self.hang_rate = args.hang_rate
+        self.hang_seconds = args.hang_seconds
+        self.stream_interval = args.stream_interval
+        self.reply_words = args.reply_words
+        self.advance_rate = args.advance_rate
+        self.audio_bytes = args.audio_bytes
+        self.rules = []
+        if args.outputs:
+            with open(args.outputs, "r", encoding="utf-8") as outputs_file:
+                for rule in json.load(outputs_file).get("rules", []):
+                    self.rules.append({
+                        "endpoint": rule.get("endpoint"),
+                        "pattern": re.compile(rule.get("match", ""), re.DOTALL),
+                        "text": rule.get("text", "")
+                    })
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {name: {"requests": 0, "errors": 0, "hangs": 0, "streams": 0} for name in ENDPOINTS.values()}
+
+    def count(self, endpoint, field):
+        with self._lock:
+            self.stats[endpoint][field] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(values) for name, values in self.stats.items()}
+
+    def injected_error(self, endpoint):
+        if self.error_statuses and random.random() < self.error_rate[endpoint]:
+            return random.choice(self.error_statuses)
+        return None
+
+    def wait_latency(self, endpoint):
+        if self.hang_rate > 0 and random.random() < self.hang_rate:
+            self.count(endpoint, "hangs")
+            time.sleep(self.hang_seconds)
+        time.sleep(self.latency[endpoint]())
+
+    def _apply_rules(self, endpoint, prompt, fields):
+        for rule in self.rules:
+            if rule["endpoint"] not in (None, endpoint):
+                continue
+            if rule["pattern"].search(prompt):
+                try:
+                    return rule["text"].format(**fields)
+                except (KeyError, IndexError, ValueError):
+                    return rule["text"]
+        return None
+
+    def answer_text(self, endpoint, prompt, model, wants_json=False):
+        """Canned or templated answer for a prompt (instructions + input, or all messages)."""
+        phase_match = PHASE_PATTERN.search(prompt) or CLASSIFIER_PHASE_PATTERN.search(prompt)
+        fields = {
+            "words": len(WORD_PATTERN.findall(prompt)),
+            "phase": phase_match.group(1) if phase_match else "Description",
+            "model": model,
+            "excerpt": " ".join(prompt.split()[-12:])
+        }
+        ruled = self._apply_rules(endpoint, prompt, fields)
+        if ruled is not None:
+            return ruled
+        if "You are evaluating if a student can advance" in prompt:
+            return json.dumps({"suggestion": "advance" if random.random() < self.advance_rate else "stay"})
+        stages = BATCHED_STAGE_PATTERN.findall(prompt)
+        if stages and (wants_json or "JSON object" in prompt):
+            return json.dumps({stage: {"found": True, "paragraphs": [1]} for stage in stages})
+        if "start answering with a clear yes or no" in prompt:
+            return "Yes, the text contains a sentence from this class."
+        if "You condense one phase" in prompt:
+            return f"In the {fields['phase']} phase the student described the situation, their reaction and what they took from it."
+        if "reflective learning expert analyzing a completed student reflection" in prompt:
+            return (
+                "**Key Insights:** The student connected the experience to the course content.\n"
+                "**Action Plans:**\n- Validate the process model early\n- Plan a review with the team\n"
+                "**Growth Observed:** The reflection moved from description to concrete plans."
+            )
+        if wants_json:
+            return "{}"
+        if endpoint == "chat":
+            return "Reflective Practice"
+        filler = " ".join(FILLER_WORDS[index % len(FILLER_WORDS)] for index in range(max(0, self.reply_words - 12)))
+        return f"Thank you for sharing this. {filler.capitalize()}. What stands out to you most about the {fields['phase'].lower()} so far?".replace(" .", ".")
+
+
+def _usage(prompt, text):
+    input_tokens = max(1, len(prompt) // 4)
+    output_tokens = max(1, len(text) // 4)
+    return input_tokens, output_tokens
+
+
+def response_object(model, text, prompt):
+    input_tokens, output_tokens = _usage(prompt, text)
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": model,
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}]
+        }],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens
+        }
+    }
+
+
+def chat_completion_object(model, text, prompt):
+    input_tokens, output_tokens = _usage(prompt, text)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+    }
+
+
+def _stringify_input(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        parts = []
+        for item in value:
+            if isinstance(item, dict):
+                content = item.get("content", "")
+                parts.append(content if isinstance(content, str) else json.dumps(content))
+            else:
+                parts.append(str(item))
+        return "\n".join(parts)
+    return "" if value is None else json.dumps(value)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    behaviour = None
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status):
+        headers = {"retry-after": "0.1"} if status == 429 else {}
+        error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+        self._send_json(status, {"error": {"message": f"Injected {status} from fake server", "type": error_type, "code": error_type}}, headers)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", "0") or 0)
+        return self.rfile.read(length) if length > 0 else b""
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.behaviour.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/reset":
+            self._read_body()
+            self.behaviour.reset()
+            self._send_json(200, {"reset": True})
+            return
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            self._read_body()
+            self._send_json(404, {"error": {"message": f"Unsupported path {path}"}})
+            return
+        raw_body = self._read_body()
+        self.behaviour.count(endpoint, "requests")
+        injected_status = self.behaviour.injected_error(endpoint)
+        if injected_status is not None:
+            self.behaviour.count(endpoint, "errors")
+            time.sleep(self.behaviour.latency[endpoint]() / 4)
+            self._send_error(injected_status)
+            return
+        if endpoint in ("transcriptions", "speech"):
+            self.behaviour.wait_latency(endpoint)
+            if endpoint == "transcriptions":
+                self._send_json(200, {"text": "This is a transcribed answer about my placement at the hospital."})
+            else:
+                audio = b"ID3" + bytes(max(0, self.behaviour.audio_bytes - 3))
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Content-Length", str(len(audio)))
+                self.end_headers()
+                self.wfile.write(audio)
+            return
+
+        try:
+            payload = json.loads(raw_body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+        model = payload.get("model", "fake-model")
+        if endpoint == "chat":
+            prompt = _stringify_input(payload.get("messages"))
+            wants_json = (payload.get("response_format") or {}).get("type") == "json_object"
+            text = self.behaviour.answer_text(endpoint, prompt, model, wants_json)
+            self.behaviour.wait_latency(endpoint)
+            self._send_json(200, chat_completion_object(model, text, prompt))
+            return
+
+        prompt = (payload.get("instructions") or "") + "\n" + _stringify_input(payload.get("input"))
+        text = self.behaviour.answer_text(endpoint, prompt, model)
+        self.behaviour.wait_latency(endpoint)
+        if payload.get("stream"):
+            self.behaviour.count(endpoint, "streams")
+            self._stream_response(model, text, prompt)
+        else:
+            self._send_json(200, response_object(model, text, prompt))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _write_event(self, event_type, data, sequence_number):
+        data = dict(data, type=event_type, sequence_number=sequence_number)
+        self._write_chunk(f"event: {event_type}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def _stream_response(self, model, text, prompt):
+        final = response_object(model, text, prompt)
+        item_id = final["output"][0]["id"]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sequence_number = 0
+        in_progress = dict(final, status="in_progress", output=[])
+        self._write_event("response.created", {"response": in_progress}, sequence_number)
+        words = text.split(" ")
+        for index, word in enumerate(words):
+            sequence_number += 1
+            delta = word if index == len(words) - 1 else word + " "
+            self._write_event("response.output_text.delta", {
+                "item_id": item_id, "output_index": 0, "content_index": 0, "delta": delta, "logprobs": []
+            }, sequence_number)
+            if self.behaviour.stream_interval > 0:
+                time.sleep(self.behaviour.stream_interval)
+        sequence_number += 1
+        self._write_event("response.completed", {"response": final}, sequence_number)
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def build_server(args):
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {"behaviour": FakeBehaviour(args), "quiet": not args.verbose})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", help="latency distribution, optionally per endpoint (responses=..., chat=..., transcriptions=..., speech=...)")
+    parser.add_argument("--stream-interval", type=float, default=0.01, help="seconds between streamed deltas")
+    parser.add_argument("--error-rate", action="append", help="share of requests answered with an injected error, optionally per endpoint")
+    parser.add_argument("--error-statuses", default="429,500,503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests stalled for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--reply-words", type=int, default=40, help="approximate length of coach replies")
+    parser.add_argument("--advance-rate", type=float, default=0.3, help="probability that the phase classifier answers advance")
+    parser.add_argument("--audio-bytes", type=int, default=16000, help="size of synthesized audio responses")
+    parser.add_argument("--outputs", help="JSON file with extra output rules")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser
+
+
+def start_in_background(argv=None):
+    """Start a server on a daemon thread (for harnesses); returns (server, base_url)."""
+    args = build_parser().parse_args(argv or [])
+    server = build_server(args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    args = build_parser().parse_args()
+    server = build_server(args)
+    host, port = server.server_address[:2]
+    print(f"Fake OpenAI server listening on http://{host}:{port}")
+    print(f"  VOXAREFLECT_OPENAI_BASE_URL=http://{host}:{port}/v1")
+    print(f"  VOXAREFLECT_TTS_ENDPOINT=http://{host}:{port}/v1/audio/speech")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Restart check for the journal conversation store.
+
+Seeds a journal directory from a legacy conversations.json, then reopens
+the store several times (the way a server restart does) with and without
+writes in between, and verifies that the seeded conversations and every
+message appended to them survive each boot.
+
+The script fails (exit code 1) when a seeded conversation or an appended
+message is missing after a restart.
+
+Usage (from Backend/):
+    python -m perf.journal_restart_check
+    python -m perf.journal_restart_check --boots 5 --compact
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from conversation_store import JournalConversationStore
+
+SEED = {
+    "alice": [{
+        "id": 0,
+        "title": "Ongoing Reflection",
+        "stage": "Description",
+        "text": "",
+        "time": 0,
+        "messages": [{"sender": "user", "content": "seeded message", "buttons": [], "video": "", "time": 0}]
+    }]
+}
+
+
+def open_store(journal_dir, seed_path):
+    # Compaction is only run when asked for, so every boot before it replays the journal.
+    return JournalConversationStore(journal_dir, seed_json_path=seed_path, compact_interval=3600.0, compact_records=10 ** 9)
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="voxareflect-journal-restart-")
+    seed_path = os.path.join(work_dir, "conversations.json")
+    journal_dir = os.path.join(work_dir, "journal")
+    with open(seed_path, "w", encoding="utf-8") as seed_file:
+        json.dump(SEED, seed_file)
+
+    failures = []
+    expected_messages = len(SEED["alice"][0]["messages"])
+    for boot in range(1, args.boots + 1):
+        store = open_store(journal_dir, seed_path)
+        try:
+            conversation = store.get_conversation("alice", 0)
+            found = 0 if conversation is None else len(conversation.get("messages", []))
+            status = "ok" if found == expected_messages else "LOST"
+            print(f"boot {boot}: alice/0 has {found} of {expected_messages} messages ({status})")
+            if found != expected_messages:
+                failures.append(f"boot {boot}: expected {expected_messages} messages, found {found}")
+            # Odd boots write, even boots only read, so both restart paths are covered.
+            if boot % 2 == 1:
+                message = {"sender": "user", "content": f"written on boot {boot}", "buttons": [], "video": "", "time": boot}
+                if store.append_messages("alice", 0, [message]):
+                    expected_messages += 1
+                else:
+                    failures.append(f"boot {boot}: append to the seeded conversation was rejected")
+            if args.compact and boot == args.boots // 2:
+                store.compact()
+        finally:
+            store.close()
+
+    if failures:
+        print("FAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"OK: seeded data and {expected_messages - len(SEED['alice'][0]['messages'])} appended messages survived {args.boots} boots")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--boots", type=int, default=4, help="number of times the store is opened")
+    parser.add_argument("--compact", action="store_true", help="compact the journal halfway through")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
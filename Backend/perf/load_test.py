@@ -0,0 +1,448 @@
+"""
+End-to-end load generator for the chat endpoints.
+
+Simulated students replay reflection sessions through the real Flask
+endpoints: each session opens a conversation with `/newChat`, then answers
+until the conversation walks through all phases of `setOfStages` (or
+`--max-turns` is reached). A share of the answers (`--voice-ratio`) is sent
+as audio via `/uploadAudio` and polled on `/voiceJobStatus`; every few turns
+the student's conversation list is refreshed with `/getConversations`.
+
+By default the app runs in-process (Flask test clients, temporary conversation
+store) against `perf/fake_openai_server.py`, so no API key or running server is
+needed; `--fake-arg` passes options such as latency distributions to the fake
+server. `--base-url` targets a running instance over HTTP instead.
+
+Concurrency ramps up over `--ramp-seconds` (profile `linear` or `step:<n>`);
+`--duration` stops starting new sessions after that many seconds.
+
+The report covers throughput, latency percentiles per endpoint (plus whole
+voice turns, upload to completed job), and the per-stage breakdown of the
+turn `timings` (classifier, reply, TTS, ...) overall and per Gibbs phase. `--output`
+saves it as JSON; `--compare` prints p95 changes against an earlier result and
+exits with code 1 when an endpoint's p95 grew by more than `--max-regression`
+(and by more than `--min-regression-seconds`).
+
+Usage (from Backend/):
+    python -m perf.load_test --sessions 40 --concurrency 10 --ramp-seconds 5 --output load.json
+    python -m perf.load_test --fake-arg=--latency --fake-arg=lognormal:0.6:0.5 --voice-ratio 0.3
+    python -m perf.load_test --base-url http://localhost:5001 --sessions 20 --compare load.json
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+PHASE_ANSWERS = {
+    "Description": [
+        "Last week our team modelled the order-to-cash process in BPMN for the case study.",
+        "I was responsible for the payment sub-process and presented it to the tutor on Friday.",
+        "The event log from the company did not match the model we had drawn at all."
+    ],
+    "Feelings": [
+        "Honestly I felt nervous and a bit embarrassed when the tutor pointed out the gaps.",
+        "I was frustrated with myself because I thought we had checked everything.",
+        "Afterwards I felt relieved that we found the problem before the exam."
+    ],
+    "Evaluation": [
+        "It went well that we split the work, but we validated our assumptions far too late.",
+        "Our communication in the group was good, the planning of the review was not.",
+        "The model itself was clean, yet it described how we imagined the process, not how it ran."
+    ],
+    "Analysis": [
+        "I think it happened because we skipped the conformance checking step from the lecture.",
+        "We trusted the interview notes more than the data, which the literature warns about.",
+        "Time pressure made us focus on notation instead of checking the model against the log."
+    ],
+    "Conclusion": [
+        "Overall I learned that validating a process model against real data early saves rework.",
+        "I realised that a correct notation does not mean a correct process description.",
+        "The main takeaway for me is to treat the event log as the ground truth."
+    ],
+    "Action Plan": [
+        "Next time I will run a conformance check right after the first draft.",
+        "I will plan a short review with the team before we present anything.",
+        "I want to practise process mining tools so that checking the log becomes routine."
+    ]
+}
+OPENING_MESSAGES = [
+    "I would like to reflect on our BPMN case study from last week.",
+    "Can we reflect on the process mining exercise we did in the tutorial?",
+    "I want to think about how our group project presentation went."
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(math.ceil(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def describe(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values)
+    }
+
+
+class Recorder:
+    """Thread-safe collection of request latencies and turn timings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.timings = {}
+        self.timings_by_phase = {}
+        self.sessions_completed = 0
+        self.sessions_failed = 0
+        self.turns = 0
+
+    def request(self, name, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def turn(self, phase, timings):
+        with self._lock:
+            self.turns += 1
+            for key, value in (timings or {}).items():
+                if not isinstance(value, (int, float)):
+                    continue
+                self.timings.setdefault(key, []).append(float(value))
+                self.timings_by_phase.setdefault(phase, {}).setdefault(key, []).append(float(value))
+
+    def session_finished(self, ok):
+        with self._lock:
+            if ok:
+                self.sessions_completed += 1
+            else:
+                self.sessions_failed += 1
+
+
+class InProcessClient:
+    """Calls the Flask app through its test client (one per thread)."""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def post_json(self, path, payload):
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def post_audio(self, path, audio_bytes, form):
+        data = dict(form)
+        data["file"] = (io.BytesIO(audio_bytes), "answer.mp4")
+        response = self.client.post(path, data=data, content_type="multipart/form-data")
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def get_json(self, path, params):
+        response = self.client.get(path, query_string=params)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HttpClient:
+    """Calls a running instance over HTTP."""
+
+    def __init__(self, base_url, timeout):
+        import requests
+        self.session = requests.Session()
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _parse(self, response):
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, {}
+
+    def post_json(self, path, payload):
+        return self._parse(self.session.post(self.base_url + path, json=payload, timeout=self.timeout))
+
+    def post_audio(self, path, audio_bytes, form):
+        files = {"file": ("answer.mp4", audio_bytes, "audio/mp4")}
+        return self._parse(self.session.post(self.base_url + path, data=form, files=files, timeout=self.timeout))
+
+    def get_json(self, path, params):
+        return self._parse(self.session.get(self.base_url + path, params=params, timeout=self.timeout))
+
+
+class SessionRunner:
+    def __init__(self, args, recorder, make_client):
+        self.args = args
+        self.recorder = recorder
+        self.make_client = make_client
+
+    def _timed(self, name, call, *call_args):
+        started = time.perf_counter()
+        try:
+            status, body = call(*call_args)
+        except Exception as error:
+            self.recorder.request(name, time.perf_counter() - started, False)
+            raise RuntimeError(f"{name} failed: {error}") from error
+        ok = 200 <= status < 300 and body.get("success", True) is not False
+        self.recorder.request(name, time.perf_counter() - started, ok)
+        return ok, body
+
+    def _think(self):
+        if self.args.think_time > 0:
+            time.sleep(random.uniform(0.5, 1.5) * self.args.think_time)
+
+    def _voice_turn(self, client, payload):
+        started = time.perf_counter()
+        ok, body = self._timed("/uploadAudio", client.post_audio, "/uploadAudio", b"\x00" * 2048, {
+            "metadata": json.dumps(payload),
+            "language": payload.get("language", "en")
+        })
+        if not ok or not body.get("jobId"):
+            self.recorder.request("voice_turn", time.perf_counter() - started, False)
+            return False, body
+        deadline = time.monotonic() + self.args.voice_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.args.poll_interval)
+            ok, status_body = self._timed("/voiceJobStatus", client.get_json, "/voiceJobStatus", {"jobId": body["jobId"]})
+            status = status_body.get("status")
+            if status == "completed":
+                self.recorder.request("voice_turn", time.perf_counter() - started, True)
+                return True, status_body.get("result") or {}
+            if status == "failed" or not ok:
+                break
+        self.recorder.request("voice_turn", time.perf_counter() - started, False)
+        return False, {}
+
+    def run_session(self, session_index):
+        client = self.make_client()
+        username = f"load-{self.args.run_id}-{session_index}"
+        base_payload = {"username": username, "language": self.args.language, "turnPreset": self.args.turn_preset}
+        ok, result = self._timed("/newChat", client.post_json, "/newChat", dict(
+            base_payload, conversationID=-1, newMessage=random.choice(OPENING_MESSAGES)
+        ))
+        if not ok:
+            self.recorder.session_finished(False)
+            return
+        conversation_id = result.get("id")
+        stage = result.get("stage") or "Description"
+        self.recorder.turn(stage, result.get("timings"))
+        written_text = ""
+        for turn_index in range(self.args.max_turns):
+            if stage == "done":
+                break
+            self._think()
+            answer = random.choice(PHASE_ANSWERS.get(stage, PHASE_ANSWERS["Description"]))
+            written_text = (written_text + "\n" + answer).strip()
+            payload = dict(base_payload, conversationID=conversation_id, newMessage=answer, currentText=written_text)
+            if random.random() < self.args.voice_ratio:
+                ok, result = self._voice_turn(client, payload)
+            else:
+                ok, result = self._timed("/newChat", client.post_json, "/newChat", payload)
+            if not ok:
+                self.recorder.session_finished(False)
+                return
+            self.recorder.turn(stage, result.get("timings"))
+            stage = result.get("stage") or stage
+            if self.args.list_every > 0 and (turn_index + 1) % self.args.list_every == 0:
+                self._timed("/getConversations", client.post_json, "/getConversations", {"username": username, "view": "headers"})
+        self._timed("/getConversations", client.post_json, "/getConversations", {"username": username})
+        self.recorder.session_finished(stage == "done")
+
+
+def worker_start_delay(worker_index, args):
+    if args.ramp_seconds <= 0 or args.ramp == "none":
+        return 0.0
+    if args.ramp.startswith("step:"):
+        steps = max(1, int(args.ramp.split(":", 1)[1]))
+        step_index = int(worker_index * steps / max(1, args.concurrency))
+        return args.ramp_seconds * step_index / steps
+    return args.ramp_seconds * worker_index / max(1, args.concurrency)
+
+
+def prepare_in_process(args):
+    """Import app.py against a temporary store and (unless disabled) the fake OpenAI server."""
+    work_dir = tempfile.mkdtemp(prefix="voxareflect-load-")
+    os.environ.setdefault("VOXAREFLECT_CONVERSATION_STORE", "sqlite")
+    os.environ["VOXAREFLECT_SQLITE_PATH"] = os.path.join(work_dir, "conversations.sqlite3")
+    os.environ["VOXAREFLECT_CONVERSATIONS_JSON"] = os.path.join(work_dir, "conversations.json")
+    os.environ["VOXAREFLECT_JOURNAL_DIR"] = os.path.join(work_dir, "journal")
+    fake_server = None
+    if not args.no_fake_openai:
+        from perf.fake_openai_server import start_in_background
+        fake_server, fake_base_url = start_in_background(["--port", "0"] + list(args.fake_arg or []))
+        os.environ["VOXAREFLECT_OPENAI_BASE_URL"] = fake_base_url
+        if args.tts:
+            os.environ["VOXAREFLECT_TTS_MODE"] = "openai"
+            os.environ["VOXAREFLECT_TTS_ENDPOINT"] = fake_base_url + "/audio/speech"
+    if not args.tts:
+        os.environ["VOXAREFLECT_TTS_MODE"] = "none"
+    # Uploaded audio is written to the working directory before transcription.
+    os.chdir(work_dir)
+    if args.quiet_app:
+        os.environ.setdefault("VOXAREFLECT_LOG_LEVEL", "WARNING")
+    import app
+    return app, fake_server
+
+
+def build_report(args, recorder, wall_seconds):
+    total_requests = sum(len(values) for name, values in recorder.latencies.items() if name.startswith("/"))
+    endpoints = {}
+    for name, values in sorted(recorder.latencies.items()):
+        endpoints[name] = dict(describe(values), errors=recorder.errors.get(name, 0))
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "wallSeconds": wall_seconds,
+        "sessions": {"completed": recorder.sessions_completed, "failed": recorder.sessions_failed},
+        "throughput": {
+            "requestsPerSecond": total_requests / wall_seconds if wall_seconds else 0.0,
+            "turnsPerSecond": recorder.turns / wall_seconds if wall_seconds else 0.0,
+            "sessionsPerMinute": 60.0 * recorder.sessions_completed / wall_seconds if wall_seconds else 0.0
+        },
+        "endpoints": endpoints,
+        "timings": {key: describe(values) for key, values in sorted(recorder.timings.items())},
+        "timingsByPhase": {
+            phase: {key: describe(values) for key, values in sorted(phase_timings.items())}
+            for phase, phase_timings in recorder.timings_by_phase.items()
+        }
+    }
+
+
+def print_report(report):
+    print(f"\nwall {report['wallSeconds']:.1f}s | sessions completed {report['sessions']['completed']} failed {report['sessions']['failed']}")
+    throughput = report["throughput"]
+    print(
+        f"throughput {throughput['requestsPerSecond']:.2f} req/s, {throughput['turnsPerSecond']:.2f} turns/s, "
+        f"{throughput['sessionsPerMinute']:.1f} sessions/min"
+    )
+    print(f"\n{'endpoint':<20}{'count':>7}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<20}{stats['count']:>7}{stats['errors']:>8}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    print(f"\n{'turn timing':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for key, stats in report["timings"].items():
+        print(f"{key:<28}{stats['count']:>7}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}")
+    for phase, phase_timings in report["timingsByPhase"].items():
+        parts = [f"{key} p95 {stats['p95']:.3f}" for key, stats in phase_timings.items() if key in ("classification", "response_generation", "tts", "turn_total")]
+        print(f"  {phase:<14} " + ", ".join(parts))
+
+
+def compare_reports(previous, current, max_regression, min_seconds):
+    """Print p95 changes per endpoint; returns the endpoints that regressed beyond max_regression.
+
+    Changes smaller than min_seconds are ignored so millisecond noise on cheap endpoints does not fail a run.
+    """
+    regressions = []
+    print("\np95 vs previous run:")
+    for name, stats in current["endpoints"].items():
+        before = (previous.get("endpoints", {}).get(name) or {}).get("p95")
+        if before is None or stats.get("p95") is None:
+            continue
+        change = (stats["p95"] - before) / before if before > 0 else 0.0
+        flag = ""
+        if change > max_regression and stats["p95"] - before > min_seconds:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name:<20} {before:.3f}s -> {stats['p95']:.3f}s ({change:+.0%}){flag}")
+    return regressions
+
+
+def run(args):
+    random.seed(args.seed)
+    args.run_id = args.run_id or str(int(time.time()))
+    fake_server = None
+    if args.base_url:
+        make_client = lambda: HttpClient(args.base_url, args.request_timeout)
+    else:
+        app_module, fake_server = prepare_in_process(args)
+        make_client = lambda: InProcessClient(app_module.app)
+
+    recorder = Recorder()
+    runner = SessionRunner(args, recorder, make_client)
+    next_session = [0]
+    session_lock = threading.Lock()
+    started = time.perf_counter()
+
+    def worker(worker_index):
+        time.sleep(worker_start_delay(worker_index, args))
+        while True:
+            with session_lock:
+                if next_session[0] >= args.sessions:
+                    return
+                if args.duration > 0 and time.perf_counter() - started > args.duration:
+                    return
+                session_index = next_session[0]
+                next_session[0] += 1
+            try:
+                runner.run_session(session_index)
+            except Exception as error:
+                sys.stderr.write(f"session {session_index} failed: {error}\n")
+                recorder.session_finished(False)
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+    if fake_server is not None:
+        fake_server.shutdown()
+
+    report = build_report(args, recorder, wall_seconds)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nsaved {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as previous_file:
+            regressions = compare_reports(json.load(previous_file), report, args.max_regression, args.min_regression_seconds)
+        if regressions:
+            print(f"FAIL: p95 regression above {args.max_regression:.0%} for {', '.join(regressions)}")
+            return 1
+    return 0 if recorder.sessions_failed == 0 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="reflection sessions to run")
+    parser.add_argument("--concurrency", type=int, default=5, help="concurrent simulated students")
+    parser.add_argument("--ramp", default="linear", help="linear, step:<n> or none")
+    parser.add_argument("--ramp-seconds", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=0.0, help="stop starting sessions after this many seconds (0 = run all)")
+    parser.add_argument("--max-turns", type=int, default=40, help="turn limit per session")
+    parser.add_argument("--voice-ratio", type=float, default=0.2, help="share of answers sent as audio")
+    parser.add_argument("--list-every", type=int, default=3, help="refresh the conversation list every N turns")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between turns (seconds)")
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument("--voice-timeout", type=float, default=120.0)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--turn-preset", default="short")
+    parser.add_argument("--base-url", help="target a running instance instead of the in-process app")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--no-fake-openai", action="store_true", help="in-process mode: use the configured OpenAI API instead of the fake server")
+    parser.add_argument("--fake-arg", action="append", help="option passed to the fake OpenAI server (repeatable)")
+    parser.add_argument("--tts", action="store_true", help="in-process mode: synthesize replies via the fake server")
+    parser.add_argument("--quiet-app", action=argparse.BooleanOptionalAction, default=True, help="only show the app's warnings and errors")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--run-id", default="")
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--compare", help="earlier JSON report to compare p95 latencies with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed relative p95 increase with --compare")
+    parser.add_argument("--min-regression-seconds", type=float, default=0.01, help="ignore p95 increases smaller than this")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+"""
+Microbenchmarks for the backend's CPU and I/O hot paths.
+
+Each benchmark runs at several input sizes so its scaling curve can be
+followed across changes:
+- store.<backend>.load / list / headers / save: `get_conversation`,
+  `list_conversations`, `list_conversation_headers` and a one-turn
+  `append_messages` on a store holding 10 / 1k / 10k users (sqlite, journal
+  and the legacy json file; the json store rewrites the whole file per save)
+- store.find_conversation: the per-user scan behind every conversation lookup
+- prompt.system_prompt.cached / .cold: `build_reflection_system_prompt` with a
+  warm prefix cache and on a fresh `PromptCompiler`
+- app.build_phase_metadata, app.get_phase_turn_rule: per-turn phase bookkeeping
+- context.turn_context: history selection and formatting of a reply call
+  (`update_rolling_summary` + `build_turn_context`) for 10 to 1000 messages
+- app.cleanup_tts_audio_cache, app.cleanup_voice_jobs_locked: the TTL sweeps
+  run on every TTS store and voice-job lookup, with large caches
+
+A benchmark is timed in rounds of enough calls to last `--round-time`
+seconds; the report gives the median and p95 time per call over `--rounds`
+rounds and, per benchmark, the log-log growth exponent between its smallest
+and largest size (about 0 for constant, 1 for linear cost).
+
+`--output` writes the results as JSON (name -> size -> stats). With
+`--baseline` a previous JSON file is compared and the script exits with
+code 1 when a median got slower by more than `--threshold` (relative) and
+`--min-delta-us` (absolute), e.g. as a pre-deploy check.
+
+Usage (from Backend/):
+    python -m perf.microbench --output bench.json
+    python -m perf.microbench --quick --filter store.sqlite
+    python -m perf.microbench --baseline bench.json --threshold 0.25
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from conversation_store import JournalConversationStore, JsonFileConversationStore, SQLiteConversationStore, _find_conversation
+from context_builder import build_turn_context, update_rolling_summary
+from reflection_system_prompt import PromptCompiler, build_reflection_system_prompt
+
+STAGES = ["Description", "Feelings", "Evaluation", "Analysis", "Conclusion", "Action Plan"]
+STUDENT_SENTENCES = [
+    "Last week our team modelled the order-to-cash process in BPMN for the case study.",
+    "I felt nervous when the tutor pointed out that our model did not match the event log.",
+    "It went well that we split the work, but we validated our assumptions far too late.",
+    "I think this happened because we skipped the conformance checking step from the lecture.",
+    "Overall I learned that checking a process model against real data early saves rework.",
+    "Next time I will run a conformance check right after the first draft."
+]
+COACH_SENTENCES = [
+    "Thank you for sharing that. What exactly happened when you presented the model?",
+    "That sounds frustrating. How did you feel in that moment?",
+    "What went well in the group work, and what did not?",
+    "Why do you think the model and the event log diverged?",
+    "What is the most important thing you take away from this?",
+    "What will you do differently in your next modelling task?"
+]
+
+
+class Benchmark:
+    def __init__(self, name, size, func, setup=None, teardown=None, fixture=None):
+        self.name = name
+        self.size = size
+        self.func = func
+        self.setup = setup
+        self.teardown = teardown
+        self.fixture = fixture
+
+
+def make_message(index, rng):
+    stage = STAGES[(index // 4) % len(STAGES)]
+    if index % 2 == 0:
+        return {"sender": "user", "content": " ".join(rng.sample(STUDENT_SENTENCES, 2)), "phase": stage}
+    return {"sender": "system", "content": rng.choice(COACH_SENTENCES), "phase": stage}
+
+
+def make_conversation(conversation_id, message_count, rng):
+    return {
+        "id": conversation_id,
+        "title": f"Reflection {conversation_id}",
+        "stage": rng.choice(STAGES),
+        "turnPreset": "standard",
+        "time": "2024-05-01 10:00",
+        "text": " ".join(STUDENT_SENTENCES[:3]),
+        "phaseTurns": {stage: rng.randint(0, 5) for stage in STAGES},
+        "messages": [make_message(index, rng) for index in range(message_count)]
+    }
+
+
+def make_dataset(user_count, conversations_per_user, messages_per_conversation, seed):
+    rng = random.Random(seed)
+    return {
+        f"user-{index}": [make_conversation(conversation_id, messages_per_conversation, rng) for conversation_id in range(conversations_per_user)]
+        for index in range(user_count)
+    }
+
+
+def open_store(backend, data, work_dir):
+    """Create a `backend` store in `work_dir` pre-filled with `data`."""
+    seed_path = os.path.join(work_dir, "seed.json")
+    with open(seed_path, "w") as file:
+        file.write(json.dumps(data))
+    if backend == "json":
+        path = os.path.join(work_dir, "conversations.json")
+        os.replace(seed_path, path)
+        return JsonFileConversationStore(path)
+    if backend == "journal":
+        return JournalConversationStore(os.path.join(work_dir, "journal"), seed_json_path=seed_path, compact_interval=3600.0, compact_records=10 ** 9)
+    store = SQLiteConversationStore(os.path.join(work_dir, "conversations.sqlite3"))
+    store.import_all(data)
+    return store
+
+
+class StoreFixture:
+    """A populated store shared by the benchmarks of one backend and size."""
+
+    def __init__(self, backend, user_count, args):
+        self.backend = backend
+        self.user_count = user_count
+        self.args = args
+        self.store = None
+
+    def open(self):
+        if self.store is not None:
+            return
+        self.work_dir = tempfile.mkdtemp(prefix="voxareflect-bench-")
+        data = make_dataset(self.user_count, self.args.conversations, self.args.messages, self.args.seed)
+        self.users = list(data)
+        self.rng = random.Random(self.args.seed)
+        self.store = open_store(self.backend, data, self.work_dir)
+
+    def close(self):
+        if self.store is None:
+            return
+        self.store.close()
+        self.store = None
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def pick(self):
+        return self.rng.choice(self.users), self.rng.randrange(self.args.conversations)
+
+    def load(self):
+        self.store.get_conversation(*self.pick())
+
+    def list_all(self):
+        self.store.list_conversations(self.pick()[0])
+
+    def headers(self):
+        self.store.list_conversation_headers(self.pick()[0])
+
+    def save(self):
+        username, conversation_id = self.pick()
+        turn = [make_message(0, self.rng), make_message(1, self.rng)]
+        self.store.append_messages(username, conversation_id, turn, {"stage": "Feelings"})
+
+
+def store_benchmarks(args):
+    benchmarks = []
+    for backend in args.backends:
+        for user_count in args.store_sizes:
+            fixture = StoreFixture(backend, user_count, args)
+            for operation, func in (("load", fixture.load), ("list", fixture.list_all), ("headers", fixture.headers), ("save", fixture.save)):
+                benchmarks.append(Benchmark(f"store.{backend}.{operation}", user_count, func, fixture=fixture))
+    for conversation_count in args.scan_sizes:
+        conversations = [{"id": conversation_id, "title": ""} for conversation_id in range(conversation_count)]
+        last_id = conversation_count - 1
+        benchmarks.append(Benchmark(
+            "store.find_conversation", conversation_count,
+            lambda conversations=conversations, last_id=last_id: _find_conversation(conversations, last_id)
+        ))
+    return benchmarks
+
+
+def prompt_benchmarks(args):
+    contexts = [
+        {"current_phase": stage, "style_preset": style, "language": "en", "phase_turns_elapsed": turns}
+        for stage in STAGES for style in ("warm", "professional") for turns in (0, 3)
+    ]
+    counter = {"index": 0}
+
+    def cached():
+        counter["index"] += 1
+        build_reflection_system_prompt(contexts[counter["index"] % len(contexts)])
+
+    def cold():
+        counter["index"] += 1
+        PromptCompiler().compile(contexts[counter["index"] % len(contexts)])
+
+    benchmarks = [Benchmark("prompt.system_prompt.cached", 1, cached), Benchmark("prompt.system_prompt.cold", 1, cold)]
+    rng = random.Random(args.seed)
+    system_prompt = build_reflection_system_prompt(contexts[0])
+    current_text = " ".join(STUDENT_SENTENCES * 4)
+    for message_count in args.history_sizes:
+        history = [make_message(index, rng) for index in range(message_count)]
+
+        def turn_context(history=history):
+            rolling_summary, _ = update_rolling_summary(None, history, "Description")
+            build_turn_context(system_prompt, STUDENT_SENTENCES[0], current_text, history, rolling_summary=rolling_summary, phase_turns_elapsed=3)
+
+        benchmarks.append(Benchmark("context.turn_context", message_count, turn_context))
+    return benchmarks
+
+
+def import_app(work_dir):
+    """Import app.py against a temporary store without network access or API key."""
+    os.environ.setdefault("OPENAI_API_KEY", "microbench-placeholder")
+    os.environ["VOXAREFLECT_CONVERSATION_STORE"] = "sqlite"
+    os.environ["VOXAREFLECT_SQLITE_PATH"] = os.path.join(work_dir, "conversations.sqlite3")
+    os.environ["VOXAREFLECT_CONVERSATIONS_JSON"] = os.path.join(work_dir, "conversations.json")
+    os.environ["VOXAREFLECT_TTS_MODE"] = "none"
+    os.environ.setdefault("VOXAREFLECT_LOG_LEVEL", "WARNING")
+    import app
+    return app
+
+
+def app_benchmarks(args, work_dir):
+    app = import_app(work_dir)
+    stage_values = app.setOfStages + ["", "unknown"]
+    phase_rule_keys = [(stage, preset) for stage in STAGES for preset in app.TURN_PRESET_OPTIONS]
+    counter = {"index": 0}
+
+    def phase_metadata():
+        counter["index"] += 1
+        app.build_phase_metadata(stage_values[counter["index"] % len(stage_values)])
+
+    def phase_turn_rule():
+        counter["index"] += 1
+        app.get_phase_turn_rule(*phase_rule_keys[counter["index"] % len(phase_rule_keys)])
+
+    benchmarks = [Benchmark("app.build_phase_metadata", 1, phase_metadata), Benchmark("app.get_phase_turn_rule", 1, phase_turn_rule)]
+    for entry_count in args.scan_sizes:
+        def fill_tts(entry_count=entry_count):
+            # Fresh entries only: every call scans the whole cache and removes nothing,
+            # which is the steady-state cost on a busy server.
+            now = time.time()
+            app.tts_audio_cache.clear()
+            app.tts_audio_cache.update({f"audio-{index}": {"bytes": b"", "content_type": "audio/mpeg", "timestamp": now} for index in range(entry_count)})
+
+        def fill_jobs(entry_count=entry_count):
+            now = time.time()
+            app.voice_jobs.clear()
+            app.voice_jobs.update({f"job-{index}": {"status": "completed", "result": None, "error": None, "created_at": now} for index in range(entry_count)})
+
+        benchmarks.append(Benchmark("app.cleanup_tts_audio_cache", entry_count, app.cleanup_tts_audio_cache, setup=fill_tts, teardown=app.tts_audio_cache.clear))
+        benchmarks.append(Benchmark("app.cleanup_voice_jobs_locked", entry_count, app.cleanup_voice_jobs_locked, setup=fill_jobs, teardown=app.voice_jobs.clear))
+    return benchmarks
+
+
+def measure(func, rounds, round_time):
+    """Seconds per call for each of `rounds` rounds, each lasting at least `round_time`."""
+    func()
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= round_time or calls >= 1 << 20:
+            break
+        calls = max(calls * 2, int(calls * round_time / max(elapsed, 1e-9)))
+    samples = [elapsed / calls]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        samples.append((time.perf_counter() - started) / calls)
+    return samples, calls
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(math.ceil(pct / 100.0 * len(ordered))) - 1))]
+
+
+def growth_exponent(curve):
+    """Slope of log(time) over log(size) between the smallest and largest size."""
+    sizes = sorted(int(size) for size in curve)
+    if len(sizes) < 2 or sizes[0] <= 0:
+        return None
+    first, last = curve[str(sizes[0])]["median"], curve[str(sizes[-1])]["median"]
+    if first <= 0 or last <= 0:
+        return None
+    return math.log(last / first) / math.log(sizes[-1] / sizes[0])
+
+
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for name, curve in results.items():
+        for size, stats in curve.items():
+            before = baseline.get("results", {}).get(name, {}).get(size)
+            if not before:
+                continue
+            change = stats["median"] / before["median"] - 1.0 if before["median"] > 0 else 0.0
+            if change > threshold and stats["median"] - before["median"] > min_delta:
+                regressions.append((name, size, before["median"], stats["median"], change))
+    return regressions
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="voxareflect-microbench-")
+    benchmarks = store_benchmarks(args) + prompt_benchmarks(args) + app_benchmarks(args, work_dir)
+    if args.filter:
+        benchmarks = [benchmark for benchmark in benchmarks if any(part in benchmark.name for part in args.filter)]
+
+    results = {}
+    print(f"{'benchmark':<34}{'size':>8}{'median':>12}{'p95':>12}{'calls/s':>12}")
+    for index, benchmark in enumerate(benchmarks):
+        if benchmark.fixture is not None:
+            benchmark.fixture.open()
+        if benchmark.setup is not None:
+            benchmark.setup()
+        try:
+            samples, calls = measure(benchmark.func, args.rounds, args.round_time)
+        finally:
+            if benchmark.teardown is not None:
+                benchmark.teardown()
+            if benchmark.fixture is not None and not any(later.fixture is benchmark.fixture for later in benchmarks[index + 1:]):
+                benchmark.fixture.close()
+        median = statistics.median(samples)
+        stats = {"median": median, "p95": percentile(samples, 95), "min": min(samples), "callsPerRound": calls, "rounds": len(samples)}
+        results.setdefault(benchmark.name, {})[str(benchmark.size)] = stats
+        print(f"{benchmark.name:<34}{benchmark.size:>8}{median * 1e6:>10.1f}us{stats['p95'] * 1e6:>10.1f}us{1.0 / median:>12.1f}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    growth = {name: growth_exponent(curve) for name, curve in results.items()}
+    print("\ngrowth exponent (0 = constant, 1 = linear in size):")
+    for name, exponent in growth.items():
+        if exponent is not None:
+            print(f"  {name:<34}{exponent:>6.2f}")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+        "growth": growth
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nsaved {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold, args.min_delta_us / 1e6)
+        if regressions:
+            for name, size, before, after, change in regressions:
+                print(f"REGRESSION {name} [{size}]: {before * 1e6:.1f}us -> {after * 1e6:.1f}us ({change:+.0%})")
+            return 1
+        print(f"no regression above {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+def parse_sizes(value):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store-sizes", type=parse_sizes, default=[10, 1000, 10000], help="users in the store benchmarks")
+    parser.add_argument("--scan-sizes", type=parse_sizes, default=[10, 1000, 10000, 100000], help="entries for lookups and cache sweeps")
+    parser.add_argument("--history-sizes", type=parse_sizes, default=[10, 100, 1000], help="messages for the turn-context benchmark")
+    parser.add_argument("--backends", type=lambda value: [part.strip() for part in value.split(",") if part.strip()], default=["sqlite", "journal", "json"])
+    parser.add_argument("--conversations", type=int, default=2, help="conversations per user")
+    parser.add_argument("--messages", type=int, default=10, help="messages per conversation")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--round-time", type=float, default=0.05, help="minimum seconds per round")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and shorter rounds (smoke run)")
+    parser.add_argument("--filter", action="append", help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="earlier JSON results to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown of a median")
+    parser.add_argument("--min-delta-us", type=float, default=1.0, help="ignore slowdowns smaller than this many microseconds")
+    args = parser.parse_args()
+    if args.quick:
+        args.store_sizes = [size for size in args.store_sizes if size <= 1000]
+        args.scan_sizes = [size for size in args.scan_sizes if size <= 10000]
+        args.rounds = min(args.rounds, 3)
+        args.round_time = min(args.round_time, 0.01)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Benchmark for the Gibbs-stage detection behind `/determineFeedbackAndTitle`.
+
+Compares the per-stage strategy (one yes/no call per stage until the first
+"no") with the batched strategy (one JSON call for all remaining stages) on
+reflective texts that cover 0-6 stages, starting from every current stage.
+A simulated model answers both prompt styles from the sentences the text
+actually contains (a marker phrase per stage) and sleeps `--latency` seconds per call (plus
+`--batched-overhead` per stage in a batched call for the longer answer), so
+the run needs no API key. The script fails (exit code 1) if the two
+strategies ever disagree on the first missing stage.
+
+A second scenario replays an editing session: the student writes the text
+stage by stage, rewords a sentence, fixes whitespace and presses the
+feedback button after every edit. It reports the model calls per click with
+and without the content-hash verdict cache (`StageVerdictCache`), and checks
+that a second student's edited copy of the text reuses none of the first
+student's drafts.
+
+With `--live` the real models are used through `app.askFromGPT` /
+`app.askFromGPTJson` (needs OPENAI_API_KEY) on the same texts; disagreements
+are then reported but not treated as failures, since the model is not
+deterministic.
+
+Usage (from Backend/):
+    python -m perf.stage_classifier_benchmark
+    python -m perf.stage_classifier_benchmark --latency 0.8 --repeat 1
+    python -m perf.stage_classifier_benchmark --live --repeat 1
+"""
+
+import argparse
+import json
+import re
+import statistics
+import sys
+import threading
+import time
+
+from stage_classifier import StageVerdictCache, first_missing_stage_batched, first_missing_stage_sequential
+
+STAGES = ["Description", "Feelings", "Evaluation", "Analysis", "Conclusion", "Action Plan"]
+
+STAGE_SENTENCES = {
+    "Description": "Last week our team modelled the order-to-cash process in BPMN for a case study.",
+    "Feelings": "I felt nervous at first and frustrated when our model did not match the event log.",
+    "Evaluation": "It went well that we split the work, but we checked our assumptions far too late.",
+    "Analysis": "I think this happened because we skipped the conformance checking step the lecture recommended.",
+    "Conclusion": "Overall I learned that validating a process model against real data early saves a lot of rework.",
+    "Action Plan": "Next time I will run a conformance check after the first draft and plan a review with the team."
+}
+
+# Phrase the simulated model recognizes a stage by (survives the rewording in the editing session).
+STAGE_MARKERS = {
+    "Description": "order-to-cash process",
+    "Feelings": "I felt nervous",
+    "Evaluation": "It went well",
+    "Analysis": "this happened because",
+    "Conclusion": "Overall I learned",
+    "Action Plan": "Next time I will"
+}
+
+SINGLE_STAGE_PATTERN = re.compile(r"from the '([^']+)' class")
+BATCHED_STAGE_PATTERN = re.compile(r'^- "([^"]+)":', re.MULTILINE)
+NUMBERED_PARAGRAPH_PATTERN = re.compile(r"^\[(\d+)\] (.*)$", re.MULTILINE)
+
+
+class SimulatedModel:
+    """Answers stage prompts from the stage markers found in the text."""
+
+    def __init__(self, latency, batched_overhead):
+        self.latency = latency
+        self.batched_overhead = batched_overhead
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _covered(self, prompt, stage):
+        return STAGE_MARKERS[stage] in prompt
+
+    def ask(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        stage = SINGLE_STAGE_PATTERN.search(prompt).group(1)
+        if self._covered(prompt, stage):
+            return "Yes, the text contains a sentence from this class."
+        return "No, I cannot find such a sentence."
+
+    def ask_json(self, prompt):
+        with self._lock:
+            self.calls += 1
+        stages = BATCHED_STAGE_PATTERN.findall(prompt)
+        time.sleep(self.latency + self.batched_overhead * len(stages))
+        paragraphs = NUMBERED_PARAGRAPH_PATTERN.findall(prompt)
+        answer = {}
+        for stage in stages:
+            evidence = [int(number) for number, paragraph in paragraphs if STAGE_MARKERS[stage] in paragraph]
+            answer[stage] = {"found": bool(evidence), "paragraphs": evidence}
+        return json.dumps(answer)
+
+
+class CountingModel:
+    """Wraps the live app helpers to count calls."""
+
+    def __init__(self, app_module):
+        self.app = app_module
+        self.calls = 0
+
+    def ask(self, prompt):
+        self.calls += 1
+        return self.app.askFromGPT(prompt)
+
+    def ask_json(self, prompt):
+        self.calls += 1
+        return self.app.askFromGPTJson(prompt)
+
+
+def build_cases():
+    """(start_index, covered_count, text) for every start stage and coverage level."""
+    cases = []
+    for covered_count in range(len(STAGES) + 1):
+        text = " ".join(STAGE_SENTENCES[stage] for stage in STAGES[:covered_count]) or "I have not written much yet."
+        for start_index in range(len(STAGES)):
+            cases.append((start_index, covered_count, text))
+    return cases
+
+
+def build_edit_session():
+    """(current_stage_index, text) per feedback click while a student writes and revises."""
+    clicks = []
+    written = []
+    for stage_index, stage in enumerate(STAGES):
+        written.append(STAGE_SENTENCES[stage])
+        # The first missing stage is now the next one; the student clicks twice (one retry).
+        current = min(stage_index + 1, len(STAGES) - 1)
+        clicks.append((current, "\n".join(written)))
+        clicks.append((current, "\n".join(written)))
+    clicks.append((0, "\n\n".join(written)))
+    reworded = list(written)
+    reworded[2] = reworded[2].replace("far too late", "much too late")
+    clicks.append((0, "\n".join(reworded)))
+    clicks.append((0, "\n".join(reworded + ["Thanks for reading."])))
+    return clicks
+
+
+def run_strategy(strategy, model, text, stages, verdict_cache=None, owner=None):
+    calls_before = model.calls
+    started = time.perf_counter()
+    if strategy == "sequential":
+        result = first_missing_stage_sequential(text, stages, model.ask, verdict_cache, owner)
+    else:
+        result = first_missing_stage_batched(text, stages, model.ask_json, model.ask, verdict_cache, owner)
+    return result, model.calls - calls_before, time.perf_counter() - started
+
+
+def summarize(label, calls, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    print(
+        f"{label:<11} calls/request avg {statistics.mean(calls):.2f} max {max(calls)} | "
+        f"latency avg {statistics.mean(latencies):.3f}s p95 {p95:.3f}s max {max(latencies):.3f}s"
+    )
+
+
+def run(args):
+    if args.live:
+        import app
+        model = CountingModel(app)
+    else:
+        model = SimulatedModel(args.latency, args.batched_overhead)
+
+    results = {"sequential": {"calls": [], "latencies": []}, "batched": {"calls": [], "latencies": []}}
+    disagreements = []
+    for _ in range(args.repeat):
+        for start_index, covered_count, text in build_cases():
+            stages = STAGES[start_index:]
+            answers = {}
+            for strategy in ("sequential", "batched"):
+                answer, calls, elapsed = run_strategy(strategy, model, text, stages)
+                answers[strategy] = answer
+                results[strategy]["calls"].append(calls)
+                results[strategy]["latencies"].append(elapsed)
+            if answers["sequential"] != answers["batched"]:
+                disagreements.append((STAGES[start_index], covered_count, answers))
+
+    print(f"{len(results['batched']['calls'])} requests per strategy ({'live' if args.live else 'simulated'} model)")
+    for strategy in ("sequential", "batched"):
+        summarize(strategy, results[strategy]["calls"], results[strategy]["latencies"])
+    speedup = statistics.mean(results["sequential"]["latencies"]) / max(1e-9, statistics.mean(results["batched"]["latencies"]))
+    print(f"batched is {speedup:.1f}x faster on average")
+
+    session = build_edit_session()
+    print(f"\nediting session: {len(session)} feedback clicks")
+    session_answers = {}
+    for label, strategy, use_cache in (
+        ("sequential", "sequential", False),
+        ("batched", "batched", False),
+        ("batched+cache", "batched", True)
+    ):
+        verdict_cache = StageVerdictCache(enabled=True) if use_cache else None
+        calls = []
+        latencies = []
+        answers = []
+        for start_index, text in session:
+            answer, call_count, elapsed = run_strategy(strategy, model, text, STAGES[start_index:], verdict_cache, owner="student")
+            answers.append(answer)
+            calls.append(call_count)
+            latencies.append(elapsed)
+        session_answers[label] = answers
+        print(f"{label:<14} total calls {sum(calls):>3} | per click {calls} | latency total {sum(latencies):.3f}s")
+        if verdict_cache is not None:
+            print(f"{'':<14} cache {verdict_cache.stats()}")
+    for label, answers in session_answers.items():
+        if answers != session_answers["sequential"]:
+            disagreements.append(("editing session", label, answers))
+
+    # Another student submitting an edited copy must not be served verdicts derived from these drafts.
+    _, last_text = session[-1]
+    hits_before = verdict_cache.stats()["incrementalHits"]
+    run_strategy("batched", model, last_text + "\nMy own closing remark.", STAGES, verdict_cache, owner="other-student")
+    leaked = verdict_cache.stats()["incrementalHits"] - hits_before
+    print(f"other student's edited copy: {leaked} incremental hit(s) on the first student's drafts")
+    if leaked:
+        print("FAIL: verdict cache reused another student's drafts")
+        return 1
+
+    if disagreements:
+        print(f"{len(disagreements)} disagreement(s) on the first missing stage, e.g. {disagreements[0]}")
+        if not args.live:
+            print("FAIL: strategies disagree")
+            return 1
+    print("OK")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per model call")
+    parser.add_argument("--batched-overhead", type=float, default=0.005, help="extra simulated seconds per stage in a batched call")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="use the real models via app.py (needs OPENAI_API_KEY)")
+    return run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
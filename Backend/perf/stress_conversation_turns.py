@@ -0,0 +1,143 @@
+"""
+Concurrency stress check for chat turns.
+
+Many threads push turns through `app.process_chat_turn` at once: several
+threads hammer the same conversation while other students work on their
+own conversations. The language model is replaced by a stand-in engine
+that sleeps for `--llm-delay` seconds, so the run needs no API key.
+
+The script fails (exit code 1) when
+- any message or phase-turn increment is lost, or
+- unrelated conversations did not run in parallel, i.e. the wall time is
+  far above the time one conversation needs for its own turns.
+
+Usage (from Backend/):
+    python -m perf.stress_conversation_turns --users 8 --turns 6 --writers 3
+    python -m perf.stress_conversation_turns --store json
+    python -m perf.stress_conversation_turns --store journal
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+
+class DelayedEngine:
+    """Stands in for chatomatic.Chatomatic and simulates LLM latency."""
+
+    def __init__(self, delay_seconds):
+        self.delay_seconds = delay_seconds
+
+    def answer(self, question, language_for_app, current_text, reflection_context=None, conversation_history=None, on_event=None):
+        time.sleep(self.delay_seconds)
+        meta = {
+            "phaseSuggestion": "stay",
+            "calculatedNextPhase": (reflection_context or {}).get("current_phase"),
+            "reflectionSummary": None,
+            "timings": {"response_generation": self.delay_seconds}
+        }
+        return f"ack: {question}", SimpleNamespace(buttons=[], video=""), meta
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="voxareflect-stress-")
+    os.environ.setdefault("OPENAI_API_KEY", "stress-test-placeholder")
+    os.environ["VOXAREFLECT_CONVERSATION_STORE"] = args.store
+    os.environ["VOXAREFLECT_SQLITE_PATH"] = os.path.join(work_dir, "conversations.sqlite3")
+    os.environ["VOXAREFLECT_CONVERSATIONS_JSON"] = os.path.join(work_dir, "conversations.json")
+    os.environ["VOXAREFLECT_JOURNAL_DIR"] = os.path.join(work_dir, "journal")
+    os.environ["VOXAREFLECT_TTS_MODE"] = "none"
+
+    import app
+
+    app.chatomatic_engine = DelayedEngine(args.llm_delay)
+    # Conversations still move on once a phase reaches its turn cap; the long preset
+    # only makes that rarer. The final check sums phaseTurns over every phase.
+    base_payload = {"language": "en", "turnPreset": "long"}
+
+    conversation_ids = {}
+    for user_index in range(args.users):
+        username = f"stress-user-{user_index}"
+        result = app.process_chat_turn(dict(base_payload, username=username, conversationID=-1, newMessage="opening"))
+        if not result.get("success"):
+            print(f"FAIL: could not create conversation for {username}")
+            return 1
+        conversation_ids[username] = result["id"]
+
+    errors = []
+
+    def writer(username, writer_index):
+        for turn_index in range(args.turns):
+            payload = dict(
+                base_payload,
+                username=username,
+                conversationID=conversation_ids[username],
+                newMessage=f"writer {writer_index} turn {turn_index}"
+            )
+            result = app.process_chat_turn(payload)
+            if not result.get("success"):
+                errors.append(f"{username}: turn {writer_index}/{turn_index} failed")
+
+    threads = []
+    for username in conversation_ids:
+        for writer_index in range(args.writers):
+            threads.append(threading.Thread(target=writer, args=(username, writer_index)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    turns_per_conversation = args.turns * args.writers
+    for username, conversation_id in conversation_ids.items():
+        conversation = app.conversation_store.get_conversation(username, conversation_id)
+        expected_messages = 2 * (turns_per_conversation + 1)
+        if len(conversation["messages"]) != expected_messages:
+            errors.append(f"{username}: {len(conversation['messages'])} messages, expected {expected_messages}")
+        recorded_turns = sum(conversation.get("phaseTurns", {}).values())
+        if recorded_turns != turns_per_conversation + 1:
+            errors.append(f"{username}: {recorded_turns} phase turns recorded, expected {turns_per_conversation + 1}")
+        user_contents = [message["content"] for message in conversation["messages"] if message["sender"] == "user"]
+        for writer_index in range(args.writers):
+            for turn_index in range(args.turns):
+                if f"writer {writer_index} turn {turn_index}" not in user_contents:
+                    errors.append(f"{username}: lost 'writer {writer_index} turn {turn_index}'")
+
+    # Turns on one conversation serialize; turns on different conversations must not.
+    serial_floor = turns_per_conversation * args.llm_delay
+    fully_serialized = serial_floor * args.users
+    parallel_ok = elapsed < serial_floor + (fully_serialized - serial_floor) * args.parallel_tolerance
+    total_turns = turns_per_conversation * args.users
+    print(f"store={args.store} users={args.users} writers/conversation={args.writers} turns/writer={args.turns}")
+    print(f"{total_turns} turns in {elapsed:.2f}s ({total_turns / elapsed:.1f} turns/s); "
+          f"per-conversation floor {serial_floor:.2f}s, global-lock estimate {fully_serialized:.2f}s")
+    print(f"lock wait total {app.conversation_locks.total_wait_seconds:.2f}s, idle locks left {app.conversation_locks.active_count()}")
+    if args.users > 1 and not parallel_ok:
+        errors.append(f"conversations did not run in parallel ({elapsed:.2f}s vs floor {serial_floor:.2f}s)")
+    if errors:
+        for error in errors[:20]:
+            print("FAIL:", error)
+        return 1
+    print("OK: no lost updates")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", choices=["sqlite", "json", "journal"], default="sqlite")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=3, help="concurrent writers per conversation")
+    parser.add_argument("--turns", type=int, default=4, help="turns per writer")
+    parser.add_argument("--llm-delay", type=float, default=0.05)
+    parser.add_argument("--parallel-tolerance", type=float, default=0.5,
+                        help="fraction of the fully serialized extra time that still counts as parallel")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Local stand-in for an OTLP/HTTP trace collector, plus a reader that shows
+where traced turns spent their time.
+
+`serve` accepts the backend's span exports on POST /v1/traces (OTLP/JSON,
+the body `tracing.py` sends when VOXAREFLECT_TRACING_EXPORT is an URL) and
+appends each request as one line to `--output`, the same layout the backend
+writes when it exports to a file. GET /stats reports what was received.
+
+`summarize` reads such a file (from the collector or written by the backend
+directly) and prints:
+- per span name: count, p50/p95/max duration and errors
+- the slowest traces as span trees, with each span's offset from the trace
+  start, its duration and its main attributes (model, tokens, bytes, phase,
+  cache hits)
+
+A real OpenTelemetry collector or Jaeger (OTLP/HTTP on port 4318) accepts the
+same exports.
+
+Usage (from Backend/):
+    python -m perf.trace_collector serve --port 4318 --output traces.jsonl
+    VOXAREFLECT_TRACING=on VOXAREFLECT_TRACING_EXPORT=http://127.0.0.1:4318/v1/traces python app.py
+    python -m perf.trace_collector summarize traces.jsonl --slowest 5
+    python -m perf.trace_collector summarize traces.jsonl --root "POST /uploadAudio" --slowest 3
+"""
+
+import argparse
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Attributes shown next to spans in trace trees (shortened names).
+SHOWN_ATTRIBUTES = {
+    "gen_ai.request.model": "model",
+    "gen_ai.usage.input_tokens": "in_tokens",
+    "gen_ai.usage.output_tokens": "out_tokens",
+    "voxareflect.llm.cached_input_tokens": "cached_tokens",
+    "voxareflect.llm.attempts": "attempts",
+    "voxareflect.llm.upload_bytes": "upload_bytes",
+    "file.size": "bytes",
+    "voxareflect.tts.audio_bytes": "audio_bytes",
+    "voxareflect.tts.input_chars": "tts_chars",
+    "voxareflect.phase": "phase",
+    "voxareflect.phase_suggestion": "suggestion",
+    "voxareflect.classifier_skipped": "classifier_skipped",
+    "voxareflect.response_cache.hit": "cache_hit",
+    "voxareflect.speculative_hit": "speculative_hit",
+    "voxareflect.store.operation": "op",
+    "voxareflect.store.new_messages": "messages",
+    "voxareflect.queue_wait_seconds": "queue_wait",
+    "http.response.status_code": "status"
+}
+
+
+class CollectorState:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.spans = 0
+        self.traces = set()
+
+    def store(self, document):
+        spans = list(iter_spans(document))
+        line = json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+        with self.lock:
+            with open(self.output_path, "a", encoding="utf-8") as output_file:
+                output_file.write(line + "\n")
+            self.requests += 1
+            self.spans += len(spans)
+            self.traces.update(span["traceId"] for span in spans)
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "spans": self.spans, "traces": len(self.traces), "output": self.output_path}
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0") or 0)
+        body = self.rfile.read(length) if length > 0 else b""
+        if self.path.split("?", 1)[0] != "/v1/traces":
+            self._send_json(404, {"error": "not found"})
+            return
+        if "json" not in (self.headers.get("Content-Type") or ""):
+            # Protobuf exports are not decoded here; configure the exporter for JSON.
+            self._send_json(415, {"error": "only application/json OTLP exports are accepted"})
+            return
+        try:
+            document = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        self.state.store(document)
+        self._send_json(200, {"partialSuccess": {}})
+
+
+def build_server(args):
+    handler = type("ConfiguredCollectorHandler", (CollectorHandler,), {"state": CollectorState(args.output), "quiet": not args.verbose})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def iter_spans(document):
+    for resource_spans in document.get("resourceSpans", []) or []:
+        for scope_spans in resource_spans.get("scopeSpans", []) or []:
+            for span in scope_spans.get("spans", []) or []:
+                yield span
+
+
+def _attribute_value(value):
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_attribute_value(item) for item in value["arrayValue"].get("values", [])]
+    return None
+
+
+def load_spans(path):
+    """Spans of every export in `path` (one OTLP JSON document per line), deduplicated by spanId."""
+    spans = {}
+    with open(path, "r", encoding="utf-8") as trace_file:
+        for line in trace_file:
+            line = line.strip()
+            if not line:
+                continue
+            for span in iter_spans(json.loads(line)):
+                start = int(span.get("startTimeUnixNano", 0))
+                end = int(span.get("endTimeUnixNano", start))
+                spans[span["spanId"]] = {
+                    "traceId": span["traceId"],
+                    "spanId": span["spanId"],
+                    "parentSpanId": span.get("parentSpanId") or None,
+                    "name": span.get("name", ""),
+                    "start": start,
+                    "seconds": (end - start) / 1e9,
+                    "error": (span.get("status") or {}).get("code") == 2,
+                    "attributes": {item["key"]: _attribute_value(item.get("value", {})) for item in span.get("attributes", [])},
+                    "events": [event.get("name", "") for event in span.get("events", [])]
+                }
+    return list(spans.values())
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def group_traces(spans):
+    traces = {}
+    for span in spans:
+        traces.setdefault(span["traceId"], []).append(span)
+    return traces
+
+
+def trace_root(trace_spans):
+    """The span without a parent in this trace (earliest first), or the earliest span."""
+    span_ids = {span["spanId"] for span in trace_spans}
+    roots = [span for span in trace_spans if span["parentSpanId"] not in span_ids]
+    return min(roots or trace_spans, key=lambda span: span["start"])
+
+
+def trace_seconds(trace_spans):
+    start = min(span["start"] for span in trace_spans)
+    end = max(span["start"] + span["seconds"] * 1e9 for span in trace_spans)
+    return (end - start) / 1e9
+
+
+def format_attributes(attributes):
+    parts = []
+    for key, label in SHOWN_ATTRIBUTES.items():
+        value = attributes.get(key)
+        if value is None or value is False:
+            continue
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        parts.append(f"{label}={value}")
+    return " ".join(parts)
+
+
+def print_tree(trace_spans, out=sys.stdout):
+    children = {}
+    for span in trace_spans:
+        children.setdefault(span["parentSpanId"], []).append(span)
+    for siblings in children.values():
+        siblings.sort(key=lambda span: span["start"])
+    trace_start = min(span["start"] for span in trace_spans)
+    span_ids = {span["spanId"] for span in trace_spans}
+    top_level = sorted((span for span in trace_spans if span["parentSpanId"] not in span_ids), key=lambda span: span["start"])
+
+    def walk(span, depth):
+        offset = (span["start"] - trace_start) / 1e9
+        marker = " !" if span["error"] else ""
+        events = f" events={','.join(span['events'])}" if span["events"] else ""
+        label = f"{'  ' * depth}{span['name']}{marker}"
+        out.write(f"  {offset:8.3f}s {span['seconds']:8.3f}s  {label:<44} {format_attributes(span['attributes'])}{events}\n")
+        for child in children.get(span["spanId"], []):
+            walk(child, depth + 1)
+
+    for span in top_level:
+        walk(span, 0)
+
+
+def summarize(args):
+    spans = load_spans(args.path)
+    if not spans:
+        print(f"No spans in {args.path}")
+        return 1
+    traces = group_traces(spans)
+    if args.root:
+        traces = {trace_id: trace_spans for trace_id, trace_spans in traces.items() if trace_root(trace_spans)["name"] == args.root}
+    selected = [span for trace_spans in traces.values() for span in trace_spans]
+    print(f"{len(selected)} spans in {len(traces)} traces from {args.path}")
+    print()
+    by_name = {}
+    for span in selected:
+        by_name.setdefault(span["name"], []).append(span)
+    print(f"{'span':<36} {'count':>6} {'p50':>8} {'p95':>8} {'max':>8} {'errors':>7}")
+    for name, named_spans in sorted(by_name.items(), key=lambda item: -sum(span["seconds"] for span in item[1])):
+        durations = [span["seconds"] for span in named_spans]
+        errors = sum(1 for span in named_spans if span["error"])
+        print(f"{name[:36]:<36} {len(durations):>6} {percentile(durations, 0.5):>8.3f} {percentile(durations, 0.95):>8.3f} {max(durations):>8.3f} {errors:>7}")
+    slowest = sorted(traces.values(), key=trace_seconds, reverse=True)[:max(0, args.slowest)]
+    for trace_spans in slowest:
+        root = trace_root(trace_spans)
+        print()
+        print(f"trace {root['traceId']}  {root['name']}  {trace_seconds(trace_spans):.3f}s  ({len(trace_spans)} spans)")
+        print_tree(trace_spans)
+    return 0
+
+
+def serve(args):
+    server = build_server(args)
+    host, port = server.server_address[:2]
+    print(f"Trace collector listening on http://{host}:{port}, writing to {args.output}")
+    print(f"  VOXAREFLECT_TRACING=on VOXAREFLECT_TRACING_EXPORT=http://{host}:{port}/v1/traces")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(json.dumps(server.RequestHandlerClass.state.snapshot()))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="accept OTLP/JSON exports on /v1/traces")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=4318)
+    serve_parser.add_argument("--output", default="traces.jsonl", help="file the exports are appended to")
+    serve_parser.add_argument("--verbose", action="store_true", help="log every request")
+    summarize_parser = subparsers.add_parser("summarize", help="per-span statistics and the slowest traces of an export file")
+    summarize_parser.add_argument("path", help="OTLP/JSON lines file (collector output or VOXAREFLECT_TRACING_EXPORT file)")
+    summarize_parser.add_argument("--slowest", type=int, default=3, help="number of slowest traces printed as trees")
+    summarize_parser.add_argument("--root", help="only traces whose root span has this name, e.g. 'POST /uploadAudio'")
+    return parser
+
+
+def start_in_background(argv=None):
+    """Start a collector on a daemon thread (for harnesses); returns (server, traces_url)."""
+    args = build_parser().parse_args(["serve"] + list(argv or []))
+    server = build_server(args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1/traces"
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.command == "serve":
+        return serve(args)
+    return summarize(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
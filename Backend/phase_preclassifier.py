@@ -0,0 +1,168 @@
+"""
+Local phase decisions that make the LLM phase classifier unnecessary.
+
+`preclassify_phase` looks at the turn counters and the student's message and
+returns a suggestion ("stay" / "advance") with a confidence and the rule that
+produced it. Only decisions at or above `PRECLASSIFIER_MIN_CONFIDENCE` replace
+the classifier call; everything else is treated as ambiguous and still goes to
+the model. Ambiguous decisions carry a graded lean (stay early in a phase or
+for short answers, advance close to the turn cap) that speculative mode uses
+to pick which reply to start; it never skips the classifier. A small sample
+of skipped heuristic decisions is re-checked by the model in the background
+so the agreement rate can be watched in the logs.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# "off" keeps only the minimum-turn rule that existed before.
+PRECLASSIFIER_ENABLED = os.environ.get("VOXAREFLECT_PRECLASSIFIER", "on").strip().lower() not in ("0", "off", "false", "no")
+PRECLASSIFIER_MIN_CONFIDENCE = float(os.environ.get("VOXAREFLECT_PRECLASSIFIER_MIN_CONFIDENCE", "0.85"))
+PRECLASSIFIER_SHORT_WORDS = int(os.environ.get("VOXAREFLECT_PRECLASSIFIER_SHORT_WORDS", "4"))
+PRECLASSIFIER_SAMPLE_RATE = float(os.environ.get("VOXAREFLECT_PRECLASSIFIER_SAMPLE_RATE", "0.05"))
+PRECLASSIFIER_LOG_EVERY = int(os.environ.get("VOXAREFLECT_PRECLASSIFIER_LOG_EVERY", "50"))
+# Lean of ambiguous turns: answers below this many words lean towards stay at full strength.
+LEAN_SHORT_WORDS = 8
+LEAN_MAX_CONFIDENCE = 0.8
+# Decisions that only lean; they go to the classifier whatever their confidence.
+LEAN_ONLY_REASONS = ("ambiguous", "disabled")
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _decision(suggestion, confidence, reason):
+    return {"suggestion": suggestion, "confidence": confidence, "reason": reason}
+
+
+def preclassify_phase(context, question):
+    """
+    Decide the phase outcome locally where the rules already determine it.
+
+    Rules, in order:
+    - below_minimum: the phase has not had its minimum turns yet (stay, certain)
+    - cap_reached: this reply reaches the phase's turn cap, which app.py enforces anyway (advance, certain)
+    - canned_prompt: the message is a UI button or ideas prompt, not a reflection answer (stay)
+    - short_input: the message has almost no content (stay)
+    Anything else is "ambiguous" and gets the graded lean of `_ambiguous_lean`.
+    """
+    context = context or {}
+    if context.get("skip_phase_classifier"):
+        return _decision("stay", 1.0, "below_minimum")
+
+    turns_after_reply = context.get("phase_turns_after_reply")
+    if not isinstance(turns_after_reply, int):
+        turns_after_reply = int(context.get("phase_turns_elapsed", 0) or 0) + 1
+    word_count = len(WORD_PATTERN.findall(str(question or "")))
+    if not PRECLASSIFIER_ENABLED:
+        suggestion, confidence = _ambiguous_lean(context, turns_after_reply, word_count)
+        return _decision(suggestion, confidence, "disabled")
+
+    turn_max = context.get("phase_turn_max")
+    if isinstance(turn_max, (int, float)) and turn_max > 0 and turns_after_reply >= int(turn_max):
+        return _decision("advance", 1.0, "cap_reached")
+
+    if context.get("is_canned_prompt"):
+        return _decision("stay", 0.95, "canned_prompt")
+
+    if word_count <= PRECLASSIFIER_SHORT_WORDS:
+        return _decision("stay", 0.9, "short_input")
+    suggestion, confidence = _ambiguous_lean(context, turns_after_reply, word_count)
+    return _decision(suggestion, confidence, "ambiguous")
+
+
+def _ambiguous_lean(context, turns_after_reply, word_count):
+    """
+    (suggestion, confidence) for a turn the rules do not settle, between 0.5 and
+    LEAN_MAX_CONFIDENCE: short answers lean stay; otherwise the lean follows the
+    turn's position between the phase minimum (stay) and the turn cap (advance),
+    weakest halfway.
+    """
+    if word_count < LEAN_SHORT_WORDS:
+        return "stay", LEAN_MAX_CONFIDENCE
+    turn_min = int(context.get("phase_turn_min", 0) or 0)
+    turn_max = context.get("phase_turn_max")
+    if not isinstance(turn_max, (int, float)) or turn_max <= turn_min + 1:
+        return "stay", 0.5
+    # The last turn before the cap is the latest an ambiguous turn can be.
+    progress = (turns_after_reply - turn_min) / (int(turn_max) - 1 - turn_min)
+    progress = min(1.0, max(0.0, progress))
+    strength = abs(2.0 * progress - 1.0)
+    return ("advance" if progress > 0.5 else "stay"), round(0.5 + (LEAN_MAX_CONFIDENCE - 0.5) * strength, 3)
+
+
+def is_confident(decision):
+    """True if the decision replaces the classifier call (leans never do)."""
+    return (
+        decision is not None
+        and decision["reason"] not in LEAN_ONLY_REASONS
+        and decision["confidence"] >= PRECLASSIFIER_MIN_CONFIDENCE
+    )
+
+
+def should_audit(decision):
+    """Heuristic skips (confidence below 1.0) are sampled for a background check by the LLM."""
+    return is_confident(decision) and decision["confidence"] < 1.0 and random.random() < PRECLASSIFIER_SAMPLE_RATE
+
+
+class PreclassifierStats:
+    """Counts skipped classifier calls and how often sampled LLM decisions agree."""
+
+    def __init__(self, log_every=PRECLASSIFIER_LOG_EVERY):
+        self.log_every = max(1, log_every)
+        self._lock = threading.Lock()
+        self.decisions = 0
+        self.skipped = 0
+        self.by_reason = {}
+        self.audited = 0
+        self.agreed = 0
+
+    def record_decision(self, decision, skipped):
+        with self._lock:
+            self.decisions += 1
+            if skipped:
+                self.skipped += 1
+                self.by_reason[decision["reason"]] = self.by_reason.get(decision["reason"], 0) + 1
+            should_log = self.decisions % self.log_every == 0
+        if should_log:
+            self.log()
+
+    def record_audit(self, decision, llm_suggestion):
+        # The classifier's "none" falls back to staying, so it counts as "stay".
+        llm_value = "advance" if llm_suggestion == "advance" else "stay"
+        agreed = llm_value == decision["suggestion"]
+        with self._lock:
+            self.audited += 1
+            if agreed:
+                self.agreed += 1
+        if not agreed:
+            logger.info("Phase pre-classifier disagreement: local %s (%s) vs LLM %s", decision["suggestion"], decision["reason"], llm_suggestion)
+        return agreed
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "decisions": self.decisions,
+                "skipped": self.skipped,
+                "skipRate": (self.skipped / self.decisions) if self.decisions else 0.0,
+                "byReason": dict(self.by_reason),
+                "audited": self.audited,
+                "agreed": self.agreed,
+                "agreementRate": (self.agreed / self.audited) if self.audited else None
+            }
+
+    def log(self):
+        stats = self.snapshot()
+        agreement = "n/a" if stats["agreementRate"] is None else f"{stats['agreementRate']:.1%} of {stats['audited']}"
+        logger.info(
+            f"Phase pre-classifier: skipped {stats['skipped']}/{stats['decisions']} ({stats['skipRate']:.1%}) "
+            f"{stats['byReason']}; sampled agreement {agreement}",
+            extra={"fields": {"preclassifier": stats}}
+        )
+
+
+preclassifier_stats = PreclassifierStats()
@@ -3,8 +3,11 @@ System prompt builder for the reflection assistant.
 
 The sections below define the role, internal reasoning, phase model,
 and behavioural guidelines for the VoxaReflect reflection workflow.
+Static sections are compiled once per (style, language, phase) and reused.
 """
 
+import threading
+from collections import OrderedDict
 from typing import Dict
 
 PHASE_DEFINITIONS = {
@@ -124,47 +127,25 @@ Current focus: {fallback_phase}
     }
 
 
-def build_reflection_system_prompt(context: Dict) -> str:
-    """
-    Build the system prompt for the reflection coach.
+# Upper bound on compiled prompt prefixes kept in memory; style and language come from requests.
+PROMPT_CACHE_MAX_ENTRIES = 256
 
-    The prompt is structured into four sections:
-    - Assistant role
-    - Internal reasoning / chain-of-thought (not shown to the user)
-    - Phases (Gibbs-style reflection cycle)
-    - General guidelines
 
-    The context dict can include:
-    - current_phase: current Gibbs stage label
-    - phase_is_finished: bool
-    - style_preset: "warm" or "professional"
-    - language: language code or description
-    """
-    if not isinstance(context, dict):
-        context = {}
-
-    phase_label = context.get("current_phase")
-    phase_finished = context.get("phase_is_finished", False)
-    style_preset = context.get("style_preset")
-    language_code = context.get("language")
-
-    current_phase = phase_label or "Description"
-    style = style_preset or "professional"
-    language = language_code or "auto"
-
-    assistant_role_section = f"""
+def _assistant_role_section() -> str:
+    return """
     # Assistant Role
     You are an artificial intelligence designed to assist university students in reflecting on their experiences. You guide them through a structured reflection process, 
     helping them to think deeply about their experiences and to articulate their insights in their own words.
 
     In the reflection process, you follow a Gibbs-style cycle with distinct phases: Description, Feelings, Evaluation, Analysis, Conclusion, and Action Plan.
-    The current phase is: "{current_phase}".  
 
     Since your responses may be read out loud via text-to-speech, ensure that your replies are concise, clear, and easy to read aloud. Also , avoid complex sentence structures
     that may be difficult to understand when spoken.
     """.strip()
 
-    internal_reasoning_section = f"""
+
+def _internal_reasoning_section(style: str) -> str:
+    return f"""
     # Resoning Instructions
     This section contains instructions for your internal reasoning process.
 
@@ -189,12 +170,42 @@ def build_reflection_system_prompt(context: Dict) -> str:
 
     """.strip()
 
+
+def _general_guidelines_section(style: str) -> str:
+    return f"""
+    # Guidelines for Behaviour and Interaction
+    This section contains general behavioural guidelines for your interaction with the student.
+
+    ## Ownership
+    The most important aspect of a reflection is for the student to think about their own experiences and express their own insights. It is essential that you provide a 
+    structure and ensure depth of thought through questions. Prefer using open-ended questions that encourage the student to elaborate, and avoid leading questions that suggest specific answers.
+
+    ## Depth and focus
+    You should ensure that the student reflects deeply on their experiences. Try to guide the students to move cleanly through the reflection phases, ensuring that they 
+    do not rush ahead without sufficient depth in each phase.
+
+    ## Interaction style
+    Your interaction style should be according to the selected style preset ("{style}"). Students who select "warm" may need more empathy and validation, while those
+    who select "professional" may prefer a more concise and task-focused approach. In any case, never claim to feel emotions yourself or suggest that you can perceive 
+    the student beyond this interaction. Should a student share very personal or distressing content, respond with care and encourage them to seek human support, since
+    you are an AI-based tool and not a human therapist, teacher, or friend.
+
+    ## Conversation-friendly replies
+    - Replies may be read out loud via text-to-speech. Always write in a way that is easy to read aloud: use short sentences, clear structure, and avoid lists and examples.
+    - Keep your replies short (about 1-4 sentences) and avoid including more than one main question in a message.
+    - Avoid repetition of sentece structures and words to keep the conversation engaging.
+    - Your goal is to have a conversation with the user. Sentences should be cohesive and not chopped into separate components (Avoid: "That is good", "Next step", "Question"). Keep it vivid.
+    - Your role is to help the user go through a reflection, not just praise them for their responses. You can be critical and should avoid over-positivity while staying professional. Avoid always thanking the user for the input.
+    - Avoid using parentheses and emojis.
+    """.strip()
+
+
+def _phase_section(current_phase: str) -> str:
     phase_metadata = get_phase_metadata(current_phase)
     goal_text = phase_metadata.get("goal", "").strip()
     depth_cue_text = phase_metadata.get("depth_cue", "").strip()
     body_text = phase_metadata.get("body", "").strip()
     turn_target = phase_metadata.get("turn_target")
-    turns_elapsed = context.get("phase_turns_elapsed")
 
     selected_phase_section_lines = []
     if goal_text:
@@ -203,8 +214,6 @@ def build_reflection_system_prompt(context: Dict) -> str:
         selected_phase_section_lines.append(f"- Depth cue: {depth_cue_text}")
     if turn_target:
         selected_phase_section_lines.append(f"- Suggested maximum turns: {turn_target}")
-    if turns_elapsed is not None:
-        selected_phase_section_lines.append(f"- Turns used so far: {turns_elapsed}")
     if body_text:
         if selected_phase_section_lines:
             selected_phase_section_lines.append("")
@@ -212,45 +221,106 @@ def build_reflection_system_prompt(context: Dict) -> str:
 
     selected_phase_section = "\n".join(selected_phase_section_lines).strip()
 
-    phases_section = f"""
+    return f"""
     # Current Phase Instructions
+    The current phase is: "{current_phase}".
     This is the instruction for the current reflection phase. Consider it when crafting your next prompt:
 
     {selected_phase_section}
     """.strip()
 
-    general_guidelines_section = f"""
-    # Guidelines for Behaviour and Interaction
-    This section contains general behavioural guidelines for your interaction with the student.
 
-    ## Ownership
-    The most important aspect of a reflection is for the student to think about their own experiences and express their own insights. It is essential that you provide a 
-    structure and ensure depth of thought through questions. Prefer using open-ended questions that encourage the student to elaborate, and avoid leading questions that suggest specific answers.
+class PromptCompiler:
+    """
+    Caches the static part of the system prompt per (style, language, phase).
 
-    ## Depth and focus
-    You should ensure that the student reflects deeply on their experiences. Try to guide the students to move cleanly through the reflection phases, ensuring that they 
-    do not rush ahead without sufficient depth in each phase.
+    The compiled prefix holds the role, reasoning, guidelines and phase sections in that
+    order, so it is byte-identical for every turn of a phase and the provider's prompt
+    cache can reuse it. Per-turn values (turns used so far) are appended after it, and
+    callers add the student's text and history at the very end.
+    """
 
-    ## Interaction style
-    Your interaction style should be according to the selected style preset ("{style}"). Students who select "warm" may need more empathy and validation, while those
-    who select "professional" may prefer a more concise and task-focused approach. In any case, never claim to feel emotions yourself or suggest that you can perceive 
-    the student beyond this interaction. Should a student share very personal or distressing content, respond with care and encourage them to seek human support, since
-    you are an AI-based tool and not a human therapist, teacher, or friend.
+    def __init__(self, max_entries: int = PROMPT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._prefixes = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def static_prefix(self, style: str, language: str, current_phase: str) -> str:
+        key = (style, language, current_phase)
+        with self._lock:
+            prefix = self._prefixes.get(key)
+            if prefix is not None:
+                self._prefixes.move_to_end(key)
+                self._stats["hits"] += 1
+                return prefix
+            self._stats["misses"] += 1
+        prefix = "\n\n".join(
+            [
+                _assistant_role_section(),
+                _internal_reasoning_section(style),
+                _general_guidelines_section(style),
+                _phase_section(current_phase),
+            ]
+        )
+        with self._lock:
+            self._prefixes[key] = prefix
+            self._prefixes.move_to_end(key)
+            while len(self._prefixes) > self.max_entries:
+                self._prefixes.popitem(last=False)
+                self._stats["evictions"] += 1
+        return prefix
+
+    def compile(self, context: Dict) -> str:
+        if not isinstance(context, dict):
+            context = {}
+        current_phase = context.get("current_phase") or "Description"
+        style = context.get("style_preset") or "professional"
+        language = context.get("language") or "auto"
+
+        prompt = self.static_prefix(style, language, current_phase)
+        turns_elapsed = context.get("phase_turns_elapsed")
+        if turns_elapsed is not None:
+            prompt += f"\n\n# Phase Progress\n- Turns used so far: {turns_elapsed}"
+        return prompt
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._prefixes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRate"] = (stats["hits"] / lookups) if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._prefixes.clear()
+
+
+prompt_compiler = PromptCompiler()
+
+
+def build_reflection_system_prompt(context: Dict) -> str:
+    """
+    Build the system prompt for the reflection coach.
+
+    The prompt is structured into five sections, static ones first:
+    - Assistant role
+    - Internal reasoning / chain-of-thought (not shown to the user)
+    - General guidelines
+    - Current phase (Gibbs-style reflection cycle)
+    - Phase progress (turns used so far)
+
+    The context dict can include:
+    - current_phase: current Gibbs stage label
+    - phase_is_finished: bool
+    - style_preset: "warm" or "professional"
+    - language: language code or description
+    - phase_turns_elapsed: turns already spent in the current phase
+    """
+    return prompt_compiler.compile(context)
 
-    ## Conversation-friendly replies
-    - Replies may be read out loud via text-to-speech. Always write in a way that is easy to read aloud: use short sentences, clear structure, and avoid lists and examples.
-    - Keep your replies short (about 1-4 sentences) and avoid including more than one main question in a message.
-    - Avoid repetition of sentece structures and words to keep the conversation engaging.
-    - Your goal is to have a conversation with the user. Sentences should be cohesive and not chopped into separate components (Avoid: "That is good", "Next step", "Question"). Keep it vivid.
-    - Your role is to help the user go through a reflection, not just praise them for their responses. You can be critical and should avoid over-positivity while staying professional. Avoid always thanking the user for the input.
-    - Avoid using parentheses and emojis.
-    """.strip()
 
-    return "\n\n".join(
-        [
-            assistant_role_section,
-            internal_reasoning_section,
-            phases_section,
-            general_guidelines_section,
-        ]
-    )
+def get_prompt_cache_stats() -> Dict:
+    """Hit/miss counters of the compiled prompt prefix cache."""
+    return prompt_compiler.stats()
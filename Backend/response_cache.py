@@ -0,0 +1,109 @@
+"""
+Reply cache for canned UI prompts (stage buttons, the ideas prompt).
+
+Replies are keyed by the normalized prompt, the phase the reply is written
+for, language, style preset and turn preset. Entries expire after a TTL and
+the least recently used entries are evicted beyond `max_entries`. A reply is
+only stored when it was generated without any student context (reflection
+text or conversation history), the way `prewarm_response_cache` builds them:
+the cache is shared across students, so a reply that saw one student's words
+must never be served to another.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_ENABLED = os.environ.get("VOXAREFLECT_RESPONSE_CACHE", "off").strip().lower() in ("1", "on", "true", "yes")
+RESPONSE_CACHE_TTL_SECONDS = float(os.environ.get("VOXAREFLECT_RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("VOXAREFLECT_RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_PREWARM = os.environ.get("VOXAREFLECT_RESPONSE_CACHE_PREWARM", "off").strip().lower() in ("1", "on", "true", "yes")
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+TRAILING_PUNCTUATION = ".!?…,;: "
+
+
+def normalize_message(message):
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    text = WHITESPACE_PATTERN.sub(" ", str(message or "")).strip().casefold()
+    return text.rstrip(TRAILING_PUNCTUATION)
+
+
+def carries_student_context(current_text, conversation_history):
+    """True when a reply was generated with anything the student wrote or said in it."""
+    return str(current_text or "").strip() != "" or bool(conversation_history)
+
+
+class ResponseCache:
+    def __init__(self, enabled=RESPONSE_CACHE_ENABLED, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0}
+
+    def key_for(self, message, phase, language, style_preset, turn_preset, is_canned_prompt=False):
+        """Cache key for this turn, or None when the turn is not cacheable."""
+        if not self.enabled:
+            return None
+        if not is_canned_prompt:
+            return None
+        normalized = normalize_message(message)
+        if normalized == "" or not phase or phase == "done":
+            return None
+        return (normalized, phase, language or "", style_preset or "", turn_preset or "")
+
+    def get(self, key):
+        if key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if now - entry["stored_at"] > self.ttl_seconds:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["reply"]
+
+    def put(self, key, reply):
+        if key is None or not isinstance(reply, str) or reply.strip() == "":
+            return
+        with self._lock:
+            self._entries[key] = {"reply": reply, "stored_at": time.time()}
+            self._entries.move_to_end(key)
+            self._stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def contains(self, key):
+        if key is None:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry["stored_at"] <= self.ttl_seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRate"] = (stats["hits"] / lookups) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
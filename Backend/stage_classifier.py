@@ -0,0 +1,341 @@
+"""
+Gibbs-stage detection for the written-feedback flow (`/determineFeedbackAndTitle`).
+
+The feedback button needs the first Gibbs stage, starting at the student's
+current stage, that the reflective text does not cover yet. The original
+implementation asked one yes/no question per stage, in order, and stopped at
+the first "no" (up to six sequential round trips). `first_missing_stage_batched`
+asks for all remaining stages in one JSON call and parses the verdicts
+locally. Stages whose verdict is missing or unreadable are re-checked with the
+per-stage question, so the first-missing-stage result is unchanged.
+
+Students press the feedback button repeatedly while editing, so verdicts are
+kept in a `StageVerdictCache` keyed by the text's content hash and stage. The
+batched call also reports which paragraphs are evidence for each stage. For
+an edited text, the closest previously checked version (most shared
+paragraphs) is used and only the stages whose evidence changed are asked
+again:
+- a stage that was found stays found while one of its evidence paragraphs is unchanged
+- a stage that was missing stays missing while no paragraph was added or changed
+
+Documents are partitioned by owner (the student's username), and edited texts
+are only derived from the same owner's earlier drafts. Requests without an
+owner only reuse verdicts for an identical text.
+
+Both strategies take the model call as a plain callable (`prompt -> text`),
+which keeps this module free of client setup and lets the benchmark in
+`perf/stage_classifier_benchmark.py` substitute a simulated model.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# "batched" (one JSON call for all remaining stages) or "sequential" (one yes/no call per stage).
+STAGE_CLASSIFIER_MODE = os.environ.get("VOXAREFLECT_STAGE_CLASSIFIER", "batched").strip().lower()
+STAGE_CACHE_ENABLED = os.environ.get("VOXAREFLECT_STAGE_CACHE", "on").strip().lower() not in ("0", "off", "false", "no")
+STAGE_CACHE_MAX_DOCUMENTS = int(os.environ.get("VOXAREFLECT_STAGE_CACHE_MAX_DOCUMENTS", "512"))
+
+STAGE_DESCRIPTIONS = {
+    "Description": "describes the event the student is reflecting on.",
+    "Feelings": "describes the thoughts and feelings of the student when they were in the situation.",
+    "Evaluation": "describes the opinion of the student on the positive or negative points of their response at the time of the event.",
+    "Analysis": "describes the reasons for the opinion of the student on the incident. It may also refer to references that support the concerns.",
+    "Conclusion": "summarizes what happened and what the student gained from the event.",
+    "Action Plan": "describes the opinion of the student on what they would do differently if they were faced with a similar situation next time."
+}
+
+JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+PARAGRAPH_SPLIT_PATTERN = re.compile(r"\n\s*")
+
+
+def split_paragraphs(text):
+    """Non-empty lines of `text` with whitespace collapsed; the unit of the edit diff."""
+    paragraphs = []
+    for paragraph in PARAGRAPH_SPLIT_PATTERN.split(str(text or "")):
+        normalized = " ".join(paragraph.split())
+        if normalized:
+            paragraphs.append(normalized)
+    return paragraphs
+
+
+def _hash_text(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def build_single_stage_prompt(text, stage):
+    """The original per-stage yes/no question."""
+    prompt = "Imagine you are a university teacher. Your student has written the following reflective text:\n\n" + text + "\n\nDo you find any sentence in their text from the '" + stage + "' class of the Gibbs reflective cycle? (This class "
+    prompt += STAGE_DESCRIPTIONS.get(stage, "")
+    prompt += ") You should start answering with a clear yes or no. Then, you can explain your answer in 1-2 sentences."
+    return prompt
+
+
+def build_batched_stage_prompt(paragraphs, stages):
+    """
+    One question covering every stage in `stages` for the numbered `paragraphs`,
+    answered as a JSON object with a verdict and the evidence paragraphs per stage.
+    """
+    numbered_text = "\n".join(f"[{index}] {paragraph}" for index, paragraph in enumerate(paragraphs, start=1))
+    stage_lines = "\n".join(f"- \"{stage}\": this class {STAGE_DESCRIPTIONS.get(stage, '')}" for stage in stages)
+    example = ", ".join(f"\"{stage}\": {{\"found\": true, \"paragraphs\": [1]}}" for stage in stages[:2])
+    return (
+        "Imagine you are a university teacher. Your student has written the following reflective text (paragraphs are numbered):\n\n"
+        + numbered_text + "\n\n"
+        "For each of the following classes of the Gibbs reflective cycle, decide whether you find any sentence in their text from that class:\n"
+        + stage_lines + "\n\n"
+        "Answer with a JSON object only. Map every class name above to an object with \"found\" (true or false) and "
+        "\"paragraphs\" (the numbers of the paragraphs containing such sentences, empty if not found), "
+        "for example {" + example + "}."
+    )
+
+
+def _as_verdict(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("yes", "true"):
+            return True
+        if lowered in ("no", "false"):
+            return False
+    if isinstance(value, dict):
+        for key in ("found", "present", "verdict", "value"):
+            if key in value:
+                return _as_verdict(value[key])
+    return None
+
+
+def _as_evidence(value, paragraph_count):
+    if not isinstance(value, dict) or not isinstance(value.get("paragraphs"), list):
+        return None
+    indices = set()
+    for item in value["paragraphs"]:
+        try:
+            index = int(item)
+        except (TypeError, ValueError):
+            return None
+        if not 1 <= index <= paragraph_count:
+            return None
+        indices.add(index - 1)
+    return indices
+
+
+def parse_stage_verdicts(response_text, stages, paragraph_count=0):
+    """
+    Map each stage to {"found": True/False/None, "evidence": set of 0-based
+    paragraph indices or None} from the model's JSON answer. Missing or
+    unreadable verdicts are None, as is evidence that is absent or out of
+    range. Tolerates plain booleans, code fences and surrounding prose.
+    """
+    verdicts = {stage: {"found": None, "evidence": None} for stage in stages}
+    match = JSON_OBJECT_PATTERN.search(str(response_text or ""))
+    if match is None:
+        return verdicts
+    try:
+        payload = json.loads(match.group(0))
+    except ValueError:
+        return verdicts
+    if not isinstance(payload, dict):
+        return verdicts
+    normalized_payload = {str(key).strip().lower(): value for key, value in payload.items()}
+    for stage in stages:
+        value = normalized_payload.get(stage.lower())
+        found = _as_verdict(value)
+        verdicts[stage] = {"found": found, "evidence": _as_evidence(value, paragraph_count) if found else None}
+    return verdicts
+
+
+class StageVerdictCache:
+    """
+    Stage verdicts per owner and text content hash, with paragraph hashes for
+    deriving verdicts of the same owner's edited texts. Each stage record is
+    {"found": bool, "evidence": frozenset of paragraph hashes or None when
+    unknown}. Least recently used documents are evicted beyond `max_documents`.
+    """
+
+    def __init__(self, enabled=STAGE_CACHE_ENABLED, max_documents=STAGE_CACHE_MAX_DOCUMENTS):
+        self.enabled = enabled
+        self.max_documents = max(1, max_documents)
+        self._documents = OrderedDict()
+        self._documents_by_paragraph = {}
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "exactHits": 0, "incrementalHits": 0, "stagesReused": 0, "stagesClassified": 0, "evictions": 0}
+
+    @staticmethod
+    def document_key(paragraph_hashes, owner=None):
+        return _hash_text("\n".join([owner or ""] + list(paragraph_hashes)))
+
+    def _closest_document(self, paragraph_hashes, owner):
+        overlap = {}
+        for paragraph_hash in set(paragraph_hashes):
+            for document_key in self._documents_by_paragraph.get((owner, paragraph_hash), ()):
+                overlap[document_key] = overlap.get(document_key, 0) + 1
+        if not overlap:
+            return None
+        return self._documents[max(overlap, key=overlap.get)]
+
+    def lookup(self, paragraph_hashes, owner=None):
+        """Known stage records for the text with these paragraph hashes (possibly derived from the owner's earlier version)."""
+        if not self.enabled:
+            return {}
+        with self._lock:
+            self._stats["lookups"] += 1
+            document = self._documents.get(self.document_key(paragraph_hashes, owner))
+            if document is not None:
+                self._documents.move_to_end(document["key"])
+                self._stats["exactHits"] += 1
+                return dict(document["verdicts"])
+            if not owner:
+                return {}
+            base = self._closest_document(paragraph_hashes, owner)
+            if base is None:
+                return {}
+            current = set(paragraph_hashes)
+            removed = any(paragraph_hash not in current for paragraph_hash in base["paragraphs"])
+            added = any(paragraph_hash not in base["paragraph_set"] for paragraph_hash in current)
+            derived = {}
+            for stage, record in base["verdicts"].items():
+                if record["found"]:
+                    if record["evidence"] is None:
+                        if not removed:
+                            derived[stage] = record
+                    elif record["evidence"] & current:
+                        derived[stage] = {"found": True, "evidence": record["evidence"] & current}
+                elif not added:
+                    derived[stage] = record
+            if derived:
+                self._stats["incrementalHits"] += 1
+            return derived
+
+    def store(self, paragraph_hashes, verdicts, owner=None):
+        """Merge freshly classified (or derived) stage records into the owner's entry for the text."""
+        if not self.enabled or not verdicts:
+            return
+        key = self.document_key(paragraph_hashes, owner)
+        with self._lock:
+            document = self._documents.get(key)
+            if document is None:
+                document = {"key": key, "owner": owner or None, "paragraphs": list(paragraph_hashes), "paragraph_set": frozenset(paragraph_hashes), "verdicts": {}}
+                self._documents[key] = document
+                if document["owner"]:
+                    for paragraph_hash in document["paragraph_set"]:
+                        self._documents_by_paragraph.setdefault((owner, paragraph_hash), set()).add(key)
+            document["verdicts"].update(verdicts)
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_documents:
+                _, evicted = self._documents.popitem(last=False)
+                self._stats["evictions"] += 1
+                for paragraph_hash in evicted["paragraph_set"]:
+                    index_key = (evicted["owner"], paragraph_hash)
+                    keys = self._documents_by_paragraph.get(index_key)
+                    if keys is not None:
+                        keys.discard(evicted["key"])
+                        if not keys:
+                            del self._documents_by_paragraph[index_key]
+
+    def record_usage(self, reused, classified):
+        with self._lock:
+            self._stats["stagesReused"] += reused
+            self._stats["stagesClassified"] += classified
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["documents"] = len(self._documents)
+        stats["enabled"] = self.enabled
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self._documents_by_paragraph.clear()
+
+
+stage_verdict_cache = StageVerdictCache()
+
+
+def _answered_yes(response_text):
+    return str(response_text or "").strip().lower().startswith("yes")
+
+
+def _resolve_first_missing(stages, known, fresh, ask_single):
+    """Walk `stages` in order using known/fresh records; unresolved stages are asked one by one."""
+    for stage in stages:
+        record = known.get(stage) or fresh.get(stage)
+        if record is None or record["found"] is None:
+            record = {"found": _answered_yes(ask_single(stage)), "evidence": None}
+            fresh[stage] = record
+        if not record["found"]:
+            return stage
+    return None
+
+
+def _finish(paragraph_hashes, known, fresh, verdict_cache, owner):
+    if verdict_cache is None:
+        return
+    reused = {stage: record for stage, record in known.items()}
+    verdict_cache.record_usage(len(reused), len(fresh))
+    verdict_cache.store(paragraph_hashes, dict(reused, **fresh), owner)
+
+
+def first_missing_stage_sequential(text, stages, ask, verdict_cache=None, owner=None):
+    """Original strategy: one yes/no call per stage, stopping at the first "no"."""
+    paragraph_hashes = [_hash_text(paragraph) for paragraph in split_paragraphs(text)]
+    known = verdict_cache.lookup(paragraph_hashes, owner) if verdict_cache is not None else {}
+    fresh = {}
+    missing_stage = _resolve_first_missing(stages, known, fresh, lambda stage: ask(build_single_stage_prompt(text, stage)))
+    _finish(paragraph_hashes, known, fresh, verdict_cache, owner)
+    return missing_stage
+
+
+def first_missing_stage_batched(text, stages, ask_json, ask, verdict_cache=None, owner=None):
+    """
+    One JSON call for the stages that are not already known. Returns the first
+    stage judged missing, or None when every stage is covered. Unreadable
+    verdicts fall back to the per-stage question, in order, only up to the first
+    stage that is confirmed missing. Cached verdicts are scoped to `owner`.
+    """
+    if not stages:
+        return None
+    paragraphs = split_paragraphs(text)
+    paragraph_hashes = [_hash_text(paragraph) for paragraph in paragraphs]
+    known = verdict_cache.lookup(paragraph_hashes, owner) if verdict_cache is not None else {}
+
+    # Stages up to the first one already known to be missing decide the answer.
+    unknown_stages = []
+    for stage in stages:
+        record = known.get(stage)
+        if record is None:
+            unknown_stages.append(stage)
+        elif not record["found"]:
+            break
+
+    fresh = {}
+    if unknown_stages:
+        try:
+            parsed = parse_stage_verdicts(
+                ask_json(build_batched_stage_prompt(paragraphs or [str(text or "")], unknown_stages)),
+                unknown_stages,
+                len(paragraphs)
+            )
+        except Exception as error:
+            logger.warning("Batched stage classification failed, falling back to per-stage calls: %s", error)
+            parsed = {}
+        for stage, record in parsed.items():
+            if record["found"] is None:
+                continue
+            evidence = None
+            if record["evidence"]:
+                evidence = frozenset(paragraph_hashes[index] for index in record["evidence"])
+            fresh[stage] = {"found": record["found"], "evidence": evidence}
+
+    missing_stage = _resolve_first_missing(stages, known, fresh, lambda stage: ask(build_single_stage_prompt(text, stage)))
+    _finish(paragraph_hashes, known, fresh, verdict_cache, owner)
+    return missing_stage
@@ -0,0 +1,259 @@
+"""
+Logging setup for the backend: levels, JSON lines, correlation ids and
+sampled payload dumps.
+
+- `configure_logging()` installs one handler on the root logger. Records are
+  written as JSON lines (`VOXAREFLECT_LOG_FORMAT=json`, the default) or as
+  plain text, from a background thread (`VOXAREFLECT_LOG_ASYNC`) so request
+  threads never wait on stdout.
+- Every record carries the `requestId` of the HTTP request and the `turnId`
+  of the chat turn it belongs to (and the `traceId` when tracing is on).
+  They live in context variables; `propagate(fn)` carries them into worker
+  threads and executor jobs.
+- Large payloads (prompts, reasoning, summaries) go through `log_payload()`.
+  `VOXAREFLECT_LOG_PAYLOADS` decides whether they are written: `off` (the
+  default), `error` (kept per turn and written only if the turn fails),
+  `sample` (1 in `VOXAREFLECT_LOG_PAYLOAD_SAMPLE_EVERY` turns, plus failing
+  turns) or `all`.
+
+Modules log through `logging.getLogger(__name__)` and pass structured fields
+as `extra={"fields": {...}}`.
+"""
+
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+import tracing
+
+LOG_LEVEL = os.environ.get("VOXAREFLECT_LOG_LEVEL", "INFO").strip().upper() or "INFO"
+LOG_FORMAT = os.environ.get("VOXAREFLECT_LOG_FORMAT", "json").strip().lower()
+LOG_ASYNC = os.environ.get("VOXAREFLECT_LOG_ASYNC", "on").strip().lower() not in ("0", "off", "false", "no")
+LOG_PAYLOADS = os.environ.get("VOXAREFLECT_LOG_PAYLOADS", "off").strip().lower()
+if LOG_PAYLOADS not in ("off", "error", "sample", "all"):
+    LOG_PAYLOADS = "off"
+LOG_PAYLOAD_SAMPLE_EVERY = max(1, int(os.environ.get("VOXAREFLECT_LOG_PAYLOAD_SAMPLE_EVERY", "20")))
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get("VOXAREFLECT_LOG_PAYLOAD_MAX_CHARS", "4000"))
+
+_request_id = contextvars.ContextVar("voxareflect_request_id", default=None)
+_turn = contextvars.ContextVar("voxareflect_turn", default=None)
+_listener = None
+_configured = False
+
+
+def new_id():
+    return uuid.uuid4().hex[:16]
+
+
+class TurnLog:
+    """Per-turn logging state: the turn id and, if payloads are kept, the payloads seen so far."""
+
+    def __init__(self, turn_id, sampled):
+        self.turn_id = turn_id
+        self.sampled = sampled
+        self.pending_payloads = []
+        self._lock = threading.Lock()
+
+    def keep(self, record):
+        with self._lock:
+            self.pending_payloads.append(record)
+
+    def drain(self):
+        with self._lock:
+            records, self.pending_payloads = self.pending_payloads, []
+        return records
+
+
+def set_request_id(request_id=None):
+    """Bind a request id to the current context (a new one unless given); returns it."""
+    request_id = str(request_id or "").strip()[:64] or new_id()
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def current_turn_id():
+    turn = _turn.get()
+    return turn.turn_id if turn is not None else None
+
+
+def begin_turn(turn_id=None):
+    """
+    Start the logging scope of a chat turn in the current context and decide
+    whether its payloads are written. Returns (TurnLog, token) for `end_turn`.
+    """
+    if LOG_PAYLOADS == "all":
+        sampled = True
+    elif LOG_PAYLOADS == "sample":
+        sampled = random.random() < 1.0 / LOG_PAYLOAD_SAMPLE_EVERY
+    else:
+        sampled = False
+    turn = TurnLog(turn_id or new_id(), sampled)
+    return turn, _turn.set(turn)
+
+
+def end_turn(token, failed=False):
+    """Close the turn scope; payloads kept for failing turns are written now."""
+    turn = _turn.get()
+    if turn is not None and failed:
+        for logger_name, label, fields in turn.drain():
+            logging.getLogger(logger_name).error(
+                f"payload {label} (turn failed)", extra={"fields": dict(fields, payload=label)}
+            )
+    elif turn is not None:
+        turn.drain()
+    _turn.reset(token)
+
+
+def payloads_wanted():
+    """True if `log_payload` would write or keep anything for the current turn."""
+    if LOG_PAYLOADS == "off":
+        return False
+    if _turn.get() is None:
+        return LOG_PAYLOADS == "all"
+    return True
+
+
+def log_payload(logger, label, text, **fields):
+    """
+    Log a large payload (prompt, reasoning, summary) subject to VOXAREFLECT_LOG_PAYLOADS.
+    Payloads outside a turn are written only in `all` mode.
+    """
+    if LOG_PAYLOADS == "off":
+        return
+    text = "" if text is None else str(text)
+    fields = dict(fields)
+    fields["chars"] = len(text)
+    fields["text"] = text if len(text) <= LOG_PAYLOAD_MAX_CHARS else text[:LOG_PAYLOAD_MAX_CHARS] + "…"
+    turn = _turn.get()
+    if turn is None:
+        if LOG_PAYLOADS == "all":
+            logger.info(f"payload {label}", extra={"fields": dict(fields, payload=label)})
+        return
+    if turn.sampled:
+        logger.info(f"payload {label}", extra={"fields": dict(fields, payload=label)})
+    elif LOG_PAYLOADS in ("error", "sample"):
+        turn.keep((logger.name, label, fields))
+
+
+def propagate(function):
+    """Wrap `function` so it runs with the caller's request and turn ids and trace span (threads, executors)."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(function, *args, **kwargs)
+
+    return run
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        record.turn_id = current_turn_id()
+        record.trace_id = tracing.current_trace_id()
+        return True
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Queues records with their message rendered and the traceback kept as text (not folded into msg)."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        request_id = getattr(record, "request_id", None)
+        turn_id = getattr(record, "turn_id", None)
+        if request_id:
+            entry["requestId"] = request_id
+        if turn_id:
+            entry["turnId"] = turn_id
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["traceId"] = trace_id
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            for key, value in fields.items():
+                entry.setdefault(key, value)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        ids = " ".join(
+            f"{name}={value}" for name, value in (("request", getattr(record, "request_id", None)), ("turn", getattr(record, "turn_id", None))) if value
+        )
+        fields = getattr(record, "fields", None)
+        extras = ""
+        if isinstance(fields, dict) and fields:
+            extras = " " + " ".join(f"{key}={value}" for key, value in fields.items() if key != "text")
+            if "text" in fields:
+                extras += "\n" + str(fields["text"])
+        return line + (f" [{ids}]" if ids else "") + extras
+
+
+def configure_logging(stream=None):
+    """Install the root handler once (idempotent)."""
+    global _listener, _configured
+    if _configured:
+        return
+    _configured = True
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    if LOG_ASYNC:
+        # Context ids are read on the calling thread before the record is queued.
+        log_queue = queue.SimpleQueue()
+        queue_handler = _ContextQueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler.addFilter(ContextFilter())
+        root.addHandler(handler)
+    # Werkzeug access lines and the OpenAI client's per-call lines duplicate our own logging.
+    for name in ("werkzeug", "httpx", "httpx2"):
+        logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+
+
+def shutdown_logging():
+    """Flush queued records (registered with atexit by app.py)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
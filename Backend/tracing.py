@@ -0,0 +1,426 @@
+"""
+Trace spans for chat turns, exported in the OTLP/JSON format.
+
+A span records one timed step (an HTTP request, a voice job, an upstream
+LLM call, a store write, a TTS clip) with its parent, attributes (model,
+token counts, bytes, phase, cache hits), events and error status. The
+current span lives in a context variable, so `structured_logging.propagate`
+carries it into worker threads and executor jobs and their spans become
+children of the request or turn that started them.
+
+- `VOXAREFLECT_TRACING` turns tracing on (off by default; spans are then
+  no-ops that cost one attribute lookup).
+- `VOXAREFLECT_TRACING_EXPORT` is a file path (one OTLP
+  `ExportTraceServiceRequest` JSON document per line, default
+  `traces.jsonl`) or an `http(s)://` OTLP/HTTP endpoint such as
+  `http://localhost:4318/v1/traces`.
+- `VOXAREFLECT_TRACING_SAMPLE_RATE` is the share of root spans (traces)
+  that are recorded; children follow their root's decision. Incoming W3C
+  `traceparent` headers continue the caller's trace and sampling decision.
+- `VOXAREFLECT_TRACE_PROPAGATE_UPSTREAM` adds a `traceparent` header to
+  outgoing LLM and TTS calls (off by default: trace and span ids are internal
+  and are only worth sending to an upstream that reports to the same
+  collector, such as a local proxy).
+
+Finished spans are queued and written in batches by a background thread;
+`shutdown()` (registered with atexit by app.py) flushes the rest.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.environ.get("VOXAREFLECT_TRACING", "off").strip().lower() in ("1", "on", "true", "yes")
+TRACING_EXPORT = os.environ.get("VOXAREFLECT_TRACING_EXPORT", "").strip() or "traces.jsonl"
+TRACING_SAMPLE_RATE = min(1.0, max(0.0, float(os.environ.get("VOXAREFLECT_TRACING_SAMPLE_RATE", "1.0"))))
+TRACING_SERVICE_NAME = os.environ.get("VOXAREFLECT_TRACING_SERVICE", "").strip() or "voxareflect-backend"
+TRACING_FLUSH_SECONDS = float(os.environ.get("VOXAREFLECT_TRACING_FLUSH_SECONDS", "2.0"))
+TRACING_MAX_QUEUE = int(os.environ.get("VOXAREFLECT_TRACING_MAX_QUEUE", "20000"))
+TRACE_PROPAGATE_UPSTREAM = os.environ.get("VOXAREFLECT_TRACE_PROPAGATE_UPSTREAM", "off").strip().lower() in ("1", "on", "true", "yes")
+EXPORT_BATCH_SIZE = 512
+
+# OTLP enum values (opentelemetry/proto/trace/v1/trace.proto).
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3, "producer": 4, "consumer": 5}
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_current_span = contextvars.ContextVar("voxareflect_span", default=None)
+_STOP = object()
+
+
+def _new_trace_id():
+    return "%032x" % random.getrandbits(128)
+
+
+def _new_span_id():
+    return "%016x" % random.getrandbits(64)
+
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_attribute_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items()]
+
+
+class Span:
+    """A recorded span; use it through `span()` or `start_span()`."""
+
+    recording = True
+
+    def __init__(self, name, trace_id, parent_id=None, kind="internal", attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.sampled = True
+        self.attributes = {}
+        self.events = []
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self.end_ns = None
+        self._lock = threading.Lock()
+        if attributes:
+            self.set_attributes(attributes)
+
+    def set_attribute(self, key, value):
+        if value is None:
+            return
+        with self._lock:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name, **attributes):
+        with self._lock:
+            self.events.append((time.time_ns(), name, {key: value for key, value in attributes.items() if value is not None}))
+
+    def record_exception(self, error):
+        self.add_event("exception", **{"exception.type": type(error).__name__, "exception.message": str(error)})
+        self.set_status(STATUS_ERROR, f"{type(error).__name__}: {error}")
+
+    def set_status(self, code, message=""):
+        self.status = code
+        self.status_message = message
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._started)
+        _exporter.submit(self)
+
+    @property
+    def duration_seconds(self):
+        end_ns = self.end_ns if self.end_ns is not None else self.start_ns + (time.perf_counter_ns() - self._started)
+        return (end_ns - self.start_ns) / 1e9
+
+    def to_otlp(self):
+        with self._lock:
+            attributes = dict(self.attributes)
+            events = list(self.events)
+        entry = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(attributes),
+            "events": [
+                {"timeUnixNano": str(timestamp), "name": name, "attributes": _otlp_attributes(event_attributes)}
+                for timestamp, name, event_attributes in events
+            ],
+            "status": {"code": self.status, "message": self.status_message} if self.status_message else {"code": self.status}
+        }
+        if self.parent_id:
+            entry["parentSpanId"] = self.parent_id
+        return entry
+
+
+class _NonRecordingSpan:
+    """Stand-in for spans that are not recorded (tracing off or trace not sampled)."""
+
+    recording = False
+    duration_seconds = 0.0
+
+    def __init__(self, trace_id=None, span_id=None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+    def set_status(self, code, message=""):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NonRecordingSpan()
+
+
+def current_span():
+    """The span of the current context (a no-op span outside any trace)."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_trace_id():
+    active = _current_span.get()
+    return active.trace_id if active is not None and active.sampled else None
+
+
+def parse_traceparent(header):
+    """Parse a W3C `traceparent` header into (trace_id, parent_span_id, sampled), or None."""
+    parts = str(header or "").strip().lower().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def format_traceparent(active=None):
+    """W3C `traceparent` header value for `active` (default: the current span), or None."""
+    active = active or current_span()
+    if not active.trace_id or not active.span_id:
+        return None
+    return f"00-{active.trace_id}-{active.span_id}-{'01' if active.sampled else '00'}"
+
+
+def upstream_headers(headers, active):
+    """`headers` plus a `traceparent` for `active` when upstream propagation is on and the span is recorded."""
+    if not TRACE_PROPAGATE_UPSTREAM or not active.recording:
+        return headers
+    traceparent = format_traceparent(active)
+    if not traceparent:
+        return headers
+    return dict(headers or {}, traceparent=traceparent)
+
+
+def start_span(name, kind="internal", attributes=None, traceparent=None):
+    """
+    Start a span under the current span (or as a new trace, or under `traceparent`)
+    without making it current. The caller must `end()` it.
+    """
+    if not TRACING_ENABLED:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    remote = parse_traceparent(traceparent) if traceparent else None
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+    elif parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    else:
+        trace_id, parent_id = _new_trace_id(), None
+        sampled = TRACING_SAMPLE_RATE >= 1.0 or random.random() < TRACING_SAMPLE_RATE
+    if not sampled:
+        return _NonRecordingSpan(trace_id, parent_id or _new_span_id())
+    return Span(name, trace_id, parent_id, kind, attributes)
+
+
+def activate(span):
+    """Make `span` current; returns the token for `deactivate`."""
+    if not TRACING_ENABLED:
+        return None
+    return _current_span.set(span)
+
+
+def deactivate(token):
+    if token is None:
+        return
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Token from another context (e.g. a response finished on another thread).
+        _current_span.set(None)
+
+
+@contextlib.contextmanager
+def span(name, kind="internal", **attributes):
+    """
+    Run the block in a child span of the current one; exceptions are recorded on
+    the span and re-raised. Attribute values of None are skipped.
+    """
+    if not TRACING_ENABLED:
+        yield NOOP_SPAN
+        return
+    active = start_span(name, kind, attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as error:
+        active.record_exception(error)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+
+class SpanExporter:
+    """Queues finished spans and writes them in OTLP/JSON batches from a background thread."""
+
+    def __init__(self, target=TRACING_EXPORT, flush_seconds=TRACING_FLUSH_SECONDS, max_queue=TRACING_MAX_QUEUE):
+        self.target = target
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"spansExported": 0, "spansDropped": 0, "exportErrors": 0, "batches": 0}
+
+    def _count(self, **counts):
+        with self._stats_lock:
+            for key, value in counts.items():
+                self._stats[key] += value
+
+    def submit(self, finished_span):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(finished_span)
+        except queue.Full:
+            self._count(spansDropped=1)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # A batch is exported when it is full or `flush_seconds` after its first span.
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            stopping = False
+            while len(batch) < EXPORT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.export(batch)
+            if stopping:
+                return
+
+    def build_request(self, spans):
+        """ExportTraceServiceRequest document for `spans`."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": TRACING_SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "voxareflect"},
+                    "spans": [finished_span.to_otlp() for finished_span in spans]
+                }]
+            }]
+        }
+
+    def export(self, spans):
+        body = json.dumps(self.build_request(spans), ensure_ascii=False, separators=(",", ":"))
+        try:
+            with self._write_lock:
+                if self.target.startswith(("http://", "https://")):
+                    export_request = urllib.request.Request(
+                        self.target, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+                    )
+                    with urllib.request.urlopen(export_request, timeout=10) as response:
+                        response.read()
+                else:
+                    with open(self.target, "a", encoding="utf-8") as trace_file:
+                        trace_file.write(body + "\n")
+        except Exception as error:
+            self._count(exportErrors=1, spansDropped=len(spans))
+            logger.warning("Trace export to %s failed: %s", self.target, error)
+            return
+        self._count(spansExported=len(spans), batches=1)
+
+    def close(self, timeout=10.0):
+        """Stop the export thread after it has sent its current batch, then export what is left."""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for start in range(0, len(batch), EXPORT_BATCH_SIZE):
+            self.export(batch[start:start + EXPORT_BATCH_SIZE])
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+
+_exporter = SpanExporter()
+
+
+def shutdown():
+    """Flush queued spans (registered with atexit by app.py)."""
+    if TRACING_ENABLED:
+        _exporter.close()
+
+
+def stats():
+    return dict(
+        _exporter.snapshot(),
+        enabled=TRACING_ENABLED,
+        export=TRACING_EXPORT,
+        sampleRate=TRACING_SAMPLE_RATE
+    )